@@ -159,8 +159,7 @@ def handle_entrance(m):
     # Если выбрали из клавиатуры
     entrances = state.get("entrances", [])
     if txt in entrances:
-        state["entrance"] = txt
-        state["step"] = "wait_photo"
+        state.update(entrance=txt, step="wait_photo")
         bot.send_message(
             chat_id,
             "📷 Надішліть фото журналу ТО. Підписувати не потрібно — бот зчитає дату, роботи та підпис.",
@@ -170,8 +169,7 @@ def handle_entrance(m):
 
     # Если руками ввели цифру
     if txt.isdigit():
-        state["entrance"] = txt
-        state["step"] = "wait_photo"
+        state.update(entrance=txt, step="wait_photo")
         bot.send_message(
             chat_id,
             "📷 Надішліть фото журналу ТО. Підписувати не потрібно — бот зчитає дату, роботи та підпис.",
@@ -189,8 +187,7 @@ def handle_entrance_manual(m):
     if not txt.isdigit():
         bot.send_message(chat_id, "Введіть номер під'їзду цифрою, наприклад 3.")
         return
-    state["entrance"] = txt
-    state["step"] = "wait_photo"
+    state.update(entrance=txt, step="wait_photo")
     bot.send_message(
         chat_id,
         "📷 Надішліть фото журналу ТО. Підписувати не потрібно — бот зчитає дату, роботи та підпис.",
@@ -1,13 +1,16 @@
 # app/bot_maintenance/shared.py
 import os
-import json
 import sqlite3
 import logging
 from datetime import datetime
 from typing import Optional, Tuple, Dict, Any, List
 from pytz import timezone
 import telebot
-import math
+from app.core.config import DATA_DIR, configure_telebot
+from app.core.geo_index import GeoIndex, haversine_m
+from app.core.address_store import address_store
+from app.core.address_registry import address_registry
+from app.core.state_store import StateStore
 
 logger = logging.getLogger(__name__)
 
@@ -16,33 +19,24 @@ kyiv_tz = timezone("Europe/Kyiv")
 
 # Paths
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-DB_PATH = os.path.join(PROJECT_ROOT, "maintenance.db")
-ADDRESSES_JSON = os.path.join(PROJECT_ROOT, "addresses.json")  # твой файл с геоточек
+DB_PATH = os.path.join(DATA_DIR, "maintenance.db")
 
 # Shared runtime state
 maintenance_logs: List[Dict[str, Any]] = []   # список выполненных ТО
 maintenance_schedule: Dict[str, List[str]] = {}  # {address_key: ["YYYY-MM-DD", ...]}
-user_states: Dict[int, Dict[str, Any]] = {}   # временные состояния пользователей
-address_data: Dict[str, Any] = {}             # полный словарь адресов/подъездов
+user_states = StateStore(DB_PATH, "maintenance")  # временные состояния пользователей (переживают рестарт)
+geo_index = GeoIndex()                         # сетка точек подъездов (address_store) для find_address_by_geo
 
 # ---------- Bot instance ----------
 BOT_TOKEN = os.environ.get("BOT_TOKEN_MAINTENANCE") or ""
 if not BOT_TOKEN:
     logger.warning("BOT_TOKEN_MAINTENANCE not set — bot will not run without token")
 
+configure_telebot()  # TELEGRAM_API_URL (локальный Bot API / фейковый сервер в тестах)
 bot = telebot.TeleBot(BOT_TOKEN, parse_mode="HTML")
 
 # ---------- Utils ----------
-def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Расстояние между двумя точками в метрах (без внешних зависимостей)."""
-    R = 6371000.0
-    f1 = math.radians(lat1)
-    f2 = math.radians(lat2)
-    df = math.radians(lat2 - lat1)
-    dl = math.radians(lon2 - lon1)
-    a = math.sin(df/2)**2 + math.cos(f1) * math.cos(f2) * math.sin(dl/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
+# haversine_m — из app.core.geo_index (импорт выше оставлен для совместимости)
 
 def normalize_text(s: str) -> str:
     """Для грубого сопоставления адресов в графике и в базе адресов."""
@@ -70,61 +64,38 @@ def schedule_key_candidates(street: str, building: str) -> List[str]:
 
 # ---------- Addresses loader ----------
 def load_addresses() -> None:
-    global address_data
+    # addresses.json -> addresses.bin (address_registry, общий с ботом заявок);
+    # geo_index — слушатель реестра: пересобирается при смене addresses.json, флаги active видит сразу
     try:
-        with open(ADDRESSES_JSON, "r", encoding="utf-8") as f:
-            address_data = json.load(f)
-        logger.info("Loaded addresses.json with %d districts", len(address_data))
+        address_registry.load()
+        logger.info("Loaded addresses with %d districts", len(address_store.districts()))
     except Exception:
-        address_data = {}
-        logger.exception("Failed to load addresses.json from %s", ADDRESSES_JSON)
+        logger.exception("Failed to load addresses from %s", address_store.json_path)
+    address_registry.add_listener(geo_index)
 
 def find_address_by_geo(lat: float, lon: float) -> Optional[Tuple[str, str, str, str]]:
     """
     Ищем ближайший подъезд в пределах своего радиуса и только если active == true.
     Возвращает (district, street, building, entrance) или None.
     """
-    if not address_data:
-        return None
-
-    best = None
-    best_dist = float("inf")
-
-    # Структура: district -> street -> building -> entrance -> {lat, lon, radius, active}
-    for district, streets in address_data.items():
-        for street, buildings in streets.items():
-            for building, entrances in buildings.items():
-                for entrance, point in entrances.items():
-                    try:
-                        plat = float(point.get("lat"))
-                        plon = float(point.get("lon"))
-                        pradius = float(point.get("radius", 0))
-                        active = bool(point.get("active", True))
-                    except Exception:
-                        continue
-                    if not active:
-                        continue
-                    d = haversine_m(lat, lon, plat, plon)
-                    # Совпадение – только если попали в радиус точки
-                    if d <= pradius and d < best_dist:
-                        best_dist = d
-                        best = (district, street, building, entrance)
-
-    return best
+    # Совпадение – только если попали в радиус точки; смотрим лишь соседние ячейки сетки
+    match = geo_index.nearest_entrance(lat, lon)
+    return tuple(match.point) if match else None
 
 def get_entrances_for_building(street: str, building: str) -> List[str]:
     """Возвращает список всех подъездов для найденного дома (из addresses.json)."""
-    for d_streets in address_data.values():
-        if street in d_streets:
-            b = d_streets[street].get(building, {})
-            return sorted([e for e in b.keys()], key=lambda x: (len(x), x))
-    return []
+    district = address_store.find_building(street, building)
+    if district is None:
+        return []
+    return sorted(address_store.entrances(district, street, building), key=lambda x: (len(x), x))
 
 # ---------- Database helpers ----------
 def init_database(db_path: Optional[str] = None):
     path = db_path or DB_PATH
     conn = sqlite3.connect(path)
     cur = conn.cursor()
+    # WAL: веб читает журнал ТО, пока процесс бота пишет
+    cur.execute("PRAGMA journal_mode=WAL")
     # Логи ТО
     cur.execute("""
         CREATE TABLE IF NOT EXISTS maintenance_logs (
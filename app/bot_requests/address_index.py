@@ -0,0 +1,279 @@
+# app/bot_requests/address_index.py
+"""
+Индекс адресов для match_address.
+
+Строится один раз при загрузке addresses.json и дальше обновляется по районам:
+
+- префиксное дерево (trie) названий улиц, нормализованных и свёрнутых в общий
+  RU/UA вид (street_search.fold). Ключи — название целиком и каждый его «хвост»
+  по словам ("адмірала макарова", "макарова"), плюс ручные алиасы из
+  map_ru_to_ua.json, если файл есть;
+- по каждому району хеш-таблица (улица, дом) -> (улица как в addresses.json, дом как в addresses.json);
+- по каждому району триграммный индекс тех же ключей для подсказок при опечатках (suggest).
+
+Поиск стоит O(длина ввода), а не «все ключи карты × все улицы района × все дома».
+rebuild() пересобирает только районы, в которых поменялся набор улиц и домов;
+индекс подписан на address_registry (reset -> rebuild). Флаги active не входят
+в индекс, поэтому /enable и /disable пересборку не вызывают.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+from collections import Counter
+from typing import Optional
+
+from app.bot_requests.street_search import TrigramIndex, fold
+
+logger = logging.getLogger(__name__)
+
+# Типы улиц, которые отбрасываем целыми словами (точки уже сняты нормализацией)
+STREET_TYPE_WORDS = frozenset({
+    "вулиця", "вул", "улица", "ул", "проспект", "просп", "пр", "площа", "пл",
+    "провулок", "пров", "переулок", "пер", "бульвар", "бул", "б-р", "узвіз",
+    "шосе", "набережна", "street", "st", "avenue", "ave",
+})
+
+_PUNCT_RE = re.compile(r"[.,;:\"«»()]+")
+_APOSTROPHES = str.maketrans({"’": "'", "ʼ": "'", "`": "'", "‘": "'", "ё": "е"})
+# Латинские буквы в номере дома, похожие на кириллические (10A -> 10А)
+_HOUSE_LATIN = str.maketrans({"A": "А", "B": "В", "C": "С", "E": "Е", "K": "К", "H": "Н", "O": "О", "P": "Р", "T": "Т", "X": "Х"})
+
+
+def normalize_street(name: str) -> str:
+    """'вул. Адмірала  Макарова' -> 'адмірала макарова'."""
+    if not name:
+        return ""
+    s = _PUNCT_RE.sub(" ", name.lower().translate(_APOSTROPHES))
+    words = [w for w in s.split() if w not in STREET_TYPE_WORDS]
+    return " ".join(words)
+
+
+def street_key(name: str) -> str:
+    """Ключ улицы в индексе: нормализация + свёртка RU/UA."""
+    return fold(normalize_street(name))
+
+
+def normalize_house(house: str) -> str:
+    """'10 а' / '10-A' -> '10А'."""
+    if not house:
+        return ""
+    return re.sub(r"[\s\-]+", "", str(house).upper()).translate(_HOUSE_LATIN)
+
+
+class _Node:
+    __slots__ = ("children", "ends", "below")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        self.ends: Counter = Counter()   # ключ заканчивается здесь -> улицы
+        self.below: Counter = Counter()  # все улицы в поддереве (для ввода-префикса)
+
+
+class StreetTrie:
+    """Префиксное дерево ключ -> нормализованная улица, со счётчиками для удаления."""
+
+    def __init__(self):
+        self.root = _Node()
+
+    def add(self, key: str, street: str):
+        node = self.root
+        node.below[street] += 1
+        for ch in key:
+            node = node.children.setdefault(ch, _Node())
+            node.below[street] += 1
+        node.ends[street] += 1
+
+    def remove(self, key: str, street: str):
+        path = [self.root]
+        for ch in key:
+            nxt = path[-1].children.get(ch)
+            if nxt is None:
+                return
+            path.append(nxt)
+        if not path[-1].ends[street]:
+            return
+        _decrement(path[-1].ends, street)
+        for node in path:
+            _decrement(node.below, street)
+        # подрезаем опустевшие ветки
+        for parent, ch, child in zip(reversed(path[:-1]), reversed(key), reversed(path[1:])):
+            if child.below:
+                break
+            del parent.children[ch]
+
+    def lookup(self, key: str) -> list[list[str]]:
+        """
+        Кандидаты по убыванию уверенности:
+        точное совпадение ключа; ввод — префикс ключей; самый длинный ключ — префикс ввода.
+        """
+        node = self.root
+        longest_prefix: list[str] = []
+        for ch in key:
+            if node.ends:
+                longest_prefix = list(node.ends)
+            node = node.children.get(ch)
+            if node is None:
+                return [longest_prefix] if longest_prefix else []
+        tiers = []
+        if node.ends:
+            tiers.append(list(node.ends))
+        rest = [s for s in node.below if s not in node.ends]
+        if rest:
+            tiers.append(rest)
+        if longest_prefix:
+            tiers.append(longest_prefix)
+        return tiers
+
+
+def _decrement(counter: Counter, key):
+    counter[key] -= 1
+    if counter[key] <= 0:
+        del counter[key]
+
+
+def _street_keys(street_norm: str) -> list[str]:
+    words = street_norm.split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+class AddressIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._trie = StreetTrie()
+        self._fuzzy: dict[str, TrigramIndex] = {}  # район -> триграммы ключей его улиц
+        self._streets: dict[str, dict[str, str]] = {}  # район -> ключ улицы -> улица как в addresses.json
+        self._houses: dict[str, dict[tuple[str, str], tuple[str, str]]] = {}  # район -> (улица, дом) -> оригиналы
+        self._trie_keys: dict[str, list[tuple[str, str]]] = {}  # район -> добавленные в trie (ключ, улица)
+        self._alias_keys: list[tuple[str, str]] = []
+        self._signatures: dict[str, int] = {}
+        self._aliases: dict = {}
+
+    # ---------- построение ----------
+    def rebuild(self, tree: dict, aliases: Optional[dict] = None) -> int:
+        """
+        Синхронизировать индекс с {район: {улица: [дома]}} (address_store.house_tree())
+        и картой алиасов. Возвращает число пересобранных районов.
+        """
+        with self._lock:
+            changed = 0
+            for district in list(self._houses):
+                if district not in tree:
+                    self._drop_district(district)
+                    changed += 1
+            for district, streets in tree.items():
+                signature = _district_signature(streets)
+                if self._signatures.get(district) == signature:
+                    continue
+                self._drop_district(district)
+                self._add_district(district, streets)
+                self._signatures[district] = signature
+                changed += 1
+            if aliases is not None and aliases != self._aliases:
+                self._set_aliases(aliases)
+            if changed:
+                logger.info("Address index: rebuilt %d district(s), %d total",
+                            changed, len(self._houses))
+            return changed
+
+    # ---------- listener protocol (app.core.address_registry) ----------
+    def reset(self, store):
+        self.rebuild(store.house_tree())
+
+    def apply(self, changes):
+        pass  # флаги active в индекс не входят
+
+    def _add_district(self, district: str, streets: dict):
+        houses: dict[tuple[str, str], tuple[str, str]] = {}
+        names: dict[str, str] = {}
+        fuzzy = TrigramIndex()
+        keys: list[tuple[str, str]] = []
+        for street, buildings in (streets or {}).items():
+            street_norm = street_key(street)
+            if not street_norm:
+                continue
+            names.setdefault(street_norm, street)
+            for key in _street_keys(street_norm):
+                self._trie.add(key, street_norm)
+                fuzzy.add(key, street_norm)
+                keys.append((key, street_norm))
+            for house in (buildings or {}):
+                houses.setdefault((street_norm, normalize_house(house)), (street, house))
+        self._houses[district] = houses
+        self._streets[district] = names
+        self._fuzzy[district] = fuzzy
+        self._trie_keys[district] = keys
+
+    def _drop_district(self, district: str):
+        for key, street_norm in self._trie_keys.pop(district, ()):
+            self._trie.remove(key, street_norm)
+        self._fuzzy.pop(district, None)
+        self._houses.pop(district, None)
+        self._streets.pop(district, None)
+        self._signatures.pop(district, None)
+
+    def _set_aliases(self, aliases: dict):
+        for key, street_norm in self._alias_keys:
+            self._trie.remove(key, street_norm)
+        keys = []
+        for alias, target in aliases.items():
+            key, street_norm = street_key(alias), street_key(target)
+            if key and street_norm:
+                self._trie.add(key, street_norm)
+                keys.append((key, street_norm))
+        self._alias_keys = keys
+        self._aliases = dict(aliases)
+
+    # ---------- поиск ----------
+    def resolve(self, street_raw: str, building: str, district: str) -> Optional[tuple[str, str]]:
+        """(улица, дом) в написании addresses.json или None."""
+        key = street_key(street_raw)
+        house = normalize_house(building)
+        if not key or not house:
+            return None
+        with self._lock:
+            houses = self._houses.get(district)
+            if not houses:
+                return None
+            for tier in self._trie.lookup(key):
+                for street_norm in tier:
+                    found = houses.get((street_norm, house))
+                    if found:
+                        return found
+        return None
+
+    def streets(self, street_raw: str) -> list[str]:
+        """Ключи улиц, подходящие под ввод по префиксу (для отладки)."""
+        with self._lock:
+            return [s for tier in self._trie.lookup(street_key(street_raw)) for s in tier]
+
+    def suggest(self, street_raw: str, district: str, building: Optional[str] = None,
+                k: int = 5) -> list[tuple[str, Optional[str], float]]:
+        """
+        Похожие улицы района по триграммам: [(улица, дом или None, оценка), ...].
+        С building — только улицы, где такой дом есть (дом в написании addresses.json).
+        """
+        key = street_key(street_raw)
+        house = normalize_house(building) if building else None
+        if not key:
+            return []
+        with self._lock:
+            fuzzy = self._fuzzy.get(district)
+            if fuzzy is None:
+                return []
+            houses = self._houses[district]
+            names = self._streets[district]
+            allowed = (lambda s: (s, house) in houses) if house else None
+            found = fuzzy.search(key, k=k, allowed=allowed)
+            return [
+                (names[s], houses[(s, house)][1] if house else None, score)
+                for s, score in found
+            ]
+
+
+def _district_signature(streets: dict) -> int:
+    return hash(tuple(sorted(
+        (street, tuple(sorted(buildings or {}))) for street, buildings in (streets or {}).items()
+    )))
@@ -0,0 +1,74 @@
+# app/bot_requests/geocoder.py
+"""
+Локальное обратное геокодирование для бота заявок.
+
+Координаты всех подъездов уже есть в addresses.json, поэтому адрес по
+геолокации ищем у себя (app.core.geo_index), без сети:
+
+1. подъезд, в радиус которого попала точка;
+2. иначе ближайший дом не дальше GEO_BUILDING_FALLBACK_METERS;
+3. иначе (если GEO_NOMINATIM_FALLBACK=1) — Nominatim, с LRU-кешем по
+   округлённым координатам (~10 м), чтобы не упираться в лимиты OSM.
+"""
+
+from __future__ import annotations
+
+import logging
+from functools import lru_cache
+from typing import Callable, NamedTuple, Optional
+
+from geopy.geocoders import Nominatim
+
+from app.core import config
+from app.core.geo_index import GeoIndex
+
+logger = logging.getLogger(__name__)
+
+# 4 знака после запятой ≈ 11 м по широте
+NOMINATIM_ROUND_DIGITS = 4
+
+
+class GeoAddress(NamedTuple):
+    district: str
+    street: str
+    building: str
+    entrance: Optional[str]    # подъезд, в радиус которого попали; None — ближайший дом / Nominatim
+    source: str                # "entrance" | "building" | "nominatim"
+    distance: Optional[float]  # до точки подъезда, м
+
+
+class ReverseGeocoder:
+    def __init__(self, geo_index: GeoIndex,
+                 resolve: Callable[[str, str], Optional[tuple[str, str, str]]]):
+        """resolve(улица, дом) -> (район, улица, дом) в написании addresses.json — для ответа Nominatim."""
+        self.geo_index = geo_index
+        self._resolve = resolve
+        self._nominatim_cached = lru_cache(maxsize=config.GEO_NOMINATIM_CACHE_SIZE)(self._nominatim)
+
+    def locate(self, lat: float, lon: float) -> Optional[GeoAddress]:
+        match = self.geo_index.nearest_entrance(lat, lon, active_only=False)
+        if match:
+            return GeoAddress(*match.point, "entrance", match.distance)
+        match = self.geo_index.nearest(lat, lon, config.GEO_BUILDING_FALLBACK_METERS)
+        if match:
+            district, street, building, _ = match.point
+            return GeoAddress(district, street, building, None, "building", match.distance)
+        if not config.GEO_NOMINATIM_FALLBACK:
+            return None
+        try:
+            return self._nominatim_cached(round(lat, NOMINATIM_ROUND_DIGITS), round(lon, NOMINATIM_ROUND_DIGITS))
+        except Exception as e:
+            # ошибки сети не кешируются — следующая попытка снова спросит Nominatim
+            logger.warning("Nominatim reverse failed: %s", e)
+            return None
+
+    def _nominatim(self, lat: float, lon: float) -> Optional[GeoAddress]:
+        location = Nominatim(user_agent="lift-bot", timeout=10).reverse((lat, lon), language="uk")
+        address = (location.raw.get("address") or {}) if location else {}
+        road, house = address.get("road"), address.get("house_number")
+        if not road or not house:
+            return None
+        found = self._resolve(road, house)
+        if not found:
+            return None
+        return GeoAddress(*found, None, "nominatim", None)
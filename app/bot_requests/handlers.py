@@ -1,19 +1,27 @@
-import json, os, tempfile
+import json, os
 import logging
+import sqlite3
 from datetime import datetime, timedelta
+from typing import Optional
 from pytz import timezone
 from pathlib import Path
-from geopy.geocoders import Nominatim
 import telebot
 import unicodedata
 from telebot import types
-from app.bot_requests.shared import user_states, address_data, chat_action_allowed
+from app.bot_requests.shared import user_states, address_store, get_chat_action_allowed
 
 from app.bot_requests.shared import (
-    requests_list,
-    save_requests_to_db,
-    match_address,
-    clean_street_name,
+    get_request,
+    get_requests,
+    insert_request,
+    update_request,
+    transition_request,
+    attach_report,
+    reporter_ids,
+    resolve_address,
+    suggest_addresses,
+    geocoder,
+    address_registry,
     district_names,
     district_ids,
     district_phones,
@@ -23,16 +31,19 @@ from app.bot_requests.shared import (
     log_action,
     bot,
     send_push,
+    OUTBOX_BOT,
 )
+from app.core.outbox import outbox, paginate
+from app.core.address_registry import AddressUpdate
+from app.bot_requests.incidents import open_incidents, pending_reports
+from app.core import config
 
 logger = logging.getLogger(__name__)
 
 kyiv_tz = timezone("Europe/Kyiv")
 
 # и если нужно, user_states объяви в shared и импортируй сюда
-#from app.bot_requests.shared import user_states, address_data
 #from app.bot_requests.shared import chat_action_allowed
-ADDRESSES_FILE = "addresses.json"
 
 
 @bot.message_handler(commands=["start"])
@@ -54,7 +65,7 @@ def cmd_requests(msg):
 
 def make_entrance_keyboard(entrances_dict: dict):
     """
-    entrances_dict: словарь подъездов по дому из address_data[...][...][house]
+    entrances_dict: подъезды дома — address_store.entrances(district, street, house)
     """
     available = sorted({int(k) for k in entrances_dict.keys() if str(k).isdigit()})
     kb = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=5)
@@ -68,6 +79,22 @@ def make_entrance_keyboard(entrances_dict: dict):
     kb.add(types.KeyboardButton("Інший"))
     return kb
 
+def accept_address(chat_id, st, street_name: str, house: str):
+    """Адрес найден (вводом или подсказкой): проверить дом и попросить під'їзд."""
+    entrances = address_store.entrances(st["district"], street_name, house)
+    if not entrances:
+        return bot.send_message(chat_id, "❌ Такого будинку немає в базі.")
+    if all(not v.active for v in entrances.values()):
+        return bot.send_message(chat_id, "⛔️ Цей адрес не обслуговується компанією Елестек.")
+
+    with st.batch():
+        st.pop("suggestions", None)
+        st.update(address=f"{street_name}, {house}", step="enter_entrance")
+
+    # >>> ПОДСУНУТА КЛАВИАТУРА ПОДЪЕЗДОВ <<<
+    kb = make_entrance_keyboard(entrances)
+    return bot.send_message(chat_id, "Виберіть під'їзд або натисніть «Інший»:", reply_markup=kb)
+
 @bot.message_handler(func=lambda m: m.chat.type == "private", content_types=["text"])
 def handle_text(msg):
     st = user_states.get(msg.chat.id)
@@ -76,8 +103,7 @@ def handle_text(msg):
     step = st["step"]
 
     if step == "name":
-        st["name"] = " ".join(msg.text.split())
-        st["step"] = "choose_input"
+        st.update(name=" ".join(msg.text.split()), step="choose_input")
         kb = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
         kb.add("📍 Надіслати геолокацію", "✏️ Ввести адресу вручну")
         return bot.send_message(msg.chat.id, "Оберіть спосіб введення адреси:", reply_markup=kb)
@@ -96,7 +122,7 @@ def handle_text(msg):
     if step == "choose_district":
         if msg.text not in district_names:
             return bot.send_message(msg.chat.id, "❌ Невірний район, спробуйте ще.")
-        st["district"], st["step"] = msg.text, "enter_address"
+        st.update(district=msg.text, step="enter_address")
         return bot.send_message(msg.chat.id, "Введіть адресу (Лазурна 32):", reply_markup=types.ReplyKeyboardRemove())
 
     if step == "enter_address":
@@ -105,23 +131,20 @@ def handle_text(msg):
             return bot.send_message(msg.chat.id, "❌ Формат: назва вулиці + номер будинку")
         street, b_raw = " ".join(parts[:-1]), parts[-1]
         b = b_raw.upper()  # нормализация буквы в доме
-        found = match_address(street, b, st["district"])
-        if not found:
-            return bot.send_message(msg.chat.id, "❌ Адреса не знайдена, спробуйте ще.")
-
-        houses = address_data.get(st["district"], {}).get(found, {})
-        entrances = houses.get(b, {})
-        if not entrances:
-            return bot.send_message(msg.chat.id, "❌ Такого будинку немає в базі.")
-        if all(not v.get("active", True) for v in entrances.values()):
-            return bot.send_message(msg.chat.id, "⛔️ Цей адрес не обслуговується компанією Елестек.")
-
-        st["address"] = f"{found}, {b}"
-        st["step"] = "enter_entrance"
-
-        # >>> ПОДСУНУТА КЛАВИАТУРА ПОДЪЕЗДОВ <<<
-        kb = make_entrance_keyboard(entrances)
-        return bot.send_message(msg.chat.id, "Виберіть під'їзд або натисніть «Інший»:", reply_markup=kb)
+        resolved = resolve_address(street, b, st["district"])
+        if not resolved:
+            suggestions = suggest_addresses(street, b, st["district"])
+            if not suggestions:
+                return bot.send_message(msg.chat.id, "❌ Адреса не знайдена, спробуйте ще.")
+            # варианты держим в состоянии, в callback_data только номер (лимит 64 байта)
+            st["suggestions"] = [[street_name, house] for street_name, house, _ in suggestions]
+            kb = types.InlineKeyboardMarkup(row_width=1)
+            for i, (street_name, house, _) in enumerate(suggestions):
+                kb.add(types.InlineKeyboardButton(f"{street_name}, {house}", callback_data=f"addr_pick:{i}"))
+            return bot.send_message(msg.chat.id, "❓ Можливо, ви мали на увазі (або введіть адресу ще раз):", reply_markup=kb)
+
+        found, b = resolved  # написание улицы и дома как в addresses.json
+        return accept_address(msg.chat.id, st, found, b)
 
     if step == "enter_entrance":
         print("➡️ Введено під'їзд:", msg.text)
@@ -141,7 +164,7 @@ def handle_text(msg):
         st["entrance"] = entered_entrance
         try:
             street_name, house_num = st["address"].split(", ")
-            entrances = address_data.get(st["district"], {}).get(street_name, {}).get(house_num, {})
+            entrances = address_store.entrances(st["district"], street_name, house_num)
 
             if st["entrance"] not in entrances:
                 # если промахнулись — снова показать клавиатуру с доступными вариантами
@@ -149,116 +172,169 @@ def handle_text(msg):
                 bot.send_message(msg.chat.id, "❌ Такого під'їзду немає в базі. Оберіть із клавіатури або введіть вручну:", reply_markup=kb)
                 return
 
-            if not entrances[st["entrance"]].get("active", True):
+            if not entrances[st["entrance"]].active:
                 return bot.send_message(msg.chat.id, "⛔️ Цей під'їзд не обслуговується компанією Елестек.")
         except Exception as e:
             print("⛔️ Помилка перевірки під'їзду:", e)
             return bot.send_message(msg.chat.id, "❌ Помилка перевірки адреси, спробуйте ще.")
 
-        # ➡️ Перевірка на блокування адреси після ❌ (ОСТАВЛЕНО БЕЗ ИЗМЕНЕНИЙ)
+        # ➡️ Перевірка на блокування адреси після ❌
         print(f"➡️ Введено під'їзд: {st['entrance']}")
         print(f"➡️ Адреса: {st['address']}")
         print(f"➡️ Район: {st['district']}")
         print("🧾 Перевірка на блокування адреси...")
 
-        for req in requests_list:
-            if (
-                req.get("address") == st["address"] and
-                req.get("entrance") == st["entrance"] and
-                req.get("status") == "error"
-            ):
-                try:
-                    created_time = kyiv_tz.localize(datetime.strptime(req["timestamp"], "%Y-%m-%d %H:%M:%S"))
-                except Exception as e:
-                    print(f"⛔️ Помилка розбору дати: {e}")
-                    continue
-
-                print(f"🔍 Перевірка заявки: {req['address']} {req['entrance']} {req['status']}")
-                print(f"🕒 Час помилки: {req['timestamp']}")
-
-                now = datetime.now(kyiv_tz)
-                weekday = created_time.weekday()  # Пн=0, Нд=6
-                deadline = created_time + timedelta(hours=24)
-
-                if weekday in (4, 5, 6):
-                    monday = created_time + timedelta(days=(7 - weekday))
-                    deadline = monday.replace(hour=13, minute=25, second=0, microsecond=0)
-
-                if now < deadline:
-                    message = "⚠️ Необхідні документи піготуються і будуть передані управлляючій компанії або ОСББ"
-                else:
-                    message = "⚠️ Необхідні документи передані управлляючій компанії або ОСББ"
-
-                phones = "\n".join(f"📞 {n}" for n in district_phones.get(st["district"], []))
-                client_msg = f"{message}\n{phones}"
-
-                kb = types.InlineKeyboardMarkup().add(
-                    types.InlineKeyboardButton("📨 Створити нову заявку", callback_data="start")
-                )
-
-                bot.send_message(msg.chat.id, client_msg, reply_markup=kb)
-                user_states.pop(msg.chat.id, None)
-                return
+        # открытый инцидент (❌) по этому под'їзду — O(1) по индексу, см. incidents.py
+        incident = open_incidents.get(st["address"], st["entrance"])
+        if incident:
+            print(f"🔍 Відкрита заявка #{incident.req_id}, час помилки: {incident.created:%Y-%m-%d %H:%M:%S}")
+
+            if datetime.now(kyiv_tz) < incident.deadline:
+                message = "⚠️ Необхідні документи піготуються і будуть передані управлляючій компанії або ОСББ"
+            else:
+                message = "⚠️ Необхідні документи передані управлляючій компанії або ОСББ"
+
+            phones = "\n".join(f"📞 {n}" for n in district_phones.get(st["district"], []))
+            client_msg = f"{message}\n{phones}"
+
+            kb = types.InlineKeyboardMarkup().add(
+                types.InlineKeyboardButton("📨 Створити нову заявку", callback_data="start")
+            )
+
+            bot.send_message(msg.chat.id, client_msg, reply_markup=kb)
+            user_states.pop(msg.chat.id, None)
+            return
 
         st["step"] = "enter_issue"
         # убираем клавиатуру перед текстовым вводом проблемы
         return bot.send_message(msg.chat.id, "✍️ Опишіть проблему:", reply_markup=types.ReplyKeyboardRemove())
 
     if step == "enter_issue":
-        st["issue"] = msg.text
-        st["step"] = "enter_phone"
+        st.update(issue=msg.text, step="enter_phone")
         return bot.send_message(msg.chat.id, "📞 Телефон (10 цифр):")
 
     if step == "enter_phone":
         if not msg.text.isdigit() or len(msg.text) != 10:
             return bot.send_message(msg.chat.id, "❌ Має бути 10 цифр.")
-        st["phone"] = "+38" + msg.text
-        st["timestamp"] = datetime.now(kyiv_tz).strftime("%Y-%m-%d %H:%M:%S")
+        now = datetime.now(kyiv_tz)
+        st.update(phone="+38" + msg.text, timestamp=now.strftime("%Y-%m-%d %H:%M:%S"))
+        reporter = {"user_id": msg.chat.id, "name": st["name"], "phone": st["phone"],
+                    "issue": st["issue"], "timestamp": st["timestamp"]}
+        group = personnel_chats[district_ids[st["district"]]]
+        kb = types.InlineKeyboardMarkup().add(
+            types.InlineKeyboardButton("📨 Створити нову заявку", callback_data="start"))
+
+        # Той самий під'їзд уже чекає на механіка — приєднуємо дзвінок до відкритої заявки
+        merged = _coalesce_report(st, reporter, now)
+        if merged:
+            bot.send_message(
+                msg.chat.id,
+                _request_text(st) + "\n\n👥 По цьому під'їзду вже є заявка — ваше звернення додано до неї.",
+                reply_markup=kb,
+            )
+            if merged.get("chat_msg_id"):
+                outbox.edit_message_text(OUTBOX_BOT, group, int(merged["chat_msg_id"]), _group_text(merged),
+                                         reply_markup=_group_keyboard(merged["id"]))
+            _send_emergency_phones(msg.chat.id, st["district"])
+            user_states.pop(msg.chat.id)
+            return
+
         st.update(
             completed=False,
             completed_time="",
             processed_by="",
             status="pending"
         )
-        idx = len(requests_list)
-        requests_list.append(st.copy())
-
-        client_msg = (
-            "✅ <b>Заявку прийнято!</b>\n\n"
-            "📋 <b>Дані заявки:</b>\n"
-            f"👤 Ім'я: <b>{st['name']}</b>\n"
-            f"📍 Адреса: <b>{st['address']} п.{st['entrance']}</b>\n"
-            f"🏙️ Район: <b>{st['district']}</b>\n"
-            f"🔧 Проблема: {st['issue']}\n"
-            f"📱 Телефон: {st['phone']}"
-        )
-
-        kb = types.InlineKeyboardMarkup().add(
-            types.InlineKeyboardButton("📨 Створити нову заявку", callback_data="start"))
+        r = st.copy()
+        r["user_id"] = msg.chat.id
+        r["report_count"] = 1
+        r["reporters"] = [reporter]
+        # Спочатку пишемо в БД — id заявки потрібен для кнопок у групі
+        req_id = insert_request(r)
+        if req_id is None:
+            return bot.send_message(msg.chat.id, "⛔️ Не вдалося зберегти заявку, спробуйте ще раз.")
+
+        client_msg = _request_text(st)
         bot.send_message(msg.chat.id, client_msg, reply_markup=kb)
 
-        group = personnel_chats[district_ids[st["district"]]]
-        group_kb = types.InlineKeyboardMarkup()
-        group_kb.add(
-            types.InlineKeyboardButton("✅ Виконано", callback_data=f"status:done:{idx}"),
-            types.InlineKeyboardButton("🚫 Не працює", callback_data=f"status:not_working:{idx}")
-        )
-        sent = bot.send_message(group, client_msg, reply_markup=group_kb)
-        requests_list[idx]["chat_msg_id"] = sent.message_id
-        requests_list[idx]["user_id"] = msg.chat.id
-
-        save_requests_to_db()
+        sent = bot.send_message(group, client_msg, reply_markup=_group_keyboard(req_id))
+        update_request(r, chat_msg_id=sent.message_id)
         send_push("Нова заявка", f"{st['address']} — {st['issue']}")
 
-        phone_msg = "🔴🚨 <b>АВАРІЙНА СЛУЖБА</b> 🚨🔴\n\n"
-        for n in district_phones[st["district"]]:
-            phone_msg += f"📞 <a href='tel:{n}'>{n}</a>\n"
-        phone_msg += "\u0336".join("⏱️ Працюємо цілодобово!")
-        bot.send_message(msg.chat.id, phone_msg)
+        _send_emergency_phones(msg.chat.id, st["district"])
 
         user_states.pop(msg.chat.id)
 
 
+# Скільки додаткових дзвінків показувати в повідомленні групи і скільки символів опису кожного
+GROUP_REPORTERS_SHOWN = 10
+GROUP_REPORTER_ISSUE_CHARS = 200
+
+
+def _request_text(r: dict) -> str:
+    return (
+        "✅ <b>Заявку прийнято!</b>\n\n"
+        "📋 <b>Дані заявки:</b>\n"
+        f"👤 Ім'я: <b>{r['name']}</b>\n"
+        f"📍 Адреса: <b>{r['address']} п.{r['entrance']}</b>\n"
+        f"🏙️ Район: <b>{r['district']}</b>\n"
+        f"🔧 Проблема: {r['issue']}\n"
+        f"📱 Телефон: {r['phone']}"
+    )
+
+
+def _group_text(r: dict) -> str:
+    """Повідомлення заявки в групі району; з повторними дзвінками — з лічильником."""
+    text = _request_text(r)
+    count = r.get("report_count") or 1
+    if count <= 1:
+        return text
+    others = (r.get("reporters") or [])[1:]
+    lines = [_reporter_line(p, r.get("issue")) for p in others[-GROUP_REPORTERS_SHOWN:]]
+    if len(others) > GROUP_REPORTERS_SHOWN:
+        lines.insert(0, f"… та ще {len(others) - GROUP_REPORTERS_SHOWN}")
+    return text + f"\n\n👥 <b>Звернень: {count}</b>\n" + "\n".join(lines)
+
+
+def _reporter_line(p: dict, request_issue: Optional[str]) -> str:
+    """Рядок повторного дзвінка; опис проблеми — якщо відрізняється від опису заявки."""
+    line = f"📞 {p.get('name', '')} {p.get('phone', '')} ({p.get('timestamp', '')[11:16]})"
+    issue = (p.get("issue") or "").strip()
+    if issue and issue != (request_issue or "").strip():
+        if len(issue) > GROUP_REPORTER_ISSUE_CHARS:
+            issue = issue[:GROUP_REPORTER_ISSUE_CHARS - 1] + "…"
+        line += f"\n    🔧 {issue}"
+    return line
+
+
+def _group_keyboard(req_id: int) -> types.InlineKeyboardMarkup:
+    group_kb = types.InlineKeyboardMarkup()
+    group_kb.add(
+        types.InlineKeyboardButton("✅ Виконано", callback_data=f"req:done:{req_id}"),
+        types.InlineKeyboardButton("🚫 Не працює", callback_data=f"req:not_working:{req_id}")
+    )
+    return group_kb
+
+
+def _send_emergency_phones(chat_id: int, district: str):
+    phone_msg = "🔴🚨 <b>АВАРІЙНА СЛУЖБА</b> 🚨🔴\n\n"
+    for n in district_phones[district]:
+        phone_msg += f"📞 <a href='tel:{n}'>{n}</a>\n"
+    phone_msg += "\u0336".join("⏱️ Працюємо цілодобово!")
+    bot.send_message(chat_id, phone_msg)
+
+
+def _coalesce_report(st: dict, reporter: dict, now: datetime) -> Optional[dict]:
+    """Приєднати дзвінок до заявки pending по тому ж під'їзду (вікно REQUEST_COALESCE_SECONDS)."""
+    if config.REQUEST_COALESCE_SECONDS <= 0:
+        return None
+    since = (now - timedelta(seconds=config.REQUEST_COALESCE_SECONDS)).strftime("%Y-%m-%d %H:%M:%S")
+    req_id = pending_reports.find(st["address"], st["entrance"], since)
+    if req_id is None:
+        return None
+    return attach_report(req_id, reporter)
+
+
 @bot.message_handler(content_types=["location"])
 def handle_location(msg):
     chat_id = msg.chat.id
@@ -267,55 +343,34 @@ def handle_location(msg):
         return
 
     latitude, longitude = msg.location.latitude, msg.location.longitude
-    geolocator = Nominatim(user_agent="lift-bot", timeout=10)
-
     try:
-        location = geolocator.reverse((latitude, longitude), language="uk")
-        if not location or "road" not in location.raw["address"]:
-            raise ValueError("No road in address")
-
-        road_raw = location.raw["address"]["road"]
-        house_number_raw = location.raw["address"].get("house_number", "")
-        house_number = house_number_raw.upper()  # нормализация буквы дома
-        road_cleaned = clean_street_name(road_raw)
-
-        found_district = None
-        matched_street = None
-        for district, streets in address_data.items():
-            for street_name, buildings in streets.items():
-                if road_cleaned in street_name.lower():
-                    matched_street = street_name
-                    found_district = district
-                    break
-            if matched_street:
-                break
-
-        if not matched_street or not house_number:
-            return bot.send_message(chat_id, "❌ Не вдалося визначити адресу або номер будинку.\nСпробуйте ввести адресу вручну.")
-
-        entrances = address_data.get(found_district, {}).get(matched_street, {}).get(house_number, {})
-        if not entrances:
-            return bot.send_message(chat_id, "❌ Цей будинок відсутній у базі.")
-        if all(not v.get("active", True) for v in entrances.values()):
-            return bot.send_message(chat_id, "⛔️ Цей адрес не обслуговується компанією Елестек.")
-
-        state["district"] = found_district
-        state["address"] = f"{matched_street}, {house_number}"
-        state["step"] = "enter_entrance"
-
-        # >>> ПОДСУНУТА КЛАВИАТУРА ПОДЪЕЗДОВ <<<
-        kb = make_entrance_keyboard(entrances)
-        bot.send_message(chat_id, f"📍 Адреса: <b>{state['address']}</b>\n🏙️ Район: <b>{state['district']}</b>", parse_mode="HTML")
-        bot.send_message(chat_id, "Виберіть під'їзд або натисніть «Інший»:", reply_markup=kb)
-
+        found = geocoder.locate(latitude, longitude)  # локально по addresses.json, без сети
+        entrances = address_store.entrances(found.district, found.street, found.building) if found else None
     except Exception as e:
         logger.warning(f"Geolocation error: {e}")
+        found = None
+    if not found:
         bot.send_message(chat_id, "❌ Не вдалося визначити адресу за геолокацією.\nБудь ласка, введіть її вручну.")
         state["step"] = "choose_district"
         kb = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
         for d in district_names:
             kb.add(d)
-        bot.send_message(chat_id, "Оберіть район:", reply_markup=kb)
+        return bot.send_message(chat_id, "Оберіть район:", reply_markup=kb)
+
+    if not entrances:
+        return bot.send_message(chat_id, "❌ Цей будинок відсутній у базі.")
+    if all(not v.active for v in entrances.values()):
+        return bot.send_message(chat_id, "⛔️ Цей адрес не обслуговується компанією Елестек.")
+
+    state.update(district=found.district, address=f"{found.street}, {found.building}", step="enter_entrance")
+
+    text = f"📍 Адреса: <b>{state['address']}</b>\n🏙️ Район: <b>{state['district']}</b>"
+    if found.entrance:
+        text += f"\n🚪 Під'їзд поблизу: <b>{found.entrance}</b>"
+    # >>> ПОДСУНУТА КЛАВИАТУРА ПОДЪЕЗДОВ <<<
+    kb = make_entrance_keyboard(entrances)
+    bot.send_message(chat_id, text, parse_mode="HTML")
+    bot.send_message(chat_id, "Виберіть під'їзд або натисніть «Інший»:", reply_markup=kb)
         
 @bot.chat_member_handler()
 def handle_new_member(msg):
@@ -510,6 +565,21 @@ def handle_start_callback(call):
     bot.answer_callback_query(call.id)
     return cmd_start(call.message)
 
+@bot.callback_query_handler(func=lambda c: c.data.startswith("addr_pick:"))
+def cb_addr_pick(call):
+    chat_id = call.message.chat.id
+    st = user_states.get(chat_id)
+    suggestions = (st or {}).get("suggestions") or []
+    try:
+        street_name, house = suggestions[int(call.data.split(":", 1)[1])]
+    except (ValueError, IndexError):
+        return bot.answer_callback_query(call.id, "ℹ️ Підказка застаріла, введіть адресу ще раз.")
+    if st.get("step") != "enter_address":
+        return bot.answer_callback_query(call.id, "ℹ️ Підказка застаріла, введіть адресу ще раз.")
+    bot.answer_callback_query(call.id)
+    outbox.edit_message_reply_markup(OUTBOX_BOT, chat_id, call.message.message_id, reply_markup=None)
+    return accept_address(chat_id, st, street_name, house)
+
 @bot.callback_query_handler(func=lambda c: True)
 def cb(call):
     if call.data == "start":
@@ -532,15 +602,15 @@ def cb(call):
 
         # Фільтруємо заявки лише для цього району
         filtered = []
-        for i, r in enumerate(requests_list):
+        for r in get_requests():
             if district_ids[r["district"]] != section:
                 continue
             if filter_type == "pending" and not r["completed"]:
-                filtered.append((i, r))
+                filtered.append(r)
             elif filter_type == "done" and r.get("status") == "done":
-                filtered.append((i, r))
+                filtered.append(r)
             elif filter_type == "error" and r.get("status") == "error":
-                filtered.append((i, r))
+                filtered.append(r)
 
         if not filtered:
             return bot.send_message(chat_id, "❌ Немає заявок для цього району за обраним фільтром.")
@@ -552,26 +622,31 @@ def cb(call):
         }
         msg_lines = [f"<b>{status_names.get(filter_type, 'Заявки')}:</b>"]
 
-        for idx, r in filtered:
+        for r in filtered:
             url = f"https://t.me/c/{str(chat_id)[4:]}/{r['chat_msg_id']}"
             msg_lines.append(f"📍 <a href='{url}'>{r['address']} п.{r['entrance']}</a> — {r['issue']}")
 
         bot.send_message(chat_id, "\n".join(msg_lines), parse_mode="HTML", disable_web_page_preview=True)
         return
 
-    if not call.data.startswith("status:"):
-        return
-
-    _, action, idx = call.data.split(":")
-    idx = int(idx)
-    if idx >= len(requests_list):
+    if call.data.startswith("req:"):
+        _, action, req_id = call.data.split(":")
+        r = get_request(req_id)
+    elif call.data.startswith("status:"):
+        # Старі кнопки (до переходу на id) адресували заявку позицією у списку
+        _, action, idx = call.data.split(":")
+        idx = int(idx)
+        snapshot = get_requests()
+        r = snapshot[idx] if idx < len(snapshot) else None
+    else:
         return
 
-    r = requests_list[idx]
+    if not r:
+        return bot.answer_callback_query(call.id, "❌ Заявку не знайдено.")
 
     # 🔒 Перевірка дозволу на натискання кнопок
     section = district_ids.get(r["district"])
-    if not chat_action_allowed.get(section, True):
+    if not get_chat_action_allowed().get(section, True):
         rep = authorized_users.get(section, {}).get("representative")
         allowed = (
             call.from_user.id in authorized_users.get("ADMINS", []) or
@@ -582,45 +657,35 @@ def cb(call):
 
     # ✅ Виконано
     if action == "done":
-        r.update(
+        if not transition_request(
+            r, "done", from_statuses=("pending", "error"),
             completed=True,
             completed_time=datetime.now(kyiv_tz).strftime("%Y-%m-%d %H:%M:%S"),
-            processed_by=call.from_user.first_name,
-            status="done"
-        )
-        try:
-            bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id, reply_markup=None)
-        except:
-            pass
-        try:
-            bot.send_message(r["user_id"], "✅ Ваша заявка виконана.")
-        except:
-            pass
+            processed_by=call.from_user.first_name
+        ):
+            return bot.answer_callback_query(call.id, "ℹ️ Заявку вже оброблено.")
+        outbox.edit_message_reply_markup(OUTBOX_BOT, call.message.chat.id, call.message.message_id, reply_markup=None)
+        for user_id in reporter_ids(r):
+            outbox.send_message(OUTBOX_BOT, user_id, "✅ Ваша заявка виконана.")
 
     # 🚫 Не працює
     elif action == "not_working":
-        r.update(
+        if not transition_request(
+            r, "error", from_statuses=("pending",),
             completed=False,
-            processed_by=call.from_user.first_name,
-            status="error"
-        )
+            processed_by=call.from_user.first_name
+        ):
+            return bot.answer_callback_query(call.id, "ℹ️ Заявку вже оброблено.")
         # Видаляємо лише кнопку 🚫
-        try:
-            new_kb = types.InlineKeyboardMarkup()
-            new_kb.add(
-                types.InlineKeyboardButton("✅ Виконано", callback_data=f"status:done:{idx}")
-            )
-            bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id, reply_markup=new_kb)
-        except:
-            pass
-        try:
-            phones = "\n".join(f"📞 {n}" for n in district_phones[r['district']])
-            bot.send_message(r["user_id"], f"⚠️ Заявку відпрацьовано, але ліфт не працює.\n{phones}")
-        except:
-            pass
+        new_kb = types.InlineKeyboardMarkup()
+        new_kb.add(
+            types.InlineKeyboardButton("✅ Виконано", callback_data=f"req:done:{r['id']}")
+        )
+        outbox.edit_message_reply_markup(OUTBOX_BOT, call.message.chat.id, call.message.message_id, reply_markup=new_kb)
+        phones = "\n".join(f"📞 {n}" for n in district_phones.get(r["district"], []))
+        for user_id in reporter_ids(r):
+            outbox.send_message(OUTBOX_BOT, user_id, f"⚠️ Заявку відпрацьовано, але ліфт не працює.\n{phones}")
 
-    # Зберігаємо оновлення
-    save_requests_to_db()
     bot.answer_callback_query(call.id)
 
 @bot.message_handler(commands=["help"])
@@ -636,43 +701,6 @@ def cmd_help(msg):
     bot.send_message(msg.chat.id, "📋 <b>Список команд:</b>\n\n" + "\n".join(commands_list), parse_mode="HTML")
 
 
-# ADDRESSES_FILE і address_data у тебе вже є (імпорт із shared)
-# from app.bot_requests.shared import address_data, ADDRESSES_FILE, clean_street_name, personnel_chats, user_states, bot
-# ↑ переконайся, що clean_street_name імпортовано
-
-def _save_atomic(data, path):
-    """Безпечний запис JSON: спочатку у tmp-файл, потім атомарна заміна."""
-    dirpath = os.path.dirname(path) or "."
-    fd, tmp_path = tempfile.mkstemp(prefix=".addresses.", dir=dirpath)
-    try:
-        with os.fdopen(fd, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-            f.flush()
-            os.fsync(f.fileno())
-        os.replace(tmp_path, path)  # атомарна заміна
-    except Exception:
-        try:
-            os.remove(tmp_path)
-        except Exception:
-            pass
-        raise
-
-def refresh_addresses():
-    """Підтягнути актуальні адреси з файлу в address_data без створення нового об'єкта."""
-    try:
-        with open(ADDRESSES_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        address_data.clear()
-        address_data.update(data)
-    except FileNotFoundError:
-        logger.warning("ADDRESSES_FILE not found, using in-memory address_data")
-    except Exception as e:
-        logger.exception(f"Failed to refresh addresses: {e}")
-
-def save_addresses():
-    """Зберегти оновлені адреси без втрати структури."""
-    _save_atomic(address_data, ADDRESSES_FILE)
-
 @bot.message_handler(commands=["disable", "enable"])
 def cmd_disable_enable(msg):
     # ✅ лише в районних групових чатах
@@ -688,13 +716,23 @@ def cmd_disable_enable(msg):
         "✏️ Введіть адресу (наприклад: Лазурна 32 або Лазурна 32 п.1):"
     )
 
+def _parse_disable_line(text: str):
+    """'Лазурна 32 п.1' -> (вулиця, будинок, під'їзд або None); None — невірний формат."""
+    parts = text.split()
+    if len(parts) < 2:
+        return None
+    if parts[-1].lower().startswith("п."):
+        if len(parts) < 3:
+            return None
+        return " ".join(parts[:-2]), parts[-2], parts[-1][2:]
+    return " ".join(parts[:-1]), parts[-1], None
+
+
 @bot.message_handler(func=lambda m: user_states.get(m.chat.id, {}).get("step") in ("disable", "enable"))
 def handle_disable_enable(msg):
     step = user_states[msg.chat.id]["step"]
     enable = (step == "enable")
-
-    results = []
-    refresh_addresses()
+    verb = "увімкнено" if enable else "вимкнено"
 
     # определяем район по чату
     chat_id = msg.chat.id
@@ -707,74 +745,49 @@ def handle_disable_enable(msg):
     if not district_for_chat:
         return bot.send_message(chat_id, "❌ Цей чат не прив'язаний до жодного району.")
 
-    # Разбиваем сообщение по строкам (каждая строка = адрес)
-    lines = msg.text.strip().splitlines()
-    for line in lines:
+    # каждая строка = адрес; все строки разбираются через address_index и пишутся одной пачкой
+    lines, updates = [], []
+    for line in msg.text.strip().splitlines():
         text = line.strip()
         if not text:
             continue
+        parsed = _parse_disable_line(text)
+        found = None
+        if parsed:
+            street_q, house_q, entrance = parsed
+            found = resolve_address(street_q, house_q, district_for_chat)
+            if found:
+                updates.append(AddressUpdate(district_for_chat, *found, entrance, enable))
+        lines.append((text, parsed, found))
 
-        parts = text.split()
-        if len(parts) < 2:
+    try:
+        changed = address_registry.set_active_many(updates, chat_id=chat_id, user_id=msg.from_user.id)
+    except (OSError, sqlite3.Error) as e:
+        logger.exception("set_active_many failed")
+        return bot.send_message(chat_id, f"⛔️ Помилка збереження: {e}")
+
+    results = []
+    changed = iter(changed)
+    for text, parsed, found in lines:
+        if not parsed:
             results.append(f"❌ [{text}] Формат: Вулиця + Номер (і за бажанням п.Х)")
             continue
-
-        entrance = None
-        if parts[-1].lower().startswith("п."):
-            entrance = parts[-1][2:]
-            house_raw = parts[-2]
-            street_q = " ".join(parts[:-2])
-        else:
-            house_raw = parts[-1]
-            street_q = " ".join(parts[:-1])
-
-        house = house_raw.upper().strip()  # игнор регистра
-        try:
-            street_q_norm = clean_street_name(street_q)
-        except Exception:
-            street_q_norm = street_q.lower()
-
-        found = False
-        # ищем только по районам, соответствующим чату
-        streets = address_data.get(district_for_chat, {})
-        for street_name, houses in streets.items():
-            try:
-                name_norm = clean_street_name(street_name)
-            except Exception:
-                name_norm = street_name.lower()
-
-            if street_q_norm in name_norm:  # улица совпала
-                for real_house in houses.keys():
-                    if real_house.upper() == house:  # дом совпал
-                        if entrance:  # конкретный подъезд
-                            if entrance in houses[real_house]:
-                                houses[real_house][entrance]["active"] = enable
-                                results.append(
-                                    f"✅ {street_name} {real_house} п.{entrance} {'увімкнено' if enable else 'вимкнено'}"
-                                )
-                                found = True
-                            else:
-                                results.append(f"❌ {street_name} {real_house}: немає під'їзду {entrance}")
-                        else:  # весь дом
-                            for ent_key, ent_val in houses[real_house].items():
-                                if isinstance(ent_val, dict):
-                                    ent_val["active"] = enable
-                            results.append(
-                                f"✅ Усі під'їзди {street_name} {real_house} {'увімкнено' if enable else 'вимкнено'}"
-                            )
-                            found = True
-
         if not found:
             results.append(f"❌ [{text}] Такої адреси не знайдено у районі {district_for_chat}")
-
-    try:
-        save_addresses()
-    except Exception as e:
-        logger.exception("save_addresses failed")
-        return bot.send_message(chat_id, f"⛔️ Помилка збереження: {e}")
+            continue
+        street_name, real_house = found
+        entrance = parsed[2]
+        if entrance is None:
+            next(changed)
+            results.append(f"✅ Усі під'їзди {street_name} {real_house} {verb}")
+        elif next(changed):
+            results.append(f"✅ {street_name} {real_house} п.{entrance} {verb}")
+        else:
+            results.append(f"❌ {street_name} {real_house}: немає під'їзду {entrance}")
 
     # очищаем state только после успешного сейва
     user_states.pop(chat_id, None)
 
-    # Отправляем сводку по всем строкам
-    bot.send_message(chat_id, "\n".join(results))
+    # Отправляем сводку по всем строкам (длинные списки — несколькими сообщениями)
+    for page in paginate(results):
+        bot.send_message(chat_id, page)
@@ -0,0 +1,169 @@
+# app/bot_requests/incidents.py
+"""
+Индексы открытых заявок (подписаны на app.bot_requests.shared.add_request_listener).
+
+open_incidents — заявки со статусом "error" (❌ ліфт не працює).
+
+Пока по адресу есть такая заявка, новую заявку на тот же подъезд бот не
+принимает, а отвечает, что документы готовятся / переданы управляющей
+компании. IncidentIndex подписан на изменения заявок
+(app.bot_requests.shared.add_request_listener) и обновляется на каждой смене
+статуса, поэтому проверка в шаге enter_entrance стоит O(1): без прохода по
+истории заявок и без strptime на каждую. Дата и срок передачи документов
+считаются один раз, когда заявка становится инцидентом.
+
+pending_reports — необработанные заявки (pending): если жильцы того же подъезда
+звонят в пределах REQUEST_COALESCE_SECONDS от последнего звонка, звонок
+присоединяется к этой заявке (shared.attach_report), а не создаёт новую.
+
+open_by_section — все невыполненные заявки по дільниці (district_ids[район]):
+утренняя сводка send_daily — одно сообщение (страницы) на чат дільниці, и стоит
+она O(открытых заявок), а не O(истории).
+"""
+
+from __future__ import annotations
+
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Iterable, NamedTuple, Optional
+
+from pytz import timezone
+
+from app.bot_requests.shared import add_request_listener, district_ids
+
+kyiv_tz = timezone("Europe/Kyiv")
+
+INCIDENT_STATUS = "error"
+
+
+class Incident(NamedTuple):
+    req_id: int
+    created: datetime
+    deadline: datetime  # до этого момента документы «готовятся», после — «переданы»
+
+
+def incident_deadline(created: datetime) -> datetime:
+    """+24 часа; заявка с пятницы по воскресенье — понедельник 13:25."""
+    weekday = created.weekday()  # Пн=0, Нд=6
+    if weekday in (4, 5, 6):
+        monday = created + timedelta(days=(7 - weekday))
+        return monday.replace(hour=13, minute=25, second=0, microsecond=0)
+    return created + timedelta(hours=24)
+
+
+def _incident(r: dict) -> Optional[Incident]:
+    try:
+        created = kyiv_tz.localize(datetime.strptime(r["timestamp"], "%Y-%m-%d %H:%M:%S"))
+    except (KeyError, TypeError, ValueError):
+        return None
+    return Incident(r["id"], created, incident_deadline(created))
+
+
+class _RequestIndex(ABC):
+    """_key(заявка) -> {id заявки: _entry(заявка)} для заявок, у которых _entry не None."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open: dict[object, dict[int, object]] = {}
+
+    def _key(self, r: dict):
+        return r.get("address"), r.get("entrance")
+
+    @abstractmethod
+    def _entry(self, r: dict):
+        """Что хранить по заявке, или None — заявка в индекс не попадает."""
+
+    def _add(self, r: dict):
+        entry = self._entry(r)
+        if entry is not None:
+            self._open.setdefault(self._key(r), {})[r["id"]] = entry
+
+    def _remove(self, r: dict):
+        key = self._key(r)
+        entries = self._open.get(key)
+        if entries is None:
+            return
+        entries.pop(r.get("id"), None)
+        if not entries:
+            del self._open[key]
+
+    # --- listener protocol ---
+    def reset(self, requests: Iterable[dict]):
+        with self._lock:
+            self._open.clear()
+            for r in requests:
+                self._add(r)
+
+    def apply(self, old: Optional[dict], new: Optional[dict]):
+        with self._lock:
+            if old is not None:
+                self._remove(old)
+            if new is not None:
+                self._add(new)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(v) for v in self._open.values())
+
+
+class IncidentIndex(_RequestIndex):
+    """Заявки со статусом error: {id: Incident}."""
+
+    def _entry(self, r: dict) -> Optional[Incident]:
+        return _incident(r) if r.get("status") == INCIDENT_STATUS else None
+
+    def get(self, address: str, entrance: str) -> Optional[Incident]:
+        """Самый ранний открытый инцидент по подъезду или None."""
+        with self._lock:
+            incidents = self._open.get((address, entrance))
+            if not incidents:
+                return None
+            return incidents[min(incidents)]
+
+
+def last_report_at(r: dict) -> str:
+    """Время последнего звонка по заявке ('YYYY-MM-DD HH:MM:SS', сравнивается как строка)."""
+    reporters = r.get("reporters") or []
+    return (reporters[-1].get("timestamp") if reporters else None) or r.get("timestamp") or ""
+
+
+class PendingReportIndex(_RequestIndex):
+    """Необработанные заявки: {id: время последнего звонка}."""
+
+    def _entry(self, r: dict) -> Optional[str]:
+        if r.get("status", "pending") != "pending" or r.get("completed"):
+            return None
+        return last_report_at(r)
+
+    def find(self, address: str, entrance: str, since: str) -> Optional[int]:
+        """id заявки pending по подъезду с последним звонком не раньше since, или None."""
+        with self._lock:
+            reports = self._open.get((address, entrance))
+            if not reports:
+                return None
+            req_id, last = max(reports.items(), key=lambda item: item[1])
+            return req_id if last >= since else None
+
+
+class OpenBySectionIndex(_RequestIndex):
+    """Невыполненные заявки по дільниці (несколько районов — одна дільниця): {id: заявка}."""
+
+    def _key(self, r: dict):
+        return district_ids.get(r.get("district"))
+
+    def _entry(self, r: dict) -> Optional[dict]:
+        return None if r.get("completed") else r
+
+    def by_section(self) -> dict[Optional[str], list[dict]]:
+        """{дільниця: [заявки по возрастанию id]}; None — район без дільниці."""
+        with self._lock:
+            return {d: [entries[i] for i in sorted(entries)] for d, entries in self._open.items()}
+
+
+open_incidents = IncidentIndex()
+add_request_listener(open_incidents)
+pending_reports = PendingReportIndex()
+add_request_listener(pending_reports)
+open_by_section = OpenBySectionIndex()
+add_request_listener(open_by_section)
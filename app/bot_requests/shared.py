@@ -3,9 +3,14 @@
 Shared state and utilities for bot + web dashboard.
 
 Содержит:
-- общие переменные (requests_list, user_states, district_* и т.д.)
-- sqlite helper'ы: init_database, save_requests_to_db, load_requests_from_db
-- функции для адресов: match_address, clean_street_name
+- общие переменные (user_states, district_* и т.д.); заявки в памяти — request_store
+  (потокобезопасные снимки, app/bot_requests/store.py)
+- sqlite helper'ы: init_database, load_requests_from_db и построчная запись
+  insert_request / update_request / transition_request / attach_report / delete_request
+- версия данных и дельты: get_data_version, get_changes_since, sync_requests_from_db
+  (через неё процессы — бот и веб-воркеры — видят записи друг друга)
+- права нажатия кнопок в чатах дільниць (chat_rights в requests.db)
+- функции для адресов: match_address / resolve_address (индекс address_index), clean_street_name
 - создание telebot.TeleBot (читает BOT_TOKEN из окружения)
 - простые утилиты: log_action, save_authorized_users, send_push (stub)
 """
@@ -15,7 +20,6 @@ from __future__ import annotations
 import os
 import json
 import sqlite3
-import subprocess
 import logging
 from datetime import datetime
 from typing import Optional
@@ -25,6 +29,16 @@ from pytz import timezone
 # third-party
 import telebot
 
+from app.core.events import event_bus
+from app.bot_requests.store import RequestSnapshot, request_store
+from app.core.config import DATA_DIR, configure_telebot
+from app.core.state_store import StateStore
+from app.bot_requests.address_index import AddressIndex
+from app.bot_requests.geocoder import ReverseGeocoder
+from app.core.geo_index import GeoIndex
+from app.core.address_store import address_store
+from app.core.address_registry import address_registry
+
 logger = logging.getLogger(__name__)
 
 # timezone
@@ -33,19 +47,20 @@ kyiv_tz = timezone("Europe/Kyiv")
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # app/bot_requests
 PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, "..", ".."))  # repo root
-DB_PATH = os.path.join(PROJECT_ROOT, "requests.db")
-ADDRESSES_JSON = os.path.join(PROJECT_ROOT, "addresses.json")
-MAP_RU_TO_UA_JSON = os.path.join(PROJECT_ROOT, "map_ru_to_ua.json")
-AUTHORIZED_USERS_FILE = os.path.join(PROJECT_ROOT, "authorized_users.json")
-SUBS_FILE = os.path.join(PROJECT_ROOT, "subscriptions.json")
+DB_PATH = os.path.join(DATA_DIR, "requests.db")
+MAP_RU_TO_UA_JSON = os.path.join(DATA_DIR, "map_ru_to_ua.json")  # необязательные ручные алиасы улиц
+AUTHORIZED_USERS_FILE = os.path.join(DATA_DIR, "authorized_users.json")
+SUBS_FILE = os.path.join(DATA_DIR, "subscriptions.json")
+RIGHTS_FILE = os.path.join(DATA_DIR, "chat_rights.json")  # старое хранилище прав, импортируется один раз
 
 # Ensure DB_PATH directory exists (usually project root exists)
 # ---------- shared runtime state ----------
-requests_list: list[dict] = []        # основной список заявок в памяти
-user_states: dict = {}               # временные состояния пользователей (приём заявки)
+# Заявки в памяти — request_store.snapshot() (упорядочены по id, индекс по id)
+# временные состояния пользователей (приём заявки) — в requests.db, переживают рестарт
+user_states = StateStore(DB_PATH, "requests")
 
-# default control flags
-chat_action_allowed = {"участок№1": True, "участок№2": True}
+# default control flags (актуальные значения — get_chat_action_allowed(), таблица chat_rights)
+DEFAULT_CHAT_ACTION_ALLOWED = {"участок№1": True, "участок№2": True}
 
 # districts / personnel — можно править здесь
 districts = [
@@ -64,25 +79,18 @@ authorized_users: dict = {}
 # chat_rights.json / other files handled by main; тут — только helpers
 
 # ---------- Load address files (if present) ----------
-address_data: dict = {}
+# Адреса — в address_registry (addresses.json, скомпилированный в addresses.bin, общий с ботом ТО);
+# индексы ниже — его слушатели: пересобираются при смене addresses.json, /enable и /disable их не трогают
 map_ru_to_ua: dict = {}
+address_index = AddressIndex()  # trie улиц + (улица, дом) по районам, см. address_index.py
+geo_index = GeoIndex()          # сетка точек подъездов для геолокации
 
 def _load_address_files():
-    global address_data, map_ru_to_ua
-    # optional: run generator if map file missing
+    global map_ru_to_ua
+    # русское написание и опечатки покрывает address_index (свёртка RU/UA + триграммы),
+    # map_ru_to_ua.json нужен только для особых случаев ("мира" -> "Миру")
     try:
-        if not os.path.exists(MAP_RU_TO_UA_JSON) and os.path.exists(os.path.join(PROJECT_ROOT, "generate_ru_to_ua.py")):
-            subprocess.run(["python3", os.path.join(PROJECT_ROOT, "generate_ru_to_ua.py")], check=True)
-    except Exception as e:
-        logger.warning("Map generation failed: %s", e)
-
-    try:
-        if os.path.exists(ADDRESSES_JSON):
-            with open(ADDRESSES_JSON, encoding="utf-8") as f:
-                address_data = json.load(f)
-        else:
-            address_data = {}
-
+        address_registry.load()
         if os.path.exists(MAP_RU_TO_UA_JSON):
             with open(MAP_RU_TO_UA_JSON, encoding="utf-8") as f:
                 map_ru_to_ua = json.load(f)
@@ -90,8 +98,10 @@ def _load_address_files():
             map_ru_to_ua = {}
     except Exception as e:
         logger.exception("Failed to load address/map JSONs: %s", e)
-        address_data = {}
         map_ru_to_ua = {}
+    address_index.rebuild(address_store.house_tree(), map_ru_to_ua)
+    address_registry.add_listener(address_index)
+    address_registry.add_listener(geo_index)
 
 _load_address_files()
 
@@ -101,6 +111,8 @@ def init_database(db_path: Optional[str] = None):
     path = db_path or DB_PATH
     conn = sqlite3.connect(path)
     cur = conn.cursor()
+    # WAL: веб-воркеры читают, пока процесс бота пишет (режим сохраняется в файле БД)
+    cur.execute("PRAGMA journal_mode=WAL")
     cur.execute("""
         CREATE TABLE IF NOT EXISTS requests (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -116,65 +128,533 @@ def init_database(db_path: Optional[str] = None):
             processed_by TEXT,
             chat_msg_id TEXT,
             status TEXT DEFAULT 'pending',
-            user_id INTEGER
+            user_id INTEGER,
+            rev INTEGER DEFAULT 0,
+            report_count INTEGER DEFAULT 1,
+            reporters TEXT DEFAULT ''
+        )
+    """)
+    # Версия данных: растёт на каждой записи, rev строки = версия её последнего изменения
+    cur.execute("PRAGMA table_info(requests)")
+    existing = [c[1] for c in cur.fetchall()]
+    if "rev" not in existing:
+        cur.execute("ALTER TABLE requests ADD COLUMN rev INTEGER DEFAULT 0")
+    # Повторные звонки по той же заявке: число и JSON-список звонивших (attach_report)
+    if "report_count" not in existing:
+        cur.execute("ALTER TABLE requests ADD COLUMN report_count INTEGER DEFAULT 1")
+    if "reporters" not in existing:
+        cur.execute("ALTER TABLE requests ADD COLUMN reporters TEXT DEFAULT ''")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_requests_rev ON requests(rev)")
+    # Индексы для фильтров/сортировки дашборда (app/requests/services.py)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_requests_status_ts ON requests(status, timestamp)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_requests_district_ts ON requests(district, timestamp)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_requests_address_entrance ON requests(address, entrance)")
+    # Открытые инциденты проверяются по индексу в памяти (app/bot_requests/incidents.py),
+    # частичный индекс в БД никто не читал — только удорожал запись
+    cur.execute("DROP INDEX IF EXISTS idx_requests_open_incidents")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS requests_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER
+        )
+    """)
+    cur.execute("INSERT OR IGNORE INTO requests_meta (key, value) VALUES ('version', 0)")
+    # Надгробия удалённых заявок — чтобы дельта (?since=) видела удаления
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS requests_deleted (
+            id INTEGER PRIMARY KEY,
+            rev INTEGER
+        )
+    """)
+    # Дневные агрегаты для аналитики за длинные периоды (ведутся в тех же транзакциях, что и requests)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS requests_daily_rollup (
+            day TEXT NOT NULL,
+            district TEXT NOT NULL,
+            status TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            completed_count INTEGER NOT NULL DEFAULT 0,
+            complete_seconds INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, district, status, hour)
         )
     """)
+    # Права нажатия кнопок по дільницям — общие для бота и веба
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS chat_rights (
+            section TEXT PRIMARY KEY,
+            allowed INTEGER NOT NULL DEFAULT 1
+        )
+    """)
+    if not cur.execute("SELECT 1 FROM chat_rights LIMIT 1").fetchone():
+        rights = dict(DEFAULT_CHAT_ACTION_ALLOWED)
+        try:
+            if os.path.exists(RIGHTS_FILE):
+                with open(RIGHTS_FILE, encoding="utf-8") as f:
+                    rights.update(json.load(f))
+        except Exception:
+            logger.exception("Failed to import %s", RIGHTS_FILE)
+        cur.executemany(
+            "INSERT INTO chat_rights (section, allowed) VALUES (?, ?)",
+            [(section, int(bool(allowed))) for section, allowed in rights.items()],
+        )
     conn.commit()
+    has_rollup = cur.execute("SELECT 1 FROM requests_daily_rollup LIMIT 1").fetchone()
+    has_requests = cur.execute("SELECT 1 FROM requests LIMIT 1").fetchone()
+    if has_requests and not has_rollup:
+        rebuild_daily_rollup(conn)
+        conn.commit()
     conn.close()
     logger.info("Initialized database at %s", path)
 
-def save_requests_to_db(db_path: Optional[str] = None):
-    """Overwrite requests table with current requests_list."""
+# ---------- Daily rollup ----------
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Поля, от которых зависит вклад заявки в requests_daily_rollup
+ROLLUP_FIELDS = ("timestamp", "district", "status", "completed", "completed_time")
+
+def _rollup_contribution(r: dict) -> Optional[tuple]:
+    """(day, district, status, hour, completed_count, complete_seconds) или None, если дата не разобрана."""
+    ts = r.get("timestamp") or ""
+    try:
+        created = datetime.strptime(ts, TS_FORMAT)
+    except ValueError:
+        return None
+    completed_count, seconds = 0, 0
+    if r.get("completed") and r.get("completed_time"):
+        try:
+            seconds = int((datetime.strptime(r["completed_time"], TS_FORMAT) - created).total_seconds())
+            completed_count = 1
+        except ValueError:
+            pass
+    return (ts[:10], r.get("district") or "", r.get("status") or "pending", created.hour,
+            completed_count, max(seconds, 0))
+
+def _rollup_apply(conn, r: dict, sign: int):
+    c = _rollup_contribution(r)
+    if c is None:
+        return
+    day, district, status, hour, completed_count, seconds = c
+    conn.execute("""
+        INSERT INTO requests_daily_rollup (day, district, status, hour, count, completed_count, complete_seconds)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (day, district, status, hour) DO UPDATE SET
+            count = count + excluded.count,
+            completed_count = completed_count + excluded.completed_count,
+            complete_seconds = complete_seconds + excluded.complete_seconds
+    """, (day, district, status, hour, sign, sign * completed_count, sign * seconds))
+
+def rebuild_daily_rollup(conn=None):
+    """Пересчитать requests_daily_rollup целиком одним GROUP BY (бэкфилл / после полной перезаписи)."""
+    own = conn is None
+    if own:
+        conn = sqlite3.connect(DB_PATH)
+    try:
+        conn.execute("DELETE FROM requests_daily_rollup")
+        conn.execute("""
+            INSERT INTO requests_daily_rollup (day, district, status, hour, count, completed_count, complete_seconds)
+            SELECT substr(timestamp, 1, 10),
+                   COALESCE(district, ''),
+                   COALESCE(NULLIF(status, ''), 'pending'),
+                   CAST(substr(timestamp, 12, 2) AS INTEGER),
+                   COUNT(*),
+                   SUM(CASE WHEN completed AND completed_time LIKE '____-__-__ __:__:__' THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN completed AND completed_time LIKE '____-__-__ __:__:__'
+                       THEN MAX(CAST(strftime('%s', completed_time) AS INTEGER)
+                                - CAST(strftime('%s', timestamp) AS INTEGER), 0)
+                       ELSE 0 END)
+            FROM requests
+            WHERE timestamp LIKE '____-__-__ __:__:__'
+            GROUP BY 1, 2, 3, 4
+        """)
+        if own:
+            conn.commit()
+        logger.info("Rebuilt requests_daily_rollup")
+    finally:
+        if own:
+            conn.close()
+
+# Колонки таблицы requests (кроме id), в порядке INSERT
+REQUEST_COLUMNS = (
+    "name", "district", "address", "entrance", "issue", "phone",
+    "timestamp", "completed", "completed_time", "processed_by",
+    "chat_msg_id", "status", "user_id", "report_count", "reporters",
+)
+
+def _column_value(r: dict, col: str):
+    if col == "completed":
+        return int(bool(r.get("completed", False)))
+    if col == "status":
+        return r.get("status", "pending")
+    if col == "user_id":
+        return r.get("user_id", 0)
+    if col == "report_count":
+        return int(r.get("report_count") or 1)
+    if col == "reporters":
+        return json.dumps(r.get("reporters") or [], ensure_ascii=False)
+    return r.get(col, "")
+
+def row_to_request(columns: list[str], row) -> dict:
+    r = dict(zip(columns, row))
+    if not r.get("status"):
+        r["status"] = "pending"
+    # sqlite stores completed as 0/1 possibly; normalize
+    r["completed"] = bool(r.get("completed", False))
+    r["report_count"] = r.get("report_count") or 1
+    try:
+        r["reporters"] = json.loads(r.get("reporters") or "[]")
+    except ValueError:
+        r["reporters"] = []
+    return r
+
+def _read_version(conn) -> int:
+    row = conn.execute("SELECT value FROM requests_meta WHERE key = 'version'").fetchone()
+    return row[0] if row else 0
+
+def _next_version(conn) -> int:
+    """Увеличить версию данных внутри текущей транзакции записи."""
+    conn.execute("UPDATE requests_meta SET value = value + 1 WHERE key = 'version'")
+    return _read_version(conn)
+
+def add_request_listener(listener):
+    """Подписать listener на изменения заявок (reset(requests) / apply(old, new)).
+
+    apply вызывается после успешной записи: old=None — создание, new=None — удаление.
+    """
+    request_store.add_listener(listener)
+
+def _publish(event_type: str, r: dict, version: int):
+    """Событие для живых обновлений дашборда/аналитики (SSE /events)."""
+    event_bus.publish(event_type, {
+        "id": r.get("id"),
+        "status": r.get("status", "pending"),
+        "district": r.get("district", ""),
+        "version": version,
+    })
+
+def get_data_version(db_path: Optional[str] = None) -> int:
+    """Текущая версия данных в БД (дешёвый SELECT по первичному ключу)."""
     path = db_path or DB_PATH
     conn = sqlite3.connect(path)
-    cur = conn.cursor()
     try:
-        cur.execute("DELETE FROM requests")
-        for r in requests_list:
-            cur.execute("""
-                INSERT INTO requests (
-                    name, district, address, entrance, issue, phone,
-                    timestamp, completed, completed_time, processed_by,
-                    chat_msg_id, status, user_id
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                r.get("name", ""), r.get("district", ""), r.get("address", ""),
-                r.get("entrance", ""), r.get("issue", ""), r.get("phone", ""),
-                r.get("timestamp", ""), int(bool(r.get("completed", False))),
-                r.get("completed_time", ""), r.get("processed_by", ""),
-                r.get("chat_msg_id", ""), r.get("status", "pending"),
-                r.get("user_id", 0)
-            ))
+        return _read_version(conn)
+    finally:
+        conn.close()
+
+def insert_request(r: dict, db_path: Optional[str] = None) -> Optional[int]:
+    """INSERT новой заявки и публикация её в request_store. Проставляет r["id"]."""
+    path = db_path or DB_PATH
+    with request_store.lock:
+        conn = sqlite3.connect(path)
+        try:
+            version = _next_version(conn)
+            cur = conn.execute(
+                f"INSERT INTO requests ({', '.join(REQUEST_COLUMNS)}, rev) "
+                f"VALUES ({', '.join('?' for _ in REQUEST_COLUMNS)}, ?)",
+                (*(_column_value(r, c) for c in REQUEST_COLUMNS), version),
+            )
+            _rollup_apply(conn, r, +1)
+            conn.commit()
+        except Exception:
+            logger.exception("Failed to insert request")
+            return None
+        finally:
+            conn.close()
+        r["id"] = cur.lastrowid
+        stored = {**r, "rev": version}
+        request_store.put(stored, version)
+    _publish("request_created", stored, version)
+    return stored["id"]
+
+def _write_update(req_id, make_fields, path: str) -> Optional[dict]:
+    """UPDATE только изменённых колонок; вызывается под request_store.lock.
+
+    Снимок в памяти может отставать от БД (заявку мог изменить другой процесс),
+    поэтому строка перечитывается внутри BEGIN IMMEDIATE: make_fields(current)
+    получает её и возвращает поля для записи или None — отказ. Проверки и дельта
+    requests_daily_rollup считаются по строке из БД, UPDATE — только при неизменном rev.
+    None — заявки нет, отказ или ошибка.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        cur = conn.execute("SELECT * FROM requests WHERE id = ?", (req_id,))
+        row = cur.fetchone()
+        if row is None:
+            conn.rollback()
+            logger.warning("Request %s not found in DB", req_id)
+            return None
+        current = row_to_request([d[0] for d in cur.description], row)
+        _refresh_from_db(current)
+        fields = make_fields(current)
+        if fields is None:
+            conn.rollback()
+            return None
+        new = {**current, **fields}
+        cols = [c for c in fields if c in REQUEST_COLUMNS]
+        if not cols:
+            conn.rollback()
+            return current
+        version = _next_version(conn)
+        cur = conn.execute(
+            f"UPDATE requests SET {', '.join(f'{c} = ?' for c in cols)}, rev = ? WHERE id = ? AND rev IS ?",
+            (*(_column_value(new, c) for c in cols), version, req_id, current.get("rev")),
+        )
+        if cur.rowcount == 0:
+            conn.rollback()
+            return None
+        if any(c in ROLLUP_FIELDS for c in cols):
+            _rollup_apply(conn, current, -1)
+            _rollup_apply(conn, new, +1)
         conn.commit()
     except Exception:
-        logger.exception("Failed to save requests to DB")
+        logger.exception("Failed to update request %s", req_id)
+        return None
     finally:
         conn.close()
+    new["rev"] = version
+    request_store.put(new, version)
+    _publish("status_changed" if "status" in fields or "completed" in fields else "request_updated", new, version)
+    return new
+
+def _refresh_from_db(current: dict):
+    """Подтянуть в request_store строку, прочитанную из БД, если снимок её ещё не видел."""
+    stored = request_store.get(current["id"])
+    if stored is None or stored.get("rev") != current.get("rev"):
+        request_store.put(current, current.get("rev") or 0)
+
+def update_request(r, db_path: Optional[str] = None, **fields) -> Optional[dict]:
+    """Записать fields в заявку (dict или id) и вернуть её новую версию (None — ошибка).
+
+    Поля применяются к актуальной строке из БД, а не к переданному dict,
+    поэтому параллельные изменения других полей не теряются.
+    """
+    req_id = r.get("id") if isinstance(r, dict) else r
+    if req_id is None:
+        logger.error("update_request: request has no id, nothing to update")
+        return None
+    with request_store.lock:
+        return _write_update(req_id, lambda current: fields, db_path or DB_PATH)
+
+def transition_request(r, status: str, from_statuses: Optional[tuple] = None,
+                       db_path: Optional[str] = None, **fields) -> Optional[dict]:
+    """Атомарная смена статуса: применяется, только если текущий статус (в БД) в from_statuses.
+
+    Возвращает новую версию заявки или None, если заявки нет / статус уже сменили
+    (например, две кнопки «Виконано» нажаты одновременно в боте и на сайте).
+    """
+    req_id = r.get("id") if isinstance(r, dict) else r
+
+    def make_fields(current: dict) -> Optional[dict]:
+        if from_statuses is not None and current.get("status", "pending") not in from_statuses:
+            return None
+        return {**fields, "status": status}
+
+    with request_store.lock:
+        return _write_update(req_id, make_fields, db_path or DB_PATH)
+
+def attach_report(r, reporter: dict, db_path: Optional[str] = None) -> Optional[dict]:
+    """Присоединить повторный звонок (reporter: user_id, name, phone, issue, timestamp) к открытой заявке.
+
+    Возвращает новую версию заявки или None, если её нет / она уже не pending —
+    тогда звонок оформляется отдельной заявкой.
+    """
+    req_id = r.get("id") if isinstance(r, dict) else r
+
+    def make_fields(current: dict) -> Optional[dict]:
+        if current.get("status", "pending") != "pending":
+            return None
+        return {
+            "report_count": (current.get("report_count") or 1) + 1,
+            "reporters": [*(current.get("reporters") or []), reporter],
+        }
+
+    with request_store.lock:
+        return _write_update(req_id, make_fields, db_path or DB_PATH)
+
+def reporter_ids(r: dict) -> list:
+    """chat_id всех, кто звонил по заявке (первый — автор), без повторов."""
+    ids = [p.get("user_id") for p in (r.get("reporters") or [])] or [r.get("user_id")]
+    return [i for i in dict.fromkeys(ids) if i]
+
+def delete_request(r, db_path: Optional[str] = None) -> bool:
+    """DELETE заявки (dict или id) и удаление её из request_store."""
+    req_id = r.get("id") if isinstance(r, dict) else r
+    path = db_path or DB_PATH
+    with request_store.lock:
+        conn = sqlite3.connect(path)
+        try:
+            # вклад в rollup снимаем по строке из БД, а не по (возможно отставшему) снимку
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.execute("SELECT * FROM requests WHERE id = ?", (req_id,))
+            row = cur.fetchone()
+            if row is None:
+                conn.rollback()
+                return False
+            current = row_to_request([d[0] for d in cur.description], row)
+            version = _next_version(conn)
+            conn.execute("DELETE FROM requests WHERE id = ?", (req_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO requests_deleted (id, rev) VALUES (?, ?)",
+                (req_id, version),
+            )
+            _rollup_apply(conn, current, -1)
+            conn.commit()
+        except Exception:
+            logger.exception("Failed to delete request %s", req_id)
+            return False
+        finally:
+            conn.close()
+        request_store.remove(req_id, version)
+    _publish("request_deleted", current, version)
+    return True
+
+def get_request(req_id) -> Optional[dict]:
+    """Заявка по id (O(1)) или None. Dict из снимка — только для чтения."""
+    return request_store.get(req_id)
+
+def get_requests() -> RequestSnapshot:
+    """Все заявки (неизменяемый снимок, по возрастанию id; итерация, len, индекс) — без блокировок."""
+    return request_store.snapshot().requests
+
+def save_requests_to_db(requests: Optional[list[dict]] = None, db_path: Optional[str] = None):
+    """Overwrite requests table with requests (по умолчанию — текущий снимок).
+
+    Полная перезапись, O(N) — оставлено для миграций/восстановления.
+    В рабочем коде используйте insert_request / update_request / delete_request.
+    """
+    path = db_path or DB_PATH
+    with request_store.lock:
+        if requests is None:
+            requests = request_store.snapshot().requests
+        conn = sqlite3.connect(path)
+        cur = conn.cursor()
+        try:
+            version = _next_version(conn)
+            keep = {r.get("id") for r in requests}
+            cur.execute("SELECT id FROM requests")
+            gone = [(row[0], version) for row in cur.fetchall() if row[0] not in keep]
+            cur.executemany("INSERT OR REPLACE INTO requests_deleted (id, rev) VALUES (?, ?)", gone)
+            cur.execute("DELETE FROM requests")
+            saved = []
+            for r in requests:
+                # id сохраняем, чтобы не сломать ссылки на заявки; None -> AUTOINCREMENT
+                cur.execute(
+                    f"INSERT INTO requests (id, {', '.join(REQUEST_COLUMNS)}, rev) "
+                    f"VALUES (?, {', '.join('?' for _ in REQUEST_COLUMNS)}, ?)",
+                    (r.get("id"), *(_column_value(r, c) for c in REQUEST_COLUMNS), version),
+                )
+                saved.append({**r, "id": cur.lastrowid, "rev": version})
+            rebuild_daily_rollup(conn)
+            conn.commit()
+            request_store.replace_all(saved, version)
+        except Exception:
+            logger.exception("Failed to save requests to DB")
+        finally:
+            conn.close()
 
-def load_requests_from_db(db_path: Optional[str] = None) -> list[dict]:
-    """Load requests from DB into requests_list (in-memory)."""
+def load_requests_from_db(db_path: Optional[str] = None) -> RequestSnapshot:
+    """Load requests from DB into request_store; возвращает новый снимок заявок."""
+    path = db_path or DB_PATH
+    with request_store.lock:
+        conn = sqlite3.connect(path)
+        cur = conn.cursor()
+        try:
+            # версию читаем до SELECT: запись между ними просто придёт ещё раз дельтой
+            version = _read_version(conn)
+            cur.execute("SELECT * FROM requests ORDER BY id")
+            columns = [d[0] for d in cur.description]
+            request_store.replace_all((row_to_request(columns, row) for row in cur.fetchall()), version)
+            logger.info("Loaded %d requests from DB", len(request_store.snapshot()))
+            return request_store.snapshot().requests
+        except sqlite3.Error:
+            logger.exception("DB load error, reinitializing DB")
+            init_database(path)
+            return ()
+        finally:
+            conn.close()
+
+def get_changes_since(since: int, db_path: Optional[str] = None) -> tuple[int, list[dict], list[int]]:
+    """Заявки, изменённые после версии since, и id удалённых: (version, changed, deleted_ids)."""
     path = db_path or DB_PATH
     conn = sqlite3.connect(path)
     cur = conn.cursor()
     try:
-        cur.execute("SELECT * FROM requests ORDER BY id")
-        rows = cur.fetchall()
+        version = _read_version(conn)
+        if version == since:
+            return version, [], []
+        cur.execute("SELECT * FROM requests WHERE rev > ? ORDER BY id", (since,))
         columns = [d[0] for d in cur.description]
-        requests_list.clear()
-        for row in rows:
-            r = dict(zip(columns, row))
-            r.pop("id", None)
-            if not r.get("status"):
-                r["status"] = "pending"
-            # sqlite stores completed as 0/1 possibly; normalize
-            r["completed"] = bool(r.get("completed", False))
-            requests_list.append(r)
-        logger.info("Loaded %d requests from DB", len(requests_list))
-        return requests_list
+        changed = [row_to_request(columns, row) for row in cur.fetchall()]
+        cur.execute("SELECT id FROM requests_deleted WHERE rev > ?", (since,))
+        deleted = [row[0] for row in cur.fetchall()]
+        return version, changed, deleted
+    finally:
+        conn.close()
+
+def sync_requests_from_db(db_path: Optional[str] = None) -> int:
+    """Подтянуть в request_store только изменения из БД, если версия данных сменилась.
+
+    Возвращает версию данных, до которой синхронизирован request_store.
+    """
+    loaded = request_store.version
+    try:
+        if get_data_version(db_path) == loaded:
+            return loaded
     except sqlite3.Error:
-        logger.exception("DB load error, reinitializing DB")
-        init_database(path)
-        return []
+        logger.exception("Failed to read data version")
+        return loaded
+    with request_store.lock:
+        loaded = request_store.version
+        try:
+            version, changed, deleted = get_changes_since(loaded, db_path)
+        except sqlite3.Error:
+            logger.exception("Failed to read request changes")
+            return loaded
+        if version == loaded:
+            return loaded
+        events = request_store.apply_changes(changed, deleted, version)
+    # записи других процессов — в локальную шину событий (SSE этого воркера)
+    for old, new in events:
+        if old is None:
+            _publish("request_created", new, version)
+        elif new is None:
+            _publish("request_deleted", old, version)
+        elif (old.get("status"), old.get("completed")) != (new.get("status"), new.get("completed")):
+            _publish("status_changed", new, version)
+        else:
+            _publish("request_updated", new, version)
+    logger.info("Synced %d changed / %d deleted requests (version %d)", len(changed), len(deleted), version)
+    return version
+
+# ---------- Chat rights ----------
+def get_chat_action_allowed(db_path: Optional[str] = None) -> dict:
+    """{section: bool} — можно ли нажимать кнопки заявок в чате дільниці."""
+    path = db_path or DB_PATH
+    conn = sqlite3.connect(path)
+    try:
+        rights = dict(DEFAULT_CHAT_ACTION_ALLOWED)
+        rights.update((section, bool(allowed)) for section, allowed in conn.execute("SELECT section, allowed FROM chat_rights"))
+        return rights
+    except sqlite3.Error:
+        logger.exception("Failed to read chat rights")
+        return dict(DEFAULT_CHAT_ACTION_ALLOWED)
+    finally:
+        conn.close()
+
+def set_chat_action_allowed(section: str, allowed: bool, db_path: Optional[str] = None) -> bool:
+    path = db_path or DB_PATH
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(
+            "INSERT INTO chat_rights (section, allowed) VALUES (?, ?) "
+            "ON CONFLICT (section) DO UPDATE SET allowed = excluded.allowed",
+            (section, int(bool(allowed))),
+        )
+        conn.commit()
+        return True
+    except sqlite3.Error:
+        logger.exception("Failed to save chat rights for %s", section)
+        return False
     finally:
         conn.close()
 
@@ -192,36 +672,33 @@ def clean_street_name(name: str) -> str:
         s = s.replace(w, "")
     return s.strip()
 
-def match_address(street_raw: str, building: str, district: str) -> Optional[str]:
-    """Try to match user input street+building to full street name from address_data using map_ru_to_ua."""
+def resolve_address(street_raw: str, building: str, district: str) -> Optional[tuple[str, str]]:
+    """(улица, дом) в написании addresses.json для ввода пользователя или None."""
     if not street_raw:
         return None
-    street_key = street_raw.lower().strip()
-    ua_name = map_ru_to_ua.get(street_key)
-    if not ua_name:
-        for k, v in map_ru_to_ua.items():
-            if street_key.startswith(k) or k.startswith(street_key):
-                ua_name = v
-                break
-    if not ua_name:
-        # fallback: maybe cleaned street matches part of keys
-        for full in address_data.get(district, {}):
-            if street_key in full.lower():
-                ua_name = full
-                break
-    if not ua_name:
-        return None
+    return address_index.resolve(street_raw, building, district)
 
-    b_norm = building.lower()
-    for full, houses in address_data.get(district, {}).items():
-        try:
-            houses_lower = [h.lower() for h in houses]
-        except Exception:
-            houses_lower = []
-        if ua_name.lower() in full.lower() and b_norm in houses_lower:
-            return full
+def suggest_addresses(street_raw: str, building: str, district: str, k: int = 5) -> list[tuple[str, str, float]]:
+    """Похожие адреса района с таким домом: [(улица, дом, оценка), ...] — для кнопок «Можливо, ви мали на увазі»."""
+    if not street_raw:
+        return []
+    return address_index.suggest(street_raw, district, building, k=k)
+
+def resolve_address_any(street_raw: str, building: str) -> Optional[tuple[str, str, str]]:
+    """(район, улица, дом) для адреса без известного района (ответ Nominatim)."""
+    for district in address_store.districts():
+        found = resolve_address(street_raw, building, district)
+        if found:
+            return (district, *found)
     return None
 
+def match_address(street_raw: str, building: str, district: str) -> Optional[str]:
+    """Try to match user input street+building to full street name (address_index)."""
+    found = resolve_address(street_raw, building, district)
+    return found[0] if found else None
+
+geocoder = ReverseGeocoder(geo_index, resolve_address_any)
+
 # ---------- Authorized users helpers ----------
 def save_authorized_users():
     try:
@@ -264,7 +741,10 @@ BOT_TOKEN = os.environ.get("BOT_TOKEN_REQUESTS") or ""
 if not BOT_TOKEN:
     logger.warning("BOT_TOKEN_REQUESTS not set — bot will not be able to run without a token")
 
+configure_telebot()  # TELEGRAM_API_URL (локальный Bot API / фейковый сервер в тестах)
 bot = telebot.TeleBot(BOT_TOKEN, parse_mode="HTML")
+# Имя этого бота в исходящей очереди (app.core.outbox)
+OUTBOX_BOT = "requests"
 
 # ---------- Convenience initialization ----------
 # Initialize DB file if needed
@@ -274,10 +754,14 @@ load_requests_from_db()
 
 # Export names for from app.bot_requests.shared import *
 __all__ = [
-    "bot", "requests_list", "user_states",
+    "bot", "OUTBOX_BOT", "request_store", "get_request", "get_requests", "user_states",
     "save_requests_to_db", "load_requests_from_db", "init_database",
-    "match_address", "clean_street_name",
+    "insert_request", "update_request", "transition_request", "attach_report", "reporter_ids", "delete_request",
+    "get_data_version", "get_changes_since", "sync_requests_from_db",
+    "add_request_listener", "get_chat_action_allowed", "set_chat_action_allowed",
+    "match_address", "resolve_address", "suggest_addresses", "clean_street_name",
+    "address_index", "address_registry", "resolve_address_any", "geo_index", "geocoder",
     "district_names", "district_ids", "district_phones", "personnel_chats",
     "authorized_users", "save_authorized_users", "log_action", "send_push",
-    "address_data", "map_ru_to_ua", "kyiv_tz", "DB_PATH", "PROJECT_ROOT"
+    "address_store", "map_ru_to_ua", "kyiv_tz", "DB_PATH", "PROJECT_ROOT"
 ]
@@ -0,0 +1,238 @@
+# app/bot_requests/store.py
+"""
+Потокобезопасное хранилище заявок в памяти.
+
+Заявки читают одновременно поток polling'а бота, потоки Flask/gunicorn и планировщик,
+поэтому данные публикуются неизменяемыми снимками (copy-on-write):
+
+- читатели берут request_store.snapshot() без блокировок и работают с ним сколько угодно;
+- писатели (insert / update / delete / sync в app.bot_requests.shared) берут
+  request_store.lock, пишут в БД и публикуют новый снимок одной заменой ссылки.
+
+Словари заявок внутри снимка нельзя менять на месте: изменение = новый dict
+в новом снимке. Старый снимок у читателя остаётся согласованным.
+
+Снимок хранит заявки кусками (chunk'ами) по CHUNK_SIZE, упорядоченными по id.
+Запись копирует только затронутый кусок и кортеж ссылок на куски, а не все N
+заявок: нажатие кнопки статуса стоит O(CHUNK_SIZE + N / CHUNK_SIZE), поиск по id —
+O(log N) двумя bisect, снимок для читателя — O(1) (это просто ссылка).
+"""
+
+from __future__ import annotations
+
+import bisect
+import itertools
+import logging
+import threading
+from typing import Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256  # целевой размер куска; кусок длиннее 2 * CHUNK_SIZE делится пополам
+
+
+def _by_id(r: dict) -> int:
+    return r["id"]
+
+
+class RequestSnapshot:
+    """Неизменяемый срез заявок по возрастанию id: кортеж кусков + id первой заявки каждого куска."""
+
+    __slots__ = ("_chunks", "_firsts", "_offsets", "version")
+
+    def __init__(self, chunks: tuple = (), version: int = 0):
+        self._chunks = chunks
+        self._firsts = tuple(c[0]["id"] for c in chunks)
+        self._offsets = tuple(itertools.accumulate((len(c) for c in chunks), initial=0))
+        self.version = version
+
+    @classmethod
+    def from_sorted(cls, requests: Iterable[dict], version: int = 0) -> "RequestSnapshot":
+        items = list(requests)
+        return cls(tuple(tuple(items[i:i + CHUNK_SIZE]) for i in range(0, len(items), CHUNK_SIZE)), version)
+
+    @property
+    def requests(self) -> "RequestSnapshot":
+        """Сам снимок — последовательность заявок (итерация, len, индекс)."""
+        return self
+
+    def get(self, req_id) -> Optional[dict]:
+        try:
+            req_id = int(req_id)
+        except (TypeError, ValueError):
+            return None
+        i = bisect.bisect_right(self._firsts, req_id) - 1
+        if i < 0:
+            return None
+        chunk = self._chunks[i]
+        j = bisect.bisect_left(chunk, req_id, key=_by_id)
+        return chunk[j] if j < len(chunk) and chunk[j]["id"] == req_id else None
+
+    def __iter__(self) -> Iterator[dict]:
+        return itertools.chain.from_iterable(self._chunks)
+
+    def __len__(self) -> int:
+        return self._offsets[-1]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return tuple(self)[idx]
+        n = len(self)
+        if idx < 0:
+            idx += n
+        if not 0 <= idx < n:
+            raise IndexError("request index out of range")
+        i = bisect.bisect_right(self._offsets, idx) - 1
+        return self._chunks[i][idx - self._offsets[i]]
+
+
+class _Chunks:
+    """Изменяемая копия списка кусков для одной записи (сами куски копируются только при изменении)."""
+
+    def __init__(self, snap: RequestSnapshot):
+        self.chunks = list(snap._chunks)
+        self.firsts = list(snap._firsts)
+
+    def put(self, r: dict) -> Optional[dict]:
+        req_id = r["id"]
+        if not self.chunks:
+            self.chunks.append((r,))
+            self.firsts.append(req_id)
+            return None
+        i = max(bisect.bisect_right(self.firsts, req_id) - 1, 0)
+        chunk = self.chunks[i]
+        j = bisect.bisect_left(chunk, req_id, key=_by_id)
+        if j < len(chunk) and chunk[j]["id"] == req_id:
+            self.chunks[i] = chunk[:j] + (r,) + chunk[j + 1:]
+            return chunk[j]
+        if j == len(chunk) and i == len(self.chunks) - 1 and len(chunk) >= CHUNK_SIZE:
+            # новые заявки идут по возрастанию id — начинаем новый кусок, старый не копируем
+            self.chunks.append((r,))
+            self.firsts.append(req_id)
+            return None
+        chunk = chunk[:j] + (r,) + chunk[j:]
+        if len(chunk) > 2 * CHUNK_SIZE:
+            half = len(chunk) // 2
+            self.chunks[i:i + 1] = [chunk[:half], chunk[half:]]
+            self.firsts[i:i + 1] = [chunk[0]["id"], chunk[half]["id"]]
+        else:
+            self.chunks[i] = chunk
+            self.firsts[i] = chunk[0]["id"]
+        return None
+
+    def remove(self, req_id: int) -> Optional[dict]:
+        i = bisect.bisect_right(self.firsts, req_id) - 1
+        if i < 0:
+            return None
+        chunk = self.chunks[i]
+        j = bisect.bisect_left(chunk, req_id, key=_by_id)
+        if j == len(chunk) or chunk[j]["id"] != req_id:
+            return None
+        old = chunk[j]
+        chunk = chunk[:j] + chunk[j + 1:]
+        if chunk:
+            self.chunks[i] = chunk
+            self.firsts[i] = chunk[0]["id"]
+        else:
+            del self.chunks[i]
+            del self.firsts[i]
+        return old
+
+    def freeze(self, version: int) -> RequestSnapshot:
+        return RequestSnapshot(tuple(self.chunks), version)
+
+
+class RequestStore:
+    """
+    Владелец заявок в памяти.
+
+    Все изменения — под self.lock (в shared.py он держится и на время записи в БД,
+    поэтому порядок версий в памяти совпадает с порядком транзакций). Слушатели
+    (reset(requests) / apply(old, new)) вызываются под тем же lock, по порядку.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._snapshot = RequestSnapshot()
+        self._listeners: list = []
+
+    # --- readers (без блокировок) ---
+    def snapshot(self) -> RequestSnapshot:
+        return self._snapshot
+
+    def get(self, req_id) -> Optional[dict]:
+        return self._snapshot.get(req_id)
+
+    @property
+    def version(self) -> int:
+        """Версия данных БД, до которой синхронизирован снимок."""
+        return self._snapshot.version
+
+    # --- listeners ---
+    def add_listener(self, listener):
+        with self.lock:
+            self._listeners.append(listener)
+            listener.reset(self._snapshot.requests)
+
+    def _notify(self, old: Optional[dict], new: Optional[dict]):
+        for listener in self._listeners:
+            try:
+                listener.apply(old, new)
+            except Exception:
+                logger.exception("Request listener %r failed", listener)
+
+    def _notify_reset(self):
+        for listener in self._listeners:
+            try:
+                listener.reset(self._snapshot.requests)
+            except Exception:
+                logger.exception("Request listener %r failed", listener)
+
+    # --- writers (вызывать под self.lock) ---
+    def _next_version(self, version: int) -> int:
+        # своя запись уже отражена в памяти; если чужих записей между не было — сдвигаем версию
+        current = self._snapshot.version
+        return version if version == current + 1 else current
+
+    def put(self, r: dict, version: int):
+        """Добавить или заменить заявку (по r["id"])."""
+        chunks = _Chunks(self._snapshot)
+        old = chunks.put(r)
+        self._snapshot = chunks.freeze(self._next_version(version))
+        self._notify(old, r)
+
+    def remove(self, req_id: int, version: int) -> Optional[dict]:
+        chunks = _Chunks(self._snapshot)
+        old = chunks.remove(req_id)
+        self._snapshot = chunks.freeze(self._next_version(version))
+        if old is not None:
+            self._notify(old, None)
+        return old
+
+    def apply_changes(self, changed: Iterable[dict], deleted: Iterable[int], version: int) -> list[tuple]:
+        """Применить дельту из БД одним новым снимком (версия выставляется как есть).
+
+        Возвращает применённые изменения [(old, new), ...].
+        """
+        chunks = _Chunks(self._snapshot)
+        events = []
+        for fresh in changed:
+            old = chunks.put(fresh)
+            # своя запись, уже отражённая в памяти, приходит с тем же rev — не событие
+            if old is None or old.get("rev") != fresh.get("rev"):
+                events.append((old, fresh))
+        for req_id in deleted:
+            old = chunks.remove(req_id)
+            if old is not None:
+                events.append((old, None))
+        self._snapshot = chunks.freeze(version)
+        for old, new in events:
+            self._notify(old, new)
+        return events
+
+    def replace_all(self, requests: Iterable[dict], version: int):
+        self._snapshot = RequestSnapshot.from_sorted(sorted(requests, key=_by_id), version)
+        self._notify_reset()
+
+
+request_store = RequestStore()
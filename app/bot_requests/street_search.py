@@ -0,0 +1,76 @@
+# app/bot_requests/street_search.py
+"""
+Нечёткий поиск улиц (опечатки, русское написание).
+
+fold() сводит русское и украинское написание к общему виду, так что
+"Лазурная" / "Лазурна", "Богоявленский" / "Богоявленський" совпадают без
+словаря переводов. TrigramIndex ищет по триграммам свёрнутых названий
+и возвращает top-k улиц с оценкой (коэффициент Дайса, 0..1).
+
+    idx.add("лазурна", street_id)
+    idx.search("лазурма", k=5)   # [(street_id, 0.625), ...]
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import Callable, Optional
+
+# Буквы, которые пишутся по-разному в русском и украинском
+_FOLD_CHARS = str.maketrans({
+    "і": "и", "ї": "и", "ы": "и", "й": "и",
+    "є": "е", "э": "е", "ё": "е",
+    "ґ": "г",
+    "ь": None, "ъ": None, "'": None,
+})
+# Окончания прилагательных: -ая / -а, -ой / -ий (после замены й -> и)
+_FOLD_ENDINGS = ((re.compile(r"ая\b"), "а"), (re.compile(r"яя\b"), "я"), (re.compile(r"ои\b"), "ии"))
+
+MIN_SCORE = 0.3
+
+
+def fold(text: str) -> str:
+    """Нормализованное название -> общий для RU/UA вид ('лазурная' -> 'лазурна')."""
+    s = text.translate(_FOLD_CHARS)
+    for pattern, repl in _FOLD_ENDINGS:
+        s = pattern.sub(repl, s)
+    return s
+
+
+def trigrams(text: str) -> frozenset:
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramIndex:
+    """Инвертированный индекс триграмма -> (ключ, улица). Строится целиком (в address_index — на район)."""
+
+    def __init__(self):
+        self._postings: dict[str, set] = {}
+        self._sizes: dict[str, int] = {}  # ключ -> число его триграмм
+
+    def add(self, key: str, street):
+        grams = trigrams(key)
+        self._sizes[key] = len(grams)
+        for g in grams:
+            self._postings.setdefault(g, set()).add((key, street))
+
+    def search(self, query: str, k: int = 5, allowed: Optional[Callable] = None,
+               min_score: float = MIN_SCORE) -> list[tuple]:
+        """[(улица, оценка), ...] по убыванию оценки; allowed(улица) -> bool фильтрует до отбора top-k."""
+        q = trigrams(query)
+        if not q:
+            return []
+        postings = self._postings
+        shared = Counter(entry for g in q for entry in postings.get(g, ()))
+        best: dict = {}
+        for (key, street), common in shared.items():
+            score = 2 * common / (len(q) + self._sizes[key])
+            if score < min_score or best.get(street, 0) >= score:
+                continue
+            if allowed is not None and not allowed(street):
+                continue
+            best[street] = score
+        ranked = sorted(best.items(), key=lambda item: (-item[1], item[0]))
+        return [(street, round(score, 3)) for street, score in ranked[:k]]
@@ -4,6 +4,7 @@ import json
 from datetime import datetime
 from app.utils import get_company_db_path
 from app.utils import clean_currency_format
+from app.contracts.services import ensure_contract_indexes
 
 # Blueprint для HTML-страницы
 contract_html = Blueprint('contract_html', __name__)
@@ -87,37 +88,9 @@ def view_contract(contract_id):
         addresses_list = list(addresses_data.values())
         print(f"Final addresses list: {len(addresses_list)} addresses")
         
-        # Используем актуальную дату окончания из базы данных
+        # Статус и дату окончания ведёт ежедневная задача (app/contracts/services.py) — здесь только чтение
         end_date = contract_row[4]  # end_date з бази даних
         status = contract_row[8]  # статус з бази даних
-        
-        # Только обновляем статус, не меняем дату окончания
-        if end_date:
-            try:
-                current_date = datetime.now().date()
-                end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-                days_until_end = (end_date_obj - current_date).days
-                
-                # Определяем статус на основе дней до окончания
-                if days_until_end <= 0:
-                    new_status = 'active'  # Автопролонгация без изменения даты
-                elif days_until_end <= 45:
-                    new_status = 'заканчивается'
-                else:
-                    new_status = 'active'
-                
-                # Обновляем только статус, если он изменился
-                if new_status != status and status != 'terminated':
-                    cursor.execute('''
-                        UPDATE contracts SET status = ?
-                        WHERE id = ?
-                    ''', (new_status, contract_id))
-                    conn.commit()
-                    status = new_status
-                    
-            except ValueError:
-                # Если дата некорректна, оставляем как есть
-                pass
 
         contract = {
             'id': contract_row[0],
@@ -216,11 +189,10 @@ def registries_contracts():
             ORDER BY created_at DESC
         ''')
         
+        # Пролонгацию и статусы ведёт ежедневная задача (app/contracts/services.py) — здесь только чтение
         contracts = []
-        current_date = datetime.now().date()
-        
         for row in cursor.fetchall():
-            contract = {
+            contracts.append({
                 'id': row[0],
                 'number': row[1],
                 'customer': row[2],
@@ -231,50 +203,8 @@ def registries_contracts():
                 'yearly_cost': row[7],
                 'status': row[8],
                 'created_at': row[9]
-            }
-            
-            # Определяем статус договора на основе дат
-            if contract['end_date']:
-                try:
-                    end_date = datetime.strptime(contract['end_date'], '%Y-%m-%d').date()
-                    days_until_end = (end_date - current_date).days
-                    new_status = contract['status']
-                    
-                    if days_until_end <= 0:
-                        # Договор истек - автопролонгация на следующий день после окончания
-                        if contract['status'] != 'terminated':
-                            new_end_date = end_date.replace(year=end_date.year + 1)
-                            cursor.execute('''
-                                UPDATE contracts SET end_date = ?, status = 'active'
-                                WHERE id = ?
-                            ''', (new_end_date.strftime('%Y-%m-%d'), contract['id']))
-                            contract['end_date'] = new_end_date.strftime('%Y-%m-%d')
-                            contract['status'] = 'active'
-                            new_status = 'active'
-                            print(f"Auto-prolonged contract {contract['id']} from {end_date} to {new_end_date}")
-                    elif days_until_end <= 45:  # 1,5 месяца = ~45 дней
-                        new_status = 'заканчивается'
-                        if contract['status'] != 'заканчивается' and contract['status'] != 'terminated':
-                            cursor.execute('''
-                                UPDATE contracts SET status = 'заканчивается'
-                                WHERE id = ?
-                            ''', (contract['id'],))
-                            contract['status'] = 'заканчивается'
-                    elif contract['status'] != 'terminated':
-                        new_status = 'active'
-                        if contract['status'] != 'active':
-                            cursor.execute('''
-                                UPDATE contracts SET status = 'active'
-                                WHERE id = ?
-                            ''', (contract['id'],))
-                            contract['status'] = 'active'
-                except ValueError:
-                    contract['status'] = 'active'
-            
-            contracts.append(contract)
-        
-        conn.commit()
-        
+            })
+
         # Подсчитываем статистику для виджетов
         total_contracts = len(contracts)
         active_contracts = len([c for c in contracts if c['status'] == 'active'])
@@ -334,6 +264,7 @@ def save_contract():
         columns = [column[1] for column in cursor.fetchall()]
         if 'end_date' not in columns:
             cursor.execute('ALTER TABLE contracts ADD COLUMN end_date TEXT')
+        ensure_contract_indexes(conn)
         
         # Создание таблицы для адресов договоров
         cursor.execute('''
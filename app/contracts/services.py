@@ -0,0 +1,94 @@
+# app/contracts/services.py
+"""
+Жизненный цикл договоров: автопролонгация и статус «заканчивается».
+
+Раньше статусы пересчитывались при каждом открытии реестра (UPDATE на каждый
+договор прямо во время рендера). Теперь это делает ежедневная задача
+планировщика (app.core.scheduler, см. start_bots в main.py) — несколько
+set-based UPDATE в одной транзакции на каждую базу компании, а страницы
+договоров только читают.
+
+Правила (как были в реестре):
+- terminated не трогаем;
+- end_date наступила или прошла -> end_date + 1 год (пока не станет в будущем), статус active;
+- до end_date не больше ENDING_SOON_DAYS дней -> 'заканчивается';
+- иначе -> active.
+Договоры с некорректной end_date пропускаются.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from pytz import timezone
+
+from app.utils import COMPANY_DB_PATHS
+
+logger = logging.getLogger(__name__)
+
+kyiv_tz = timezone("Europe/Kyiv")
+
+ENDING_SOON_DAYS = 45  # 1,5 месяца
+STATUS_ACTIVE = "active"
+STATUS_ENDING = "заканчивается"
+STATUS_TERMINATED = "terminated"
+# Договор, просроченный на много лет, пролонгируется за несколько проходов по году
+MAX_PROLONG_YEARS = 100
+
+# date(end_date) IS NOT NULL — только корректные 'YYYY-MM-DD'
+_LIVE = f"status IS NOT '{STATUS_TERMINATED}' AND date(end_date) IS NOT NULL"
+
+
+def ensure_contract_indexes(conn: sqlite3.Connection):
+    """Индекс под задачу и фильтры реестра (если таблица договоров уже создана)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_contracts_status_end ON contracts(status, end_date)")
+
+
+def refresh_contract_statuses(db_path: str, today: Optional[date] = None) -> tuple[int, int]:
+    """Пролонгировать и пересчитать статусы в одной базе. Возвращает (пролонгировано, сменили статус)."""
+    today = today or datetime.now(kyiv_tz).date()
+    params = {"today": today.isoformat(), "soon": (today + timedelta(days=ENDING_SOON_DAYS)).isoformat()}
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contracts'").fetchone():
+            return 0, 0
+        with conn:
+            ensure_contract_indexes(conn)
+            prolonged = 0
+            for i in range(MAX_PROLONG_YEARS):
+                count = conn.execute(
+                    f"UPDATE contracts SET end_date = date(end_date, '+1 year'), status = '{STATUS_ACTIVE}' "
+                    f"WHERE {_LIVE} AND end_date <= :today", params,
+                ).rowcount
+                if not count:
+                    break
+                if i == 0:
+                    prolonged = count  # следующие проходы — те же договоры
+            changed = conn.execute(
+                f"UPDATE contracts SET status = CASE WHEN end_date <= :soon "
+                f"THEN '{STATUS_ENDING}' ELSE '{STATUS_ACTIVE}' END "
+                f"WHERE {_LIVE} AND status IS NOT (CASE WHEN end_date <= :soon "
+                f"THEN '{STATUS_ENDING}' ELSE '{STATUS_ACTIVE}' END)", params,
+            ).rowcount
+        return prolonged, changed
+    finally:
+        conn.close()
+
+
+def refresh_all_contracts(today: Optional[date] = None):
+    """Задача планировщика: все базы компаний (COMPANY_DB_PATHS); ошибка одной базы не мешает другим."""
+    for company, path in COMPANY_DB_PATHS.items():
+        if not os.path.exists(path):
+            logger.warning("Contracts lifecycle: database %s for company %s not found, skipped", path, company)
+            continue
+        try:
+            prolonged, changed = refresh_contract_statuses(path, today)
+        except Exception:
+            logger.exception("Contracts lifecycle failed for %s", path)
+            continue
+        if prolonged or changed:
+            logger.info("Contracts %s (%s): prolonged %d, status changed %d", company, path, prolonged, changed)
@@ -0,0 +1,268 @@
+# app/core/address_registry.py
+"""
+Единый реестр адресов для обоих ботов и веба.
+
+Данные — в app.core.address_store (mmap addresses.bin), реестр отвечает за
+версию и рассылку изменений. Индексы (address_index, geo_index) подписываются
+как слушатели с протоколом:
+
+    listener.reset(store)     # структура изменилась (новый addresses.json) — пересобраться
+    listener.apply(changes)   # поменялись флаги active: [AddressChange, ...]
+
+Изменение флагов идёт только через address_registry.set_active() /
+set_active_many(): одна транзакция в requests.db (таблица address_flags —
+флаги, выставленные ботом, и address_audit — строка на каждое изменение),
+затем одна запись в .bin, apply() у слушателей этого процесса и событие
+"addresses_changed" в event_bus. Другие процессы узнают об изменении в sync()
+(watcher "addresses-sync"): счётчик версии в .bin виден им через mmap, и они
+получают apply() только с изменившимися подъездами — без перечитывания файла
+и пересборки индексов. reset() бывает только при смене addresses.json; после
+неё флаги из address_flags накладываются заново (переживают удаление .bin), но только
+те, что новее addresses.json: правка "active" оператором в файле отменяет более ранние
+флаги бота, а /disable после правки — снова сильнее файла.
+
+    address_registry.set_active_many([
+        AddressUpdate("Корабельний р-н", "вулиця Лазурна", "32", None, False),
+        AddressUpdate("Корабельний р-н", "вулиця Лазурна", "34", "2", False),
+    ], chat_id=chat_id, user_id=user_id)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Iterable, NamedTuple, Optional
+
+from app.core import config
+from app.core.address_store import AddressStore, address_store
+from app.core.events import event_bus
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_DB_PATH = os.path.join(config.DATA_DIR, "requests.db")
+
+
+class AddressChange(NamedTuple):
+    district: str
+    street: str
+    building: str
+    entrance: str
+    active: bool
+
+
+class AddressUpdate(NamedTuple):
+    district: str
+    street: str
+    building: str
+    entrance: Optional[str]  # None — все подъезды дома
+    active: bool
+
+
+class AddressRegistry:
+    def __init__(self, store: AddressStore, db_path: str = REGISTRY_DB_PATH):
+        self.store = store
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self._listeners: list = []
+        self._db_ready = False
+
+    # ---------- schema ----------
+    def init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS address_flags (
+                    district TEXT NOT NULL,
+                    street TEXT NOT NULL,
+                    building TEXT NOT NULL,
+                    entrance TEXT NOT NULL,
+                    active INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (district, street, building, entrance)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS address_audit (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    batch TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    chat_id INTEGER,
+                    user_id INTEGER,
+                    district TEXT NOT NULL,
+                    street TEXT NOT NULL,
+                    building TEXT NOT NULL,
+                    entrance TEXT NOT NULL,
+                    active INTEGER NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_address_audit_address "
+                         "ON address_audit(district, street, building)")
+            conn.commit()
+        finally:
+            conn.close()
+        self._db_ready = True
+
+    @property
+    def version(self) -> int:
+        """Локальная версия адресов: растёт при перезагрузке и при каждом изменении флагов."""
+        return self.store.version
+
+    # ---------- listeners ----------
+    def add_listener(self, listener):
+        with self.lock:
+            self._listeners.append(listener)
+            listener.reset(self.store)
+
+    def _notify_reset(self):
+        for listener in self._listeners:
+            try:
+                listener.reset(self.store)
+            except Exception:
+                logger.exception("Address listener %r failed", listener)
+
+    def _notify(self, changes: list[AddressChange]):
+        for listener in self._listeners:
+            try:
+                listener.apply(changes)
+            except Exception:
+                logger.exception("Address listener %r failed", listener)
+
+    # ---------- загрузка и синхронизация ----------
+    def load(self, force: bool = False) -> bool:
+        """Загрузить/перечитать addresses.json; при изменении — reset() у слушателей."""
+        with self.lock:
+            if not self.store.load(force):
+                return False
+            self._restore_flags()
+            self._notify_reset()
+            return True
+
+    def _restore_flags(self):
+        """Наложить флаги из address_flags, выставленные после правки addresses.json (до reset слушателей)."""
+        if not self._db_ready:
+            self.init_db()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            saved = conn.execute(
+                "SELECT district, street, building, entrance, active, updated_at FROM address_flags"
+            ).fetchall()
+        finally:
+            conn.close()
+        source_mtime = self.store.source_mtime
+        flags, superseded = {}, 0
+        for district, street, building, entrance, active, updated_at in saved:
+            if updated_at < source_mtime:
+                superseded += 1
+                continue
+            rows = self.store.entrance_rows(district, street, building, entrance)
+            if rows:
+                flags[rows[entrance]] = bool(active)
+        changed = self.store.write_active(flags) if flags else []
+        if changed:
+            logger.info("Addresses: restored %d entrance flag(s) from address_flags", len(changed))
+        if superseded:
+            logger.info("Addresses: %d flag(s) in address_flags are older than %s, file values kept",
+                        superseded, self.store.json_path)
+
+    def sync(self):
+        """Догнать изменения других процессов (вызывается watcher'ом)."""
+        with self.lock:
+            if not self.load():
+                self._pull()
+
+    def _pull(self):
+        rows = self.store.pull_active()
+        if not rows:
+            return
+        point = self.store.point_getter()
+        changes = [AddressChange(*point(row), bool(self.store.active[row])) for row in rows]
+        logger.info("Addresses: %d entrance flag(s) changed by another process", len(changes))
+        self._notify(changes)
+
+    # ---------- изменения ----------
+    def set_active(self, district: str, street: str, building: str, entrance: Optional[str],
+                   active: bool, chat_id: Optional[int] = None,
+                   user_id: Optional[int] = None) -> Optional[list[str]]:
+        """
+        Включить/выключить подъезд (entrance=None — все подъезды дома).
+        Возвращает как AddressStore.set_active: None — нет дома, [] — нет подъезда,
+        иначе список затронутых подъездов.
+        """
+        update = AddressUpdate(district, street, building, entrance, active)
+        return self.set_active_many([update], chat_id=chat_id, user_id=user_id)[0]
+
+    def set_active_many(self, updates: Iterable[AddressUpdate], chat_id: Optional[int] = None,
+                        user_id: Optional[int] = None) -> list[Optional[list[str]]]:
+        """
+        Применить пачку изменений одной транзакцией (address_flags + строка address_audit
+        на каждый реально изменившийся подъезд) и одной записью в .bin.
+        Результат — по элементу на update, как у set_active(). Ошибки SQLite/OSError
+        пробрасываются; при любой из них не применяется ничего (ни в БД, ни в .bin).
+        """
+        updates = [AddressUpdate(*u) for u in updates]
+        with self.lock:
+            self._pull()  # сначала чужие изменения, чтобы слушатели получили их по порядку
+            results: list[Optional[list[str]]] = []
+            flags: dict[int, bool] = {}
+            names: dict[int, tuple] = {}
+            for u in updates:
+                rows = self.store.entrance_rows(u.district, u.street, u.building, u.entrance)
+                results.append(list(rows) if rows is not None else None)
+                for name, row in (rows or {}).items():
+                    flags[row] = bool(u.active)  # при повторах побеждает последняя строка
+                    names[row] = (u.district, u.street, u.building, name)
+            active = self.store.active
+            changes = [AddressChange(*names[r], flags[r]) for r in sorted(flags) if bool(active[r]) != flags[r]]
+            if not changes:
+                return results
+            self._save(changes, chat_id, user_id, flags)
+            self._notify(changes)
+        logger.info("Addresses: %d entrance flag(s) changed (chat %s, user %s)", len(changes), chat_id, user_id)
+        event_bus.publish("addresses_changed", {
+            "version": self.version,
+            "changes": [c._asdict() for c in changes],
+        })
+        return results
+
+    def _save(self, changes: list[AddressChange], chat_id: Optional[int], user_id: Optional[int],
+              flags: dict[int, bool]):
+        """
+        address_flags + address_audit и запись флагов в .bin как одно целое: COMMIT только
+        после успешной записи .bin (OSError — откат транзакции, store сам откатывает память),
+        а если не удался COMMIT — флаги в .bin возвращаются обратно.
+        """
+        if not self._db_ready:
+            self.init_db()
+        now, batch = time.time(), uuid.uuid4().hex
+        previous = {row: bool(self.store.active[row]) for row in flags}
+        written = False
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO address_flags (district, street, building, entrance, active, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (district, street, building, entrance) DO UPDATE SET "
+                    "active = excluded.active, updated_at = excluded.updated_at",
+                    [(*c[:4], int(c.active), now) for c in changes],
+                )
+                conn.executemany(
+                    "INSERT INTO address_audit (batch, created_at, chat_id, user_id, "
+                    "district, street, building, entrance, active) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(batch, now, chat_id, user_id, *c[:4], int(c.active)) for c in changes],
+                )
+                self.store.write_active(flags)
+                written = True
+        except sqlite3.Error:
+            if written:
+                self.store.write_active(previous)
+            raise
+        finally:
+            conn.close()
+
+
+address_registry = AddressRegistry(address_store)
@@ -0,0 +1,455 @@
+# app/core/address_store.py
+"""
+Компактная база адресов для обоих ботов.
+
+addresses.json (district -> street -> building -> entrance -> {lat, lon, radius, active})
+один раз компилируется в addresses.bin рядом с ним:
+
+- все строки (районы, улицы, номера домов и подъездов) — в одной таблице, без повторов;
+- дома — колонки house_district / house_street / house_building (номера строк)
+  и house_start (подъезды дома — строки house_start[h] .. house_start[h + 1]);
+- подъезды — колонки row_house, row_entrance, lat, lon, radius, active.
+
+Файл открывается через mmap: колонки — memoryview прямо на страницы файла,
+без разбора JSON и без dict на каждый подъезд; процессы (бот, веб-воркеры) делят
+одни и те же страницы. Пересборка — только когда addresses.json изменился
+(размер/mtime записаны в заголовке .bin).
+
+Флаг active — единственное, что меняется в работе (/enable, /disable): колонка
+держится в памяти (bytearray) и записывается в .bin на место вместе со счётчиком
+version, addresses.json не переписывается. Другие процессы видят запись через
+свой mmap: pull_active() сравнивает колонку файла со своей копией (см. address_registry).
+При пересборке из изменённого addresses.json флаги берутся из него; флаги, выставленные
+ботом после последней правки файла, накладывает address_registry (таблица address_flags).
+
+    address_store.load()
+    address_store.entrances("Центральний р-н", "вул. Миру", "10")  # {"1": Entrance(lat, lon, radius, active)}
+    address_store.set_active("Центральний р-н", "вул. Миру", "10", None, False)
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from array import array
+from typing import NamedTuple, Optional
+
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+ADDRESSES_JSON = os.path.join(config.DATA_DIR, "addresses.json")
+
+MAGIC = b"LIFTADR1"
+ALIGN = 8
+# pull_active сравнивает колонку active кусками такого размера (memcmp), строки — только в отличающихся
+DIFF_CHUNK = 4096
+# колонка -> typecode array/memoryview
+META_COLUMNS = (("version", "Q"),)  # счётчик записей флагов в файл
+HOUSE_COLUMNS = (("house_district", "I"), ("house_street", "I"), ("house_building", "I"), ("house_start", "I"))
+ROW_COLUMNS = (("row_house", "I"), ("row_entrance", "I"), ("lat", "d"), ("lon", "d"), ("radius", "d"), ("active", "B"))
+
+
+class Entrance(NamedTuple):
+    lat: float
+    lon: float
+    radius: float
+    active: bool
+
+
+class AddressPoint(NamedTuple):
+    district: str
+    street: str
+    building: str
+    entrance: str
+
+
+def _bin_path(json_path: str) -> str:
+    return os.path.splitext(json_path)[0] + ".bin"
+
+
+def _data_offset(header_size: int) -> int:
+    offset = len(MAGIC) + 4 + header_size
+    return offset + (-offset % ALIGN)
+
+
+def _inode(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_ino
+    except OSError:
+        return None
+
+
+def _runs(rows: list[int]):
+    """Отсортированные строки -> полуинтервалы подряд идущих [lo, hi)."""
+    lo = prev = rows[0]
+    for r in rows[1:]:
+        if r != prev + 1:
+            yield lo, prev + 1
+            lo = r
+        prev = r
+    yield lo, prev + 1
+
+
+def _source_stamp(json_path: str) -> Optional[list]:
+    try:
+        st = os.stat(json_path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+class AddressStore:
+    def __init__(self, json_path: str = ADDRESSES_JSON):
+        self.json_path = json_path
+        self.bin_path = _bin_path(json_path)
+        self.version = 0  # растёт при каждой загрузке и изменении флагов
+        self._lock = threading.RLock()
+        self._mmap: Optional[mmap.mmap] = None
+        self._header: dict = {}
+        self._bin_ino = None
+        self._clear()
+
+    def _clear(self):
+        self.strings: list[str] = []
+        self.rows = 0
+        self.lat = self.lon = self.radius = memoryview(b"").cast("d")
+        self.active = bytearray()
+        self._cols: dict = {}
+        self._houses: dict[tuple[str, str, str], int] = {}
+        self._districts: dict[str, dict[str, list[str]]] = {}
+        self._active_offset = 0
+        self._version_offset = 0
+        self._seen_version = 0
+
+    # ---------- загрузка ----------
+    def load(self, force: bool = False) -> bool:
+        """Открыть addresses.bin (пересобрав при изменении addresses.json). False — уже актуально."""
+        with self._lock:
+            stamp = _source_stamp(self.json_path)
+            if (not force and self._mmap is not None and self._header.get("source") == stamp
+                    and self._bin_ino == _inode(self.bin_path)):
+                return False
+            header = self._read_header()
+            stale = header is None or "version" not in header.get("columns", {})
+            if stale or (stamp is not None and header.get("source") != stamp):
+                if stamp is None:
+                    logger.warning("Address store: %s not found", self.json_path)
+                    self._close()
+                    self._clear()
+                    self.version += 1
+                    return True
+                self._compile(stamp)
+            self._open()
+            self.version += 1
+            logger.info("Address store: %d entrances in %d buildings (%s)",
+                        self.rows, len(self._houses), self.bin_path)
+            return True
+
+    @property
+    def source_mtime(self) -> float:
+        """mtime addresses.json, из которого собран открытый .bin (секунды; 0 — не загружен)."""
+        source = self._header.get("source") or [0, 0]
+        return source[1] / 1e9
+
+    def _read_header(self) -> Optional[dict]:
+        try:
+            with open(self.bin_path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    return None
+                (size,) = struct.unpack("<I", f.read(4))
+                return json.loads(f.read(size))
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def _open(self):
+        self._close()
+        with open(self.bin_path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            ino = os.fstat(f.fileno()).st_ino
+        (size,) = struct.unpack_from("<I", mm, len(MAGIC))
+        header = json.loads(mm[len(MAGIC) + 4:len(MAGIC) + 4 + size])
+        base = _data_offset(size)
+        view = memoryview(mm)
+        cols = {}
+        for name, (offset, code, count) in header["columns"].items():
+            start = base + offset
+            cols[name] = view[start:start + array(code).itemsize * count].cast(code)
+        self._clear()
+        self._mmap, self._header, self._cols, self._bin_ino = mm, header, cols, ino
+        self.strings = header["strings"]
+        self.rows = len(cols["lat"])
+        self.lat, self.lon, self.radius = cols["lat"], cols["lon"], cols["radius"]
+        # флаги меняются в работе — держим свою копию, на диск пишем точечно (_flush_active)
+        self.active = bytearray(cols["active"])
+        self._active_offset = base + header["columns"]["active"][0]
+        self._version_offset = base + header["columns"]["version"][0]
+        self._seen_version = cols["version"][0]
+        s = self.strings
+        for h, (d, st, b) in enumerate(zip(cols["house_district"], cols["house_street"], cols["house_building"])):
+            self._houses[(s[d], s[st], s[b])] = h
+            self._districts.setdefault(s[d], {}).setdefault(s[st], []).append(s[b])
+
+    def _close(self):
+        if self._mmap is None:
+            return
+        self._cols = {}
+        self.lat = self.lon = self.radius = memoryview(b"").cast("d")
+        try:
+            self._mmap.close()
+        except BufferError:
+            # колонки ещё держит индекс (GeoIndex) до своей пересборки — mmap закроет сборщик мусора
+            pass
+        self._mmap = None
+
+    # ---------- компиляция addresses.json -> addresses.bin ----------
+    def _compile(self, stamp: list):
+        with open(self.json_path, encoding="utf-8") as f:
+            data = json.load(f)
+        strings: list[str] = []
+        ids: dict[str, int] = {}
+
+        def intern(value) -> int:
+            value = str(value)
+            i = ids.get(value)
+            if i is None:
+                i = ids[value] = len(strings)
+                strings.append(value)
+            return i
+
+        cols = {name: array(code) for name, code in META_COLUMNS + HOUSE_COLUMNS + ROW_COLUMNS}
+        cols["version"].append(0)
+        for district, streets in (data or {}).items():
+            for street, buildings in (streets or {}).items():
+                for building, entrances in (buildings or {}).items():
+                    house = len(cols["house_district"])
+                    cols["house_district"].append(intern(district))
+                    cols["house_street"].append(intern(street))
+                    cols["house_building"].append(intern(building))
+                    cols["house_start"].append(len(cols["lat"]))
+                    for entrance, point in (entrances or {}).items():
+                        try:
+                            lat, lon = float(point["lat"]), float(point["lon"])
+                            radius = float(point.get("radius", 0))
+                        except (KeyError, TypeError, ValueError):
+                            logger.warning("Address store: bad point %s %s %s п.%s", district, street, building, entrance)
+                            continue
+                        active = bool(point.get("active", True))
+                        cols["row_house"].append(house)
+                        cols["row_entrance"].append(intern(entrance))
+                        cols["lat"].append(lat)
+                        cols["lon"].append(lon)
+                        cols["radius"].append(radius)
+                        cols["active"].append(1 if active else 0)
+        cols["house_start"].append(len(cols["lat"]))
+        self._write(cols, strings, stamp)
+        logger.info("Address store: compiled %s -> %s", self.json_path, self.bin_path)
+
+    def _write(self, cols: dict, strings: list[str], stamp: list):
+        # смещения колонок — от начала области данных (сразу после заголовка, с выравниванием)
+        layout, offset = {}, 0
+        for name, col in cols.items():
+            layout[name] = [offset, col.typecode, len(col)]
+            offset += len(col) * col.itemsize
+            offset += -offset % ALIGN
+        raw = json.dumps({"source": stamp, "strings": strings, "columns": layout}, ensure_ascii=False).encode("utf-8")
+        base = _data_offset(len(raw))
+
+        dirpath = os.path.dirname(self.bin_path) or "."
+        fd, tmp_path = tempfile.mkstemp(prefix=".addresses.", suffix=".bin", dir=dirpath)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(MAGIC)
+                f.write(struct.pack("<I", len(raw)))
+                f.write(raw)
+                for name, col in cols.items():
+                    f.seek(base + layout[name][0])
+                    col.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.bin_path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    # ---------- чтение ----------
+    def districts(self) -> list[str]:
+        return list(self._districts)
+
+    def streets(self, district: str) -> dict[str, list[str]]:
+        """{улица: [дома]} района."""
+        return self._districts.get(district, {})
+
+    def house_tree(self) -> dict[str, dict[str, list[str]]]:
+        """{район: {улица: [дома]}} — для индекса улиц."""
+        return self._districts
+
+    def _house_rows(self, district: str, street: str, building: str) -> Optional[range]:
+        h = self._houses.get((district, street, str(building)))
+        if h is None:
+            return None
+        start = self._cols["house_start"]
+        return range(start[h], start[h + 1])
+
+    def has_building(self, district: str, street: str, building: str) -> bool:
+        return (district, street, str(building)) in self._houses
+
+    def entrances(self, district: str, street: str, building: str) -> dict[str, Entrance]:
+        """{подъезд: Entrance} дома в порядке addresses.json; {} — дома нет."""
+        with self._lock:
+            rows = self._house_rows(district, street, building)
+            if rows is None:
+                return {}
+            s, names = self.strings, self._cols["row_entrance"]
+            return {
+                s[names[r]]: Entrance(self.lat[r], self.lon[r], self.radius[r], bool(self.active[r]))
+                for r in rows
+            }
+
+    def find_building(self, street: str, building: str) -> Optional[str]:
+        """Район первого дома с такой улицей и номером (для бота ТО, где район не спрашивают)."""
+        for district, streets in self._districts.items():
+            if building in streets.get(street, ()):
+                return district
+        return None
+
+    def point(self, row: int) -> AddressPoint:
+        return self.point_getter()(row)
+
+    def point_getter(self):
+        """row -> AddressPoint по текущей сборке (индексы держат его до своей пересборки)."""
+        s, cols = self.strings, self._cols
+        house, entrance = cols.get("row_house"), cols.get("row_entrance")
+        district, street, building = cols.get("house_district"), cols.get("house_street"), cols.get("house_building")
+
+        def point(row: int) -> AddressPoint:
+            h = house[row]
+            return AddressPoint(s[district[h]], s[street[h]], s[building[h]], s[entrance[row]])
+
+        return point
+
+    # ---------- изменение флагов ----------
+    def entrance_rows(self, district: str, street: str, building: str,
+                      entrance: Optional[str] = None) -> Optional[dict[str, int]]:
+        """Строки подъездов дома {подъезд: строка} (entrance — только он); None — нет такого дома."""
+        rows = self._house_rows(district, street, building)
+        if rows is None:
+            return None
+        names, s = self._cols["row_entrance"], self.strings
+        return {s[names[r]]: r for r in rows if entrance is None or s[names[r]] == str(entrance)}
+
+    def set_active(self, district: str, street: str, building: str,
+                   entrance: Optional[str], active: bool) -> Optional[list[str]]:
+        """
+        Включить/выключить подъезд (entrance=None — весь дом) и записать флаг в .bin.
+        Возвращает список затронутых подъездов; None — нет такого дома, [] — нет такого подъезда.
+        """
+        with self._lock:
+            rows = self.entrance_rows(district, street, building, entrance)
+            if rows is None:
+                return None
+            self.write_active({r: active for r in rows.values()})
+            return list(rows)
+
+    def write_active(self, flags: dict[int, bool]) -> list[int]:
+        """
+        Выставить флаги {строка: active} одной записью в .bin. Возвращает реально изменённые строки.
+        При OSError флаги в памяти возвращаются как были (и, по возможности, в файле), ошибка пробрасывается.
+        """
+        with self._lock:
+            changed = sorted(r for r, active in flags.items() if bool(self.active[r]) != bool(active))
+            if not changed:
+                return []
+            previous = {r: self.active[r] for r in changed}
+            for r in changed:
+                self.active[r] = 1 if flags[r] else 0
+            try:
+                self._flush_active(changed)
+            except OSError:
+                for r, value in previous.items():
+                    self.active[r] = value
+                self._undo_partial_flush(changed)
+                raise
+            self.version += 1
+            return changed
+
+    def _undo_partial_flush(self, rows: list[int]):
+        # версия не выросла, но часть строк могла попасть в файл: вернуть их,
+        # чтобы следующий чужой pull_active() их не подхватил
+        try:
+            fd = os.open(self.bin_path, os.O_RDWR)
+            try:
+                for lo, hi in _runs(rows):
+                    os.pwrite(fd, bytes(self.active[lo:hi]), self._active_offset + lo)
+            finally:
+                os.close(fd)
+        except OSError:
+            logger.exception("Address store: could not roll back partial write to %s", self.bin_path)
+
+    def _flush_active(self, rows: list[int]):
+        # пишем только свои строки (подряд идущие — одним pwrite), потом версию:
+        # читатель, увидевший новую версию, увидит и флаги. flock — чтобы два
+        # процесса не выдали одну и ту же версию
+        fd = os.open(self.bin_path, os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            current = array("Q", os.pread(fd, 8, self._version_offset))[0]
+            for lo, hi in _runs(rows):
+                os.pwrite(fd, bytes(self.active[lo:hi]), self._active_offset + lo)
+            os.pwrite(fd, array("Q", [current + 1]).tobytes(), self._version_offset)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        # чужие записи, которые мы ещё не подтянули, pull_active() найдёт позже
+        if current == self._seen_version:
+            self._seen_version = current + 1
+
+    @property
+    def file_version(self) -> int:
+        """Счётчик записей флагов в addresses.bin (общий для всех процессов через mmap)."""
+        col = self._cols.get("version")
+        return int(col[0]) if col is not None else 0
+
+    def pull_active(self) -> list[int]:
+        """Подтянуть флаги, записанные в .bin другими процессами. Возвращает изменившиеся строки."""
+        with self._lock:
+            file_version = self.file_version
+            if file_version == self._seen_version:
+                return []
+            self._seen_version = file_version
+            disk, local = self._cols["active"], self.active
+            changed = []
+            for lo in range(0, self.rows, DIFF_CHUNK):
+                hi = min(lo + DIFF_CHUNK, self.rows)
+                if disk[lo:hi].tobytes() == local[lo:hi]:
+                    continue
+                for row in range(lo, hi):
+                    if disk[row] != local[row]:
+                        local[row] = disk[row]
+                        changed.append(row)
+            if changed:
+                self.version += 1
+            return changed
+
+    def to_dict(self) -> dict:
+        """Вложенный dict в формате addresses.json (для выгрузки/скриптов)."""
+        data: dict = {}
+        point = self.point_getter()
+        for row in range(self.rows):
+            p = point(row)
+            data.setdefault(p.district, {}).setdefault(p.street, {}).setdefault(p.building, {})[p.entrance] = {
+                "lat": self.lat[row], "lon": self.lon[row], "radius": self.radius[row], "active": bool(self.active[row]),
+            }
+        return data
+
+
+address_store = AddressStore()
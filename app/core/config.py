@@ -0,0 +1,70 @@
+# app/core/config.py
+"""
+Настройки запуска ботов из окружения (.env).
+
+BOT_MODE=polling (по умолчанию) — long polling, как раньше;
+BOT_MODE=webhook — Telegram сам присылает обновления на WEBHOOK_URL/telegram/<token>.
+TELEGRAM_API_URL — другой адрес Bot API (локальный bot-api сервер или фейковый
+сервер в тестах), формат как у telebot.apihelper.API_URL: "http://host:port/bot{0}/{1}".
+LIFTBOT_DATA_DIR — каталог данных (requests.db, maintenance.db, базы компаний,
+addresses.json/.bin, json-файлы ботов); по умолчанию — корень проекта.
+"""
+
+import os
+
+import telebot
+
+DATA_DIR = os.getenv("LIFTBOT_DATA_DIR") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+
+# Публичный https-адрес, на который Telegram шлёт обновления (без /telegram/<token>)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+# Проверяется по заголовку X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# HTTP-сервер процесса ботов: webhook + /bot_metrics (nginx проксирует сюда только /telegram/)
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "5001"))
+# Диспетчер обновлений (app/core/dispatcher.py): потоки-шарды по chat.id и очередь каждого
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "8"))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "200"))
+# Как часто писать метрики диспетчера в лог, сек
+UPDATE_METRICS_LOG_SECONDS = float(os.getenv("UPDATE_METRICS_LOG_SECONDS", "300"))
+
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+
+
+def configure_telebot():
+    """Применить TELEGRAM_API_URL к telebot (вызывается до создания TeleBot)."""
+    if TELEGRAM_API_URL:
+        telebot.apihelper.API_URL = TELEGRAM_API_URL
+
+# Исходящая очередь (app/core/outbox.py): лимиты Telegram и повторы
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", "25"))          # msg/s на бота
+OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", "1"))               # msg/s в личный чат
+OUTBOX_GROUP_RATE_PER_MIN = float(os.getenv("OUTBOX_GROUP_RATE_PER_MIN", "20"))
+OUTBOX_GROUP_BURST = float(os.getenv("OUTBOX_GROUP_BURST", "3"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+# Сколько дней хранить неотправленные (failed) строки для разбора, потом удаляются
+OUTBOX_FAILED_RETENTION_DAYS = float(os.getenv("OUTBOX_FAILED_RETENTION_DAYS", "7"))
+
+# Состояния диалогов ботов (app/core/state_store.py)
+STATE_TTL_SECONDS = float(os.getenv("STATE_TTL_SECONDS", str(24 * 3600)))
+STATE_HOT_SIZE = int(os.getenv("STATE_HOT_SIZE", "256"))
+STATE_MISS_TTL_SECONDS = float(os.getenv("STATE_MISS_TTL_SECONDS", "30"))
+
+# Геолокация в боте заявок (app/bot_requests/geocoder.py)
+GEO_BUILDING_FALLBACK_METERS = float(os.getenv("GEO_BUILDING_FALLBACK_METERS", "60"))
+GEO_NOMINATIM_FALLBACK = os.getenv("GEO_NOMINATIM_FALLBACK", "0") == "1"
+GEO_NOMINATIM_CACHE_SIZE = int(os.getenv("GEO_NOMINATIM_CACHE_SIZE", "1024"))
+
+# Повторные заявки на тот же подъезд в пределах окна (от последнего звонка) присоединяются
+# к открытой заявке вместо новой (app/bot_requests/incidents.py); 0 — выключено
+REQUEST_COALESCE_SECONDS = float(os.getenv("REQUEST_COALESCE_SECONDS", "900"))
+
+# Планировщик (app/core/scheduler.py): аренда лидера, сек; время утренней сводки (Киев)
+SCHEDULER_LEASE_SECONDS = float(os.getenv("SCHEDULER_LEASE_SECONDS", "60"))
+DAILY_SUMMARY_AT = os.getenv("DAILY_SUMMARY_AT", "08:30")
+# Пролонгация и статусы договоров (app/contracts/services.py), время по Киеву
+CONTRACTS_REFRESH_AT = os.getenv("CONTRACTS_REFRESH_AT", "00:05")
@@ -0,0 +1,200 @@
+# app/core/dispatcher.py
+"""
+Параллельная обработка обновлений Telegram с порядком внутри чата.
+
+Обновления раскладываются по шардам по chat.id: у каждого шарда своя очередь
+и свой поток. Обновления одного чата идут строго по порядку (шаги диалога
+в user_states не перепутаются), разные чаты обрабатываются параллельно —
+медленный handler (геокодер, get_chat_member в цикле) держит только свой шард.
+
+    update_dispatcher.attach(bot)     # polling: telebot отдаёт обновления сюда
+    update_dispatcher.submit(bot, u)  # webhook
+    update_dispatcher.metrics()       # глубина очередей, латентность handler'ов
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from collections import Counter, deque
+
+import telebot
+from telebot import types
+
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних замеров держать для перцентилей
+LATENCY_WINDOW = 1000
+
+
+def chat_key(update: types.Update) -> int:
+    """Ключ шардирования: id чата (или пользователя, если чата нет)."""
+    for name in ("message", "edited_message", "channel_post", "edited_channel_post",
+                 "my_chat_member", "chat_member", "chat_join_request"):
+        obj = getattr(update, name, None)
+        if obj is not None and getattr(obj, "chat", None) is not None:
+            return obj.chat.id
+    call = update.callback_query
+    if call is not None:
+        if call.message is not None:
+            return call.message.chat.id
+        return call.from_user.id
+    for name in ("inline_query", "chosen_inline_result", "shipping_query", "pre_checkout_query", "poll_answer"):
+        obj = getattr(update, name, None)
+        user = getattr(obj, "from_user", None) or getattr(obj, "user", None)
+        if user is not None:
+            return user.id
+    return 0
+
+
+def update_kind(update: types.Update) -> str:
+    for kind in ("message", "callback_query", "edited_message", "my_chat_member", "chat_member"):
+        if getattr(update, kind, None) is not None:
+            return kind
+    return "other"
+
+
+class _LatencyStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: deque = deque(maxlen=LATENCY_WINDOW)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def as_dict(self) -> dict:
+        recent = sorted(self.recent)
+
+        def pct(p):
+            return round(recent[min(len(recent) - 1, int(len(recent) * p))] * 1000, 1) if recent else None
+
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 1) if self.count else None,
+            "p50_ms": pct(0.5),
+            "p95_ms": pct(0.95),
+            "max_ms": round(self.max * 1000, 1),
+        }
+
+
+class ShardedDispatcher:
+    """N потоков, у каждого ограниченная очередь; шард = chat_key(update) % N."""
+
+    def __init__(self, workers: int = config.UPDATE_WORKERS, queue_size: int = config.UPDATE_QUEUE_SIZE):
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(max(1, workers))]
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._latency: dict[str, _LatencyStats] = {}
+        self._counters: Counter = Counter()
+        self._busy = [False] * len(self._queues)
+        self._process: dict[str, object] = {}  # token -> исходный bot.process_new_updates
+
+    # --- приём ---
+    def attach(self, bot: telebot.TeleBot):
+        """Направить обновления бота (polling) через диспетчер; handler'ы выполняют наши потоки."""
+        if bot.token in self._process:
+            return
+        self._process[bot.token] = bot.process_new_updates
+        bot.threaded = False
+
+        def submit_all(updates):
+            # telebot сдвигает last_update_id в process_new_updates, который теперь
+            # выполняется в потоке шарда позже; без этого следующий get_updates
+            # вернул бы те же обновления, и handler'ы сработали бы повторно
+            if updates:
+                bot.last_update_id = max(bot.last_update_id, max(u.update_id for u in updates))
+            # polling: при переполнении ждём, а не теряем обновления
+            for update in updates:
+                self.submit(bot, update, block=True)
+
+        bot.process_new_updates = submit_all
+        self.start()
+
+    def submit(self, bot: telebot.TeleBot, update: types.Update, block: bool = False) -> bool:
+        """False — очередь шарда переполнена (только при block=False)."""
+        process = self._process.get(bot.token) or bot.process_new_updates
+        shard = chat_key(update) % len(self._queues)
+        try:
+            self._queues[shard].put((process, update, time.monotonic()), block=block)
+        except queue.Full:
+            with self._lock:
+                self._counters["rejected"] += 1
+            return False
+        return True
+
+    # --- обработка ---
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(len(self._queues)):
+                t = threading.Thread(target=self._run, args=(i,), name=f"tg-shard-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _run(self, shard: int):
+        q = self._queues[shard]
+        while True:
+            process, update, queued_at = q.get()
+            self._busy[shard] = True
+            started = time.monotonic()
+            failed = False
+            try:
+                process([update])
+            except Exception:
+                failed = True
+                logger.exception("Update %s failed", update.update_id)
+            finally:
+                finished = time.monotonic()
+                self._busy[shard] = False
+                self._record(update_kind(update), started - queued_at, finished - started, failed)
+                q.task_done()
+
+    def _record(self, kind: str, waited: float, took: float, failed: bool):
+        with self._lock:
+            self._counters["processed"] += 1
+            if failed:
+                self._counters["failed"] += 1
+            self._latency.setdefault("queue_wait", _LatencyStats()).add(waited)
+            self._latency.setdefault(kind, _LatencyStats()).add(took)
+
+    def join(self):
+        """Дождаться обработки всего, что уже в очередях (для тестов)."""
+        for q in self._queues:
+            q.join()
+
+    # --- метрики ---
+    def metrics(self) -> dict:
+        depths = [q.qsize() for q in self._queues]
+        with self._lock:
+            return {
+                "workers": len(self._queues),
+                "queue_depth": sum(depths),
+                "queue_depth_by_shard": depths,
+                "busy_workers": sum(self._busy),
+                "processed": self._counters["processed"],
+                "failed": self._counters["failed"],
+                "rejected": self._counters["rejected"],
+                "latency": {kind: stats.as_dict() for kind, stats in self._latency.items()},
+            }
+
+    def log_metrics(self):
+        m = self.metrics()
+        handler = {k: v for k, v in m["latency"].items() if k != "queue_wait"}
+        logger.info(
+            "Dispatcher: depth=%s busy=%s/%s processed=%s failed=%s rejected=%s latency=%s",
+            m["queue_depth"], m["busy_workers"], m["workers"], m["processed"],
+            m["failed"], m["rejected"], handler,
+        )
+
+
+update_dispatcher = ShardedDispatcher()
@@ -0,0 +1,67 @@
+# app/core/events.py
+"""
+Простая in-process шина событий для живых обновлений веб-интерфейса (SSE).
+
+Издатели (слой записи заявок) вызывают publish(); каждое открытое
+SSE-подключение держит свою очередь через subscribe().
+"""
+
+from __future__ import annotations
+
+import json
+import queue
+import logging
+import threading
+from typing import Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Интервал keep-alive комментариев в SSE-потоке, сек
+HEARTBEAT_SECONDS = 15
+
+
+class EventBus:
+    """Fan-out событий по очередям подписчиков. Медленный подписчик теряет события, а не тормозит издателя."""
+
+    def __init__(self, max_queue: int = 100):
+        self._subscribers: set[queue.Queue] = set()
+        self._lock = threading.Lock()
+        self._max_queue = max_queue
+
+    def subscribe(self) -> queue.Queue:
+        q: queue.Queue = queue.Queue(maxsize=self._max_queue)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue) -> None:
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event_type: str, data: Optional[dict[str, Any]] = None) -> None:
+        event = (event_type, data or {})
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                logger.warning("SSE subscriber queue full, dropping %s", event_type)
+
+    def stream(self, q: queue.Queue, heartbeat: int = HEARTBEAT_SECONDS) -> Iterator[str]:
+        """Генератор строк в формате text/event-stream для одной подписки."""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event_type, data = q.get(timeout=heartbeat)
+                except queue.Empty:
+                    # комментарий-пинг: держит соединение и выявляет отключившихся клиентов
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        finally:
+            self.unsubscribe(q)
+
+
+event_bus = EventBus()
@@ -0,0 +1,158 @@
+# app/core/geo_index.py
+"""
+Пространственный индекс точек подъездов (колонки app.core.address_store).
+
+Город делится на квадратные ячейки (~CELL_METERS). Запрос смотрит только ячейки
+вокруг точки, а не все подъезды города, поэтому поиск ближайшего подъезда стоит
+доли миллисекунды и не растёт с размером базы (несколько городов — не проблема).
+
+Если установлен NumPy, расстояния до кандидатов считаются векторно; без него —
+тот же haversine в цикле по кандидатам.
+
+    geo = GeoIndex(); address_registry.add_listener(geo)   # или geo.build(address_store)
+    geo.nearest_entrance(lat, lon)            # в радиусе своей точки, только active
+    geo.nearest(lat, lon, max_m=60)           # ближайший в 60 м, радиусы не учитываются
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+from typing import Callable, NamedTuple, Optional
+
+from app.core.address_store import AddressPoint, AddressStore
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен
+    np = None
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEG_LAT = 111320.0
+# Сторона ячейки, м (не меньше самого большого радиуса точки)
+CELL_METERS = 100.0
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Расстояние между двумя точками в метрах (без внешних зависимостей)."""
+    f1 = math.radians(lat1)
+    f2 = math.radians(lat2)
+    df = math.radians(lat2 - lat1)
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(df / 2) ** 2 + math.cos(f1) * math.cos(f2) * math.sin(dl / 2) ** 2
+    return EARTH_RADIUS_M * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+class GeoMatch(NamedTuple):
+    point: AddressPoint
+    distance: float
+
+
+class GeoIndex:
+    def __init__(self, cell_m: float = CELL_METERS):
+        self.base_cell_m = cell_m
+        self.cell_m = cell_m
+        self._lock = threading.Lock()
+        self._point: Callable[[int], AddressPoint] = lambda i: None
+        self._size = 0
+        self._lat: list = []
+        self._lon: list = []
+        self._radius: list = []
+        self._active: list = []
+        self._cells: dict[tuple[int, int], list] = {}
+        self._dlat = self._dlon = 1.0
+
+    def __len__(self) -> int:
+        return self._size
+
+    # ---------- построение ----------
+    def build(self, store: AddressStore):
+        """
+        Пересобрать сетку по колонкам store (lat, lon, radius — без копирования).
+        active читается живьём: /enable и /disable не требуют пересборки.
+        """
+        lats, lons, radii, active = store.lat, store.lon, store.radius, store.active
+        cell_m = max(self.base_cell_m, max(radii, default=0.0))
+        # по долготе берём ячейку на самой северной точке: южнее она только шире
+        max_abs_lat = max((abs(v) for v in lats), default=0.0)
+        dlat = cell_m / METERS_PER_DEG_LAT
+        dlon = cell_m / (METERS_PER_DEG_LAT * max(math.cos(math.radians(max_abs_lat)), 0.01))
+        cells: dict[tuple[int, int], list] = {}
+        for i, (plat, plon) in enumerate(zip(lats, lons)):
+            cells.setdefault((math.floor(plat / dlat), math.floor(plon / dlon)), []).append(i)
+
+        if np is not None:
+            lats, lons, radii = (np.frombuffer(col, dtype=np.float64) for col in (lats, lons, radii))
+            active = np.frombuffer(active, dtype=np.uint8).view(bool)
+            cells = {key: np.array(idx, dtype=np.int64) for key, idx in cells.items()}
+
+        with self._lock:
+            self._point, self._size = store.point_getter(), len(lats)
+            self._lat, self._lon, self._radius, self._active = lats, lons, radii, active
+            self._cells, self._dlat, self._dlon, self.cell_m = cells, dlat, dlon, cell_m
+        logger.info("Geo index: %d points in %d cells (cell %.0f m, numpy=%s)",
+                    self._size, len(cells), cell_m, np is not None)
+
+    # ---------- listener protocol (app.core.address_registry) ----------
+    def reset(self, store: AddressStore):
+        self.build(store)
+
+    def apply(self, changes):
+        pass  # active читается из store.active живьём
+
+    # ---------- поиск ----------
+    def nearest_entrance(self, lat: float, lon: float, active_only: bool = True) -> Optional[GeoMatch]:
+        """Ближайший подъезд, в радиус которого попадает точка."""
+        return self._nearest(lat, lon, 1, lambda i, d: d <= self._radius[i], active_only)
+
+    def nearest(self, lat: float, lon: float, max_m: float, active_only: bool = False) -> Optional[GeoMatch]:
+        """Ближайший подъезд не дальше max_m (радиусы точек не учитываются)."""
+        rings = max(1, math.ceil(max_m / self.cell_m))
+        return self._nearest(lat, lon, rings, lambda i, d: d <= max_m, active_only)
+
+    def _candidates(self, lat: float, lon: float, rings: int) -> list:
+        ci, cj = math.floor(lat / self._dlat), math.floor(lon / self._dlon)
+        found = []
+        for di in range(-rings, rings + 1):
+            for dj in range(-rings, rings + 1):
+                idx = self._cells.get((ci + di, cj + dj))
+                if idx is not None:
+                    found.append(idx)
+        return found
+
+    def _nearest(self, lat: float, lon: float, rings: int,
+                 accept: Callable[[int, float], bool], active_only: bool) -> Optional[GeoMatch]:
+        with self._lock:
+            chunks = self._candidates(lat, lon, rings)
+            if not chunks:
+                return None
+            if np is not None:
+                return self._nearest_numpy(lat, lon, np.concatenate(chunks), accept, active_only)
+            best, best_dist = None, float("inf")
+            for idx in chunks:
+                for i in idx:
+                    if active_only and not self._active[i]:
+                        continue
+                    d = haversine_m(lat, lon, self._lat[i], self._lon[i])
+                    if d < best_dist and accept(i, d):
+                        best, best_dist = i, d
+            return GeoMatch(self._point(best), best_dist) if best is not None else None
+
+    def _nearest_numpy(self, lat, lon, idx, accept, active_only) -> Optional[GeoMatch]:
+        if active_only:
+            idx = idx[self._active[idx]]
+        if not idx.size:
+            return None
+        f1, f2 = math.radians(lat), np.radians(self._lat[idx])
+        df = f2 - f1
+        dl = np.radians(self._lon[idx] - lon)
+        a = np.sin(df / 2) ** 2 + math.cos(f1) * np.cos(f2) * np.sin(dl / 2) ** 2
+        dist = EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        for k in np.argsort(dist, kind="stable"):
+            i, d = int(idx[k]), float(dist[k])
+            if accept(i, d):
+                return GeoMatch(self._point(i), d)
+        return None
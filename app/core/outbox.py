@@ -0,0 +1,310 @@
+# app/core/outbox.py
+"""
+Исходящая очередь сообщений Telegram.
+
+Веб-маршруты и handler'ы не ходят в Telegram сами, а кладут вызов в таблицу
+outbox (requests.db) и сразу возвращаются. Процесс ботов (run_bot.py) разбирает
+очередь:
+
+- token bucket на каждый чат (личный ~1 msg/s, группа ~20 msg/min) и общий (~30 msg/s);
+- порядок сообщений внутри одного чата сохраняется;
+- 429 — повтор через retry_after, сетевые ошибки / 5xx — экспоненциальная пауза;
+- за проход каждый чат шарда отправляет не больше одного сообщения (своё самое раннее),
+  поэтому длинная очередь одной группы не задерживает остальные чаты;
+- очередь переживает перезапуск: невыполненные вызовы лежат в SQLite,
+  строки failed хранятся OUTBOX_FAILED_RETENTION_DAYS (purge_failed).
+
+    outbox.send_message("requests", chat_id, "текст", reply_markup=kb)
+    outbox.edit_message_reply_markup("requests", chat_id, message_id, reply_markup=None)
+    outbox.edit_message_text("requests", chat_id, message_id, "новий текст", reply_markup=kb)
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import telebot
+from telebot.apihelper import ApiTelegramException
+
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DB_PATH = os.path.join(config.DATA_DIR, "requests.db")
+
+# Максимальная длина текста сообщения Telegram
+TELEGRAM_TEXT_LIMIT = 4096
+# Сколько чатов шард обслуживает за проход и как часто проверяет чужие записи, сек
+BATCH_SIZE = 200
+POLL_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 300
+
+
+class TokenBucket:
+    """rate токенов в секунду, не больше capacity."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def ready(self) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens >= 1
+
+    def wait_time(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+def paginate(lines: list[str], header: str = "", limit: int = TELEGRAM_TEXT_LIMIT) -> list[str]:
+    """
+    Склеить строки в страницы не длиннее limit (строки не разрываются, кроме слишком длинных).
+    header ставится в начало каждой страницы; если в нём есть {page} / {pages} — подставляются номера.
+    """
+    # запас под номера страниц в заголовке
+    room = limit - len(header.format(page=999, pages=999)) - 1 if header else limit
+    pages, current = [], ""
+    for line in lines:
+        line = line[:room]
+        if current and len(current) + 1 + len(line) > room:
+            pages.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current or not pages:
+        pages.append(current)
+    if not header:
+        return pages
+    return [f"{header.format(page=i, pages=len(pages))}\n{page}" for i, page in enumerate(pages, 1)]
+
+
+def _serialize(kwargs: dict) -> str:
+    markup = kwargs.get("reply_markup")
+    if markup is not None and hasattr(markup, "to_json"):
+        kwargs = {**kwargs, "reply_markup": markup.to_json()}
+    return json.dumps(kwargs, ensure_ascii=False)
+
+
+class Outbox:
+    def __init__(self, db_path: str = OUTBOX_DB_PATH, workers: int = config.OUTBOX_WORKERS):
+        self.db_path = db_path
+        self.workers = max(1, workers)
+        self._bots: dict[str, telebot.TeleBot] = {}
+        self._global = TokenBucket(config.OUTBOX_GLOBAL_RATE, config.OUTBOX_GLOBAL_RATE)
+        self._chats: dict[int, TokenBucket] = {}
+        self._chats_lock = threading.Lock()
+        self._wake = [threading.Event() for _ in range(self.workers)]
+        self._threads: list[threading.Thread] = []
+
+    # ---------- schema ----------
+    def init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    bot TEXT NOT NULL,
+                    method TEXT NOT NULL,
+                    chat_id INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_error TEXT
+                )
+            """)
+            # голова очереди каждого чата: MIN(id) по (chat_id, id) среди pending
+            conn.execute("DROP INDEX IF EXISTS idx_outbox_pending")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_outbox_pending_chat ON outbox(chat_id, id) WHERE status = 'pending'"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_failed ON outbox(created_at) WHERE status = 'failed'")
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ---------- enqueue (любой процесс) ----------
+    def enqueue(self, bot: str, method: str, chat_id: int, **kwargs) -> Optional[int]:
+        """Поставить вызов bot.<method>(chat_id=..., **kwargs) в очередь. None — не удалось."""
+        now = time.time()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cur = conn.execute(
+                "INSERT INTO outbox (bot, method, chat_id, payload, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (bot, method, int(chat_id), _serialize(kwargs), now, now),
+            )
+            conn.commit()
+        except (sqlite3.Error, TypeError, ValueError):
+            logger.exception("Failed to enqueue %s to %s", method, chat_id)
+            return None
+        finally:
+            conn.close()
+        self._wake[self._shard(int(chat_id))].set()
+        return cur.lastrowid
+
+    def send_message(self, bot: str, chat_id: int, text: str, **kwargs) -> Optional[int]:
+        return self.enqueue(bot, "send_message", chat_id, text=text, **kwargs)
+
+    def edit_message_reply_markup(self, bot: str, chat_id: int, message_id: int, reply_markup=None) -> Optional[int]:
+        return self.enqueue(bot, "edit_message_reply_markup", chat_id, message_id=message_id, reply_markup=reply_markup)
+
+    def edit_message_text(self, bot: str, chat_id: int, message_id: int, text: str, **kwargs) -> Optional[int]:
+        return self.enqueue(bot, "edit_message_text", chat_id, message_id=message_id, text=text, **kwargs)
+
+    # ---------- sender (процесс ботов) ----------
+    def register_bot(self, name: str, bot: telebot.TeleBot):
+        self._bots[name] = bot
+
+    def start(self):
+        if self._threads:
+            return
+        for shard in range(self.workers):
+            t = threading.Thread(target=self._run, args=(shard,), name=f"outbox-{shard}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _shard(self, chat_id: int) -> int:
+        return abs(chat_id) % self.workers
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        with self._chats_lock:
+            bucket = self._chats.get(chat_id)
+            if bucket is None:
+                if chat_id < 0:
+                    rate = config.OUTBOX_GROUP_RATE_PER_MIN / 60
+                    bucket = TokenBucket(rate, config.OUTBOX_GROUP_BURST)
+                else:
+                    bucket = TokenBucket(config.OUTBOX_CHAT_RATE, 1)
+                self._chats[chat_id] = bucket
+            return bucket
+
+    def _run(self, shard: int):
+        conn = sqlite3.connect(self.db_path)
+        while True:
+            try:
+                delay = self._pass(conn, shard)
+            except Exception:
+                logger.exception("Outbox shard %s failed", shard)
+                delay = POLL_SECONDS
+            self._wake[shard].wait(min(delay, POLL_SECONDS))
+            self._wake[shard].clear()
+
+    def _pass(self, conn, shard: int) -> float:
+        """
+        Один проход по шарду: каждому чату — его самое раннее ожидающее сообщение.
+        Возвращает, через сколько стоит повторить (0 — что-то отправлено, есть ещё работа).
+        """
+        now = time.time()
+        # только головы очередей: более поздние сообщения чата не обгоняют раннее (порядок),
+        # а длинная очередь одного чата занимает одну строку выборки, а не всю пачку
+        rows = conn.execute(
+            "SELECT id, bot, method, chat_id, payload, attempts FROM outbox "
+            "WHERE id IN (SELECT MIN(id) FROM outbox WHERE status = 'pending' AND abs(chat_id) % ? = ? "
+            "GROUP BY chat_id) AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+            (self.workers, shard, now, BATCH_SIZE),
+        ).fetchall()
+        delay = POLL_SECONDS
+        for row_id, bot_name, method, chat_id, payload, attempts in rows:
+            bucket = self._chat_bucket(chat_id)
+            if not bucket.ready():
+                delay = min(delay, bucket.wait_time())
+                continue
+            if not self._global.try_take():
+                return self._global.wait_time()
+            bucket.try_take()
+            if self._deliver(conn, row_id, bot_name, method, chat_id, payload, attempts):
+                delay = 0.0
+        return delay
+
+    def _deliver(self, conn, row_id, bot_name, method, chat_id, payload, attempts) -> bool:
+        bot = self._bots.get(bot_name)
+        if bot is None:
+            self._finish(conn, row_id, "failed", f"unknown bot {bot_name}")
+            return True
+        try:
+            getattr(bot, method)(chat_id=chat_id, **json.loads(payload))
+        except ApiTelegramException as e:
+            if e.error_code == 429:
+                retry_after = (e.result_json.get("parameters") or {}).get("retry_after", 5)
+                logger.warning("Outbox 429 for chat %s, retry after %ss", chat_id, retry_after)
+                self._retry(conn, row_id, attempts, retry_after, str(e), count_attempt=False)
+                return False
+            if e.error_code >= 500:
+                return self._backoff(conn, row_id, attempts, str(e))
+            # 400 / 403 (сообщение не изменилось, бот заблокирован и т.п.) — повтор не поможет
+            logger.warning("Outbox %s to %s failed: %s", method, chat_id, e.description)
+            self._finish(conn, row_id, "failed", str(e))
+            return True
+        except Exception as e:
+            return self._backoff(conn, row_id, attempts, str(e))
+        conn.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+        conn.commit()
+        return True
+
+    def _backoff(self, conn, row_id, attempts, error) -> bool:
+        if attempts + 1 >= config.OUTBOX_MAX_ATTEMPTS:
+            logger.error("Outbox message %s dropped after %s attempts: %s", row_id, attempts + 1, error)
+            self._finish(conn, row_id, "failed", error)
+            return True
+        self._retry(conn, row_id, attempts, min(2 ** attempts, MAX_BACKOFF_SECONDS), error)
+        return False
+
+    def _retry(self, conn, row_id, attempts, delay, error, count_attempt=True):
+        conn.execute(
+            "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+            (attempts + (1 if count_attempt else 0), time.time() + delay, error, row_id),
+        )
+        conn.commit()
+
+    def _finish(self, conn, row_id, status, error):
+        conn.execute("UPDATE outbox SET status = ?, last_error = ? WHERE id = ?", (status, error, row_id))
+        conn.commit()
+
+    def purge_failed(self, now: Optional[float] = None) -> int:
+        """Удалить строки failed старше OUTBOX_FAILED_RETENTION_DAYS. Возвращает число удалённых."""
+        cutoff = (now or time.time()) - config.OUTBOX_FAILED_RETENTION_DAYS * 86400
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cur = conn.execute("DELETE FROM outbox WHERE status = 'failed' AND created_at < ?", (cutoff,))
+            conn.commit()
+        finally:
+            conn.close()
+        if cur.rowcount:
+            logger.info("Outbox: purged %s failed messages", cur.rowcount)
+        return cur.rowcount
+
+    def stats(self) -> dict:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+        finally:
+            conn.close()
+        return {"pending": counts.get("pending", 0), "failed": counts.get("failed", 0)}
+
+
+outbox = Outbox()
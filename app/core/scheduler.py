@@ -0,0 +1,355 @@
+# app/core/scheduler.py
+"""
+Планировщик периодических задач процесса ботов.
+
+Один поток на процесс: куча (heap) сроков ближайших запусков, поток спит до
+ближайшего срока (или до продления аренды лидера), а не опрашивает раз в минуту.
+
+- Задачи и отметки последнего запуска — в таблице scheduled_jobs (requests.db).
+  Запуск «забирается» атомарно: UPDATE ... WHERE last_run = <старая отметка>,
+  поэтому один и тот же срок не выполнится дважды ни после рестарта, ни в двух
+  процессах сразу.
+- Пропущенные сроки (процесс лежал в 08:30) догоняются один раз при старте —
+  за последний пропущенный срок, а не за каждый.
+- Лидер: задачи выполняет только процесс, держащий аренду в scheduler_lease
+  (продлевается каждые lease/3 сек; упавший лидер теряет её через lease сек).
+- Новая задача не выполняется задним числом: первый запуск — в ближайший срок.
+- once(): разовая задача при старте — выполняется один раз в этом процессе,
+  когда он становится лидером (в БД не сохраняется).
+
+    scheduler.daily("send_daily", "08:30", send_daily)
+    scheduler.every("rollup", 3600, rebuild_rollup)
+    scheduler.once("warmup", warm_caches)
+    scheduler.start()
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from pytz import timezone
+
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_DB_PATH = os.path.join(config.DATA_DIR, "requests.db")
+
+kyiv_tz = timezone("Europe/Kyiv")
+
+
+class Job(ABC):
+    def __init__(self, name: str, func: Callable[[], object]):
+        self.name = name
+        self.func = func
+
+    @abstractmethod
+    def previous(self, now: float) -> float:
+        """Последний срок не позже now (epoch)."""
+
+    @abstractmethod
+    def next_after(self, ts: float) -> float:
+        """Первый срок строго после ts (epoch)."""
+
+
+class DailyJob(Job):
+    """Каждый день в HH:MM по Киеву (переходы на летнее время учитываются)."""
+
+    def __init__(self, name: str, at: str, func: Callable[[], object], tz=kyiv_tz):
+        super().__init__(name, func)
+        hour, minute = (int(x) for x in at.split(":"))
+        self.at = at
+        self.tz = tz
+        self._hm = (hour, minute)
+
+    def _slot(self, day) -> float:
+        return self.tz.localize(datetime(day.year, day.month, day.day, *self._hm)).timestamp()
+
+    def previous(self, now: float) -> float:
+        day = datetime.fromtimestamp(now, self.tz).date()
+        slot = self._slot(day)
+        return slot if slot <= now else self._slot(day - timedelta(days=1))
+
+    def next_after(self, ts: float) -> float:
+        day = datetime.fromtimestamp(ts, self.tz).date()
+        slot = self._slot(day)
+        return slot if slot > ts else self._slot(day + timedelta(days=1))
+
+
+class IntervalJob(Job):
+    """Каждые seconds секунд (сроки выровнены по epoch: одинаковы во всех процессах)."""
+
+    def __init__(self, name: str, seconds: float, func: Callable[[], object]):
+        super().__init__(name, func)
+        self.seconds = float(seconds)
+
+    def previous(self, now: float) -> float:
+        slot = math.floor(now / self.seconds) * self.seconds
+        return slot if slot <= now else slot - self.seconds
+
+    def next_after(self, ts: float) -> float:
+        # границы сравниваем явно: при дробном шаге деление с плавающей точкой ошибается на шаг
+        slot = (math.floor(ts / self.seconds) + 1) * self.seconds
+        return slot if slot > ts else slot + self.seconds
+
+
+class Scheduler:
+    def __init__(self, db_path: str = SCHEDULER_DB_PATH, lease_seconds: float = config.SCHEDULER_LEASE_SECONDS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._jobs: dict[str, Job] = {}
+        self._once: list[tuple[str, Callable[[], object]]] = []
+        self._heap: list[tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._db_ready = False
+        self.is_leader = False
+        self._lease_until = 0.0
+
+    # ---------- schema ----------
+    def init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS scheduled_jobs (
+                    name TEXT PRIMARY KEY,
+                    schedule TEXT NOT NULL,
+                    last_run REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    last_error TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS scheduler_lease (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+        self._db_ready = True
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._db_ready:
+            self.init_db()
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    # ---------- регистрация ----------
+    def daily(self, name: str, at: str, func: Callable[[], object]) -> Job:
+        return self.add(DailyJob(name, at, func))
+
+    def every(self, name: str, seconds: float, func: Callable[[], object]) -> Job:
+        return self.add(IntervalJob(name, seconds, func))
+
+    def once(self, name: str, func: Callable[[], object]):
+        """Выполнить func один раз, как только этот процесс станет лидером."""
+        with self._lock:
+            self._once.append((name, func))
+        self._wake.set()
+
+    def add(self, job: Job) -> Job:
+        now = time.time()
+        description = getattr(job, "at", None) or f"every {getattr(job, 'seconds', '?')}s"
+        conn = self._connect()
+        try:
+            with conn:
+                # новая задача: считаем последний срок уже выполненным
+                conn.execute(
+                    "INSERT OR IGNORE INTO scheduled_jobs (name, schedule, last_run) VALUES (?, ?, ?)",
+                    (job.name, description, job.previous(now)),
+                )
+                conn.execute("UPDATE scheduled_jobs SET schedule = ? WHERE name = ?", (description, job.name))
+                last_run = conn.execute("SELECT last_run FROM scheduled_jobs WHERE name = ?", (job.name,)).fetchone()[0]
+        finally:
+            conn.close()
+        with self._lock:
+            self._jobs[job.name] = job
+            heapq.heappush(self._heap, (job.next_after(last_run), next(self._seq), job.name))
+        self._wake.set()
+        logger.info("Scheduler: job %s (%s), next run %s", job.name, description,
+                    datetime.fromtimestamp(job.next_after(last_run), kyiv_tz).strftime("%Y-%m-%d %H:%M"))
+        return job
+
+    # ---------- лидер ----------
+    def _renew_lease(self, now: float) -> bool:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR IGNORE INTO scheduler_lease (name, owner, expires_at) VALUES ('leader', ?, 0)",
+                    (self.owner,),
+                )
+                cur = conn.execute(
+                    "UPDATE scheduler_lease SET owner = ?, expires_at = ? "
+                    "WHERE name = 'leader' AND (owner = ? OR expires_at < ?)",
+                    (self.owner, now + self.lease_seconds, self.owner, now),
+                )
+            leader = cur.rowcount == 1
+        except sqlite3.Error:
+            logger.exception("Scheduler: lease renewal failed")
+            leader = False
+        finally:
+            conn.close()
+        if leader != self.is_leader:
+            logger.info("Scheduler: %s leadership (%s)", "acquired" if leader else "lost", self.owner)
+        self.is_leader = leader
+        self._lease_until = now + self.lease_seconds / 3 if leader else 0.0
+        return leader
+
+    def _release_lease(self):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM scheduler_lease WHERE name = 'leader' AND owner = ?", (self.owner,))
+        finally:
+            conn.close()
+        self.is_leader = False
+
+    # ---------- выполнение ----------
+    def _claim(self, job: Job, now: float) -> Optional[float]:
+        """
+        Забрать наступивший срок: last_run -> последний срок не позже now (пропущенные схлопываются).
+        None — срок уже выполнен (другим процессом / до рестарта); иначе — новый last_run.
+        """
+        slot = job.previous(now)
+        conn = self._connect()
+        try:
+            with conn:
+                last_run = conn.execute("SELECT last_run FROM scheduled_jobs WHERE name = ?", (job.name,)).fetchone()[0]
+                if job.next_after(last_run) > now:
+                    return None
+                cur = conn.execute(
+                    "UPDATE scheduled_jobs SET last_run = ?, started_at = ? WHERE name = ? AND last_run = ?",
+                    (slot, now, job.name, last_run),
+                )
+            if cur.rowcount != 1:
+                return None
+            if job.next_after(last_run) < slot:
+                logger.warning("Scheduler: %s missed runs since %s, catching up once", job.name,
+                               datetime.fromtimestamp(job.next_after(last_run), kyiv_tz).strftime("%Y-%m-%d %H:%M"))
+            return slot
+        finally:
+            conn.close()
+
+    def _finish(self, job: Job, error: Optional[str]):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("UPDATE scheduled_jobs SET finished_at = ?, last_error = ? WHERE name = ?",
+                             (time.time(), error, job.name))
+        finally:
+            conn.close()
+
+    def _last_run(self, name: str) -> float:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT last_run FROM scheduled_jobs WHERE name = ?", (name,)).fetchone()[0]
+        finally:
+            conn.close()
+
+    def _run_once_jobs(self) -> list[str]:
+        with self._lock:
+            pending, self._once = self._once, []
+        ran = []
+        for name, func in pending:
+            started = time.monotonic()
+            try:
+                func()
+                ran.append(name)
+            except Exception:
+                logger.exception("Scheduler: one-off job %s failed", name)
+            logger.info("Scheduler: %s (once) done in %.2fs", name, time.monotonic() - started)
+        return ran
+
+    def run_pending(self, now: Optional[float] = None) -> list[str]:
+        """Выполнить задачи, срок которых наступил (вызывать у лидера). Возвращает имена выполненных."""
+        now = time.time() if now is None else now
+        ran = []
+        while True:
+            with self._lock:
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                _, _, name = heapq.heappop(self._heap)
+                job = self._jobs.get(name)
+            if job is None:
+                continue
+            try:
+                slot = self._claim(job, now)
+            except sqlite3.Error:
+                logger.exception("Scheduler: failed to claim %s", name)
+                slot = None
+            if slot is not None:
+                error = None
+                started = time.monotonic()
+                try:
+                    job.func()
+                    ran.append(name)
+                except Exception as e:
+                    logger.exception("Scheduler: job %s failed", name)
+                    error = repr(e)
+                logger.info("Scheduler: %s done in %.2fs", name, time.monotonic() - started)
+                self._finish(job, error)
+            else:
+                slot = self._last_run(name)
+            with self._lock:
+                heapq.heappush(self._heap, (job.next_after(slot), next(self._seq), name))
+        return ran
+
+    def _next_wakeup(self, now: float) -> float:
+        with self._lock:
+            due = self._heap[0][0] if self._heap else now + 3600
+        renew = self._lease_until if self.is_leader else now + self.lease_seconds / 3
+        return min(due, renew)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            now = time.time()
+            if not self.is_leader or now >= self._lease_until:
+                self._renew_lease(now)
+            if self.is_leader:
+                try:
+                    self._run_once_jobs()
+                    self.run_pending(now)
+                except Exception:
+                    logger.exception("Scheduler loop failed")
+            timeout = max(0.0, self._next_wakeup(time.time()) - time.time())
+            self._wake.wait(timeout)
+            self._wake.clear()
+        if self.is_leader:
+            self._release_lease()
+
+    def start(self) -> threading.Thread:
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+scheduler = Scheduler()
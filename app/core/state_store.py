@@ -0,0 +1,301 @@
+# app/core/state_store.py
+"""
+Состояния диалогов ботов (user_states), которые переживают перезапуск.
+
+StateStore ведёт себя как dict {chat_id: dict}, но:
+- пишет каждое изменение сразу в SQLite (write-through), поэтому незаконченная
+  заявка не теряется при рестарте процесса ботов;
+- держит в памяти только последние hot_size чатов (LRU), остальное читает из БД;
+- помнит и отсутствие состояния (miss_ttl секунд): предикаты хендлеров зовут
+  user_states.get(chat_id, {}) на каждое сообщение, в т.ч. из групп персонала,
+  где состояний нет, — это не должно стоить SELECT на каждый вызов;
+- забывает состояние через ttl секунд без изменений (брошенные диалоги).
+
+Значения — TrackedState (подкласс dict): st["step"] = "..." тоже сохраняется.
+Несколько полей за шаг — одной записью: st.update(step=..., name=...) или
+`with st.batch(): ...`. Вложенные изменения (st["list"].append(...)) не
+отслеживаются — присваивайте значение целиком. Значения должны сериализоваться в JSON.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Iterator
+
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+# Как часто чистить просроченные состояния в БД, сек
+PURGE_INTERVAL = 600
+
+
+class TrackedState(dict):
+    """dict, который сохраняет себя в StateStore после каждого изменения."""
+
+    def __init__(self, store: "StateStore", key: int, data=()):
+        super().__init__(data)
+        self._store = store
+        self._key = key
+        self._batch_depth = 0
+        self._dirty = False
+
+    def _save(self):
+        if self._batch_depth:
+            self._dirty = True
+            return
+        self._store._write(self._key, self)
+
+    @contextmanager
+    def batch(self):
+        """Изменения внутри блока сохраняются одной записью при выходе."""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._dirty:
+                self._dirty = False
+                self._save()
+
+    def __setitem__(self, k, v):
+        super().__setitem__(k, v)
+        self._save()
+
+    def __delitem__(self, k):
+        super().__delitem__(k)
+        self._save()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._save()
+
+    def setdefault(self, k, default=None):
+        if k in self:
+            return self[k]
+        self[k] = default
+        return default
+
+    def pop(self, k, *default):
+        value = super().pop(k, *default)
+        self._save()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._save()
+        return item
+
+    def clear(self):
+        super().clear()
+        self._save()
+
+    def copy(self) -> dict:
+        return dict(self)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class StateStore(MutableMapping):
+    """Состояния одного бота (namespace) в таблице user_states файла db_path."""
+
+    def __init__(self, db_path: str, namespace: str,
+                 ttl: float = config.STATE_TTL_SECONDS, hot_size: int = config.STATE_HOT_SIZE,
+                 miss_ttl: float = config.STATE_MISS_TTL_SECONDS):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.hot_size = hot_size
+        self.miss_ttl = miss_ttl
+        self._hot: OrderedDict[int, TrackedState] = OrderedDict()
+        self._expires: dict[int, float] = {}  # chat_id -> срок жизни (для горячих записей)
+        # chat_id -> до какого момента считаем, что состояния нет (сбрасывается при записи)
+        self._missing: OrderedDict[int, float] = OrderedDict()
+        self._lock = threading.RLock()
+        self._last_purge = 0.0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_states (
+                namespace TEXT NOT NULL,
+                chat_id INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (namespace, chat_id)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_user_states_expires ON user_states(expires_at)")
+        self._conn.commit()
+
+    # ---------- hot LRU ----------
+    def _remember(self, key: int, state: TrackedState):
+        self._hot[key] = state
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.hot_size:
+            evicted, _ = self._hot.popitem(last=False)
+            self._expires.pop(evicted, None)
+
+    def _remember_missing(self, key: int):
+        if self.miss_ttl <= 0:
+            return
+        self._missing[key] = time.time() + self.miss_ttl
+        self._missing.move_to_end(key)
+        while len(self._missing) > self.hot_size * 4:
+            self._missing.popitem(last=False)
+
+    def _known_missing(self, key: int) -> bool:
+        until = self._missing.get(key)
+        if until is None:
+            return False
+        if until >= time.time():
+            return True
+        del self._missing[key]
+        return False
+
+    # ---------- SQLite ----------
+    def _write(self, key: int, state: TrackedState):
+        with self._lock:
+            self._missing.pop(key, None)
+            expires_at = time.time() + self.ttl
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO user_states (namespace, chat_id, data, expires_at) VALUES (?, ?, ?, ?)",
+                    (self.namespace, key, json.dumps(dict(state), ensure_ascii=False), expires_at),
+                )
+                self._conn.commit()
+            except (sqlite3.Error, TypeError, ValueError):
+                logger.exception("Failed to save state for %s/%s", self.namespace, key)
+            if self._hot.get(key) is state:
+                self._expires[key] = expires_at
+                self._hot.move_to_end(key)
+            self._maybe_purge()
+
+    def _load(self, key: int):
+        row = self._conn.execute(
+            "SELECT data, expires_at FROM user_states WHERE namespace = ? AND chat_id = ?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] < time.time():
+            self._delete(key)
+            return None
+        self._expires[key] = row[1]  # _load вызывается только перед _remember
+        return TrackedState(self, key, json.loads(row[0]))
+
+    def _delete(self, key: int):
+        self._conn.execute("DELETE FROM user_states WHERE namespace = ? AND chat_id = ?", (self.namespace, key))
+        self._conn.commit()
+        self._expires.pop(key, None)
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        cur = self._conn.execute(
+            "DELETE FROM user_states WHERE namespace = ? AND expires_at < ?", (self.namespace, now)
+        )
+        self._conn.commit()
+        for key in [k for k, exp in self._expires.items() if exp < now]:
+            self._hot.pop(key, None)
+            self._expires.pop(key, None)
+        if cur.rowcount:
+            logger.info("Purged %d expired %s states", cur.rowcount, self.namespace)
+
+    # ---------- dict interface ----------
+    def __getitem__(self, key) -> TrackedState:
+        key = int(key)
+        with self._lock:
+            state = self._hot.get(key)
+            if state is not None and self._expires.get(key, 0) >= time.time():
+                self._hot.move_to_end(key)
+                return state
+            if state is not None:
+                self._hot.pop(key, None)
+            if self._known_missing(key):
+                raise KeyError(key)
+            state = self._load(key)
+            if state is None:
+                self._remember_missing(key)
+                raise KeyError(key)
+            self._remember(key, state)
+            return state
+
+    def __setitem__(self, key, value):
+        key = int(key)
+        with self._lock:
+            state = TrackedState(self, key, value)
+            self._remember(key, state)
+            self._write(key, state)
+
+    def __delitem__(self, key):
+        key = int(key)
+        with self._lock:
+            in_hot = self._hot.pop(key, None) is not None
+            cur = self._conn.execute(
+                "DELETE FROM user_states WHERE namespace = ? AND chat_id = ?", (self.namespace, key)
+            )
+            self._conn.commit()
+            self._expires.pop(key, None)
+            self._remember_missing(key)
+            if not in_hot and not cur.rowcount:
+                raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        try:
+            self[key]
+            return True
+        except (KeyError, TypeError, ValueError):
+            return False
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except (KeyError, TypeError, ValueError):
+            return default
+
+    def setdefault(self, key, default=None) -> TrackedState:
+        with self._lock:
+            try:
+                return self[key]
+            except KeyError:
+                self[key] = default or {}
+                return self[key]
+
+    def pop(self, key, *default):
+        with self._lock:
+            try:
+                state = self[key]
+            except (KeyError, TypeError, ValueError):
+                if default:
+                    return default[0]
+                raise KeyError(key)
+            del self[key]
+            return state.copy()
+
+    def __iter__(self) -> Iterator[int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chat_id FROM user_states WHERE namespace = ? AND expires_at >= ?",
+                (self.namespace, time.time()),
+            ).fetchall()
+        return iter([row[0] for row in rows])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM user_states WHERE namespace = ? AND expires_at >= ?",
+                (self.namespace, time.time()),
+            ).fetchone()[0]
+
+    def __repr__(self) -> str:
+        return f"StateStore({self.namespace!r}, {dict(self.items())!r})"
@@ -0,0 +1,41 @@
+# app/core/watcher.py
+"""
+Фоновый опрос изменений для нескольких процессов.
+
+Бот (run_bot.py) и веб-воркеры gunicorn — разные процессы с общей SQLite (WAL).
+Каждый процесс раз в interval секунд вызывает дешёвую проверку (обычно
+сравнение версии данных, SELECT по первичному ключу) и сам подтягивает дельту.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+_watchers: dict[str, threading.Thread] = {}
+_lock = threading.Lock()
+
+
+def start_watcher(name: str, poll: Callable[[], object], interval: float = 1.0) -> threading.Thread:
+    """Запустить daemon-поток, вызывающий poll() каждые interval сек (один на имя и процесс)."""
+    with _lock:
+        thread = _watchers.get(name)
+        if thread is not None and thread.is_alive():
+            return thread
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    poll()
+                except Exception:
+                    logger.exception("Watcher %s failed", name)
+
+        thread = threading.Thread(target=loop, name=f"watcher-{name}", daemon=True)
+        thread.start()
+        _watchers[name] = thread
+        return thread
@@ -0,0 +1,97 @@
+# app/core/webhook.py
+"""
+HTTP-сервер процесса ботов (run_bot.py).
+
+- POST /telegram/<token> — webhook-режим: Telegram присылает обновления, мы
+  кладём их в диспетчер (app/core/dispatcher.py) и сразу отвечаем 200;
+- GET /bot_metrics — метрики диспетчера (глубина очередей, латентность handler'ов)
+  и исходящей очереди.
+
+Обновления обрабатываются только здесь: в процессе ботов живут user_states,
+веб-воркеры gunicorn их не видят.
+
+    register_bot(requests_bot); register_bot(maintenance_bot)
+    set_webhooks()
+    start_bot_server()
+"""
+
+from __future__ import annotations
+
+import hmac
+import logging
+import threading
+from typing import Optional
+
+import telebot
+from flask import Blueprint, Flask, abort, jsonify, request
+from telebot import types
+from werkzeug.serving import make_server
+
+from app.core import config
+from app.core.dispatcher import update_dispatcher
+from app.core.outbox import outbox
+
+logger = logging.getLogger(__name__)
+
+webhook_bp = Blueprint("telegram_webhook", __name__)
+
+# token -> TeleBot (только боты в webhook-режиме)
+_bots: dict[str, telebot.TeleBot] = {}
+
+
+def register_bot(bot: telebot.TeleBot):
+    _bots[bot.token] = bot
+    update_dispatcher.attach(bot)
+
+
+@webhook_bp.route("/telegram/<token>", methods=["POST"])
+def telegram_webhook(token):
+    bot = _bots.get(token)
+    if bot is None:
+        abort(404)
+    if config.WEBHOOK_SECRET:
+        secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(secret, config.WEBHOOK_SECRET):
+            abort(403)
+    payload = request.get_json(silent=True)
+    if not payload:
+        abort(400)
+    update = types.Update.de_json(payload)
+    if not update_dispatcher.submit(bot, update):
+        # Telegram повторит доставку позже
+        logger.warning("Update queue is full, rejecting update %s", update.update_id)
+        return "queue full", 503
+    return ""
+
+
+@webhook_bp.route("/bot_metrics")
+def bot_metrics():
+    return jsonify({**update_dispatcher.metrics(), "outbox": outbox.stats()})
+
+
+def create_bot_app() -> Flask:
+    app = Flask(__name__)
+    app.register_blueprint(webhook_bp)
+    return app
+
+
+def set_webhooks():
+    """Выставить webhook в Telegram всем зарегистрированным ботам."""
+    if not config.WEBHOOK_URL:
+        logger.warning("WEBHOOK_URL not set — webhooks are not registered in Telegram")
+        return
+    for token, bot in _bots.items():
+        bot.remove_webhook()
+        bot.set_webhook(
+            url=f"{config.WEBHOOK_URL}/telegram/{token}",
+            secret_token=config.WEBHOOK_SECRET or None,
+        )
+
+
+def start_bot_server(host: Optional[str] = None, port: Optional[int] = None):
+    """Запустить HTTP-сервер процесса ботов в фоне."""
+    server = make_server(host or config.WEBHOOK_HOST, port or config.WEBHOOK_PORT,
+                         create_bot_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, name="bot-server", daemon=True).start()
+    logger.info("Bot server on %s:%s", server.host, server.port)
+    return server
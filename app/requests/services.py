@@ -0,0 +1,268 @@
+# app/requests/services.py
+"""
+Запросы заявок для веб-дашборда: фильтрация, сортировка и пагинация на стороне SQLite.
+
+Опирается на индексы из app.bot_requests.shared.init_database:
+(status, timestamp), (district, timestamp), (address, entrance).
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.bot_requests.shared import DB_PATH, row_to_request
+
+# Разрешённые поля сортировки (имя параметра -> колонка)
+SORT_FIELDS = {
+    "id": "id",
+    "timestamp": "timestamp",
+    "completed_time": "completed_time",
+    "status": "status",
+    "district": "district",
+    "address": "address",
+}
+DEFAULT_SORT = "-timestamp"
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+def _parse_sort(sort: Optional[str]) -> tuple[str, bool]:
+    """'-timestamp' -> ('timestamp', True). Неизвестное поле -> сортировка по умолчанию."""
+    sort = sort or DEFAULT_SORT
+    desc = sort.startswith("-")
+    column = SORT_FIELDS.get(sort.lstrip("-"))
+    if not column:
+        return _parse_sort(DEFAULT_SORT)
+    return column, desc
+
+
+def _day_after(date_str: str) -> str:
+    return (datetime.strptime(date_str, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def _build_where(district=None, date_from=None, date_to=None, q=None) -> tuple[list[str], list]:
+    where, params = [], []
+    if district:
+        where.append("district = ?")
+        params.append(district)
+    if date_from:
+        where.append("timestamp >= ?")
+        params.append(date_from)
+    if date_to:
+        # date_to включительно: timestamp < следующий день
+        where.append("timestamp < ?")
+        params.append(_day_after(date_to))
+    if q:
+        like = f"%{q.strip()}%"
+        where.append("(address LIKE ? OR name LIKE ? OR phone LIKE ? OR issue LIKE ?)")
+        params.extend([like] * 4)
+    return where, params
+
+
+def _encode_cursor(value, req_id) -> str:
+    """Значение колонки последней строки (как в БД) и её id. 'n' — NULL, 'v…' — значение (в т.ч. '')."""
+    return f"{'n' if value is None else f'v{value}'}|{req_id}"
+
+
+def _decode_cursor(cursor: str) -> tuple[Optional[str], int]:
+    value, _, req_id = cursor.rpartition("|")
+    return (None if value[:1] == "n" else value[1:]), int(req_id)
+
+
+def _keyset_where(column: str, desc: bool, value: Optional[str], last_id: int) -> tuple[str, list]:
+    """
+    Условие «строго после курсора» для ORDER BY column, id.
+
+    В SQLite NULL меньше любого значения: при ASC они идут первыми, при DESC — последними.
+    Сравнение (column, id) > (?, ?) с NULL даёт NULL, поэтому NULL-строки разбираются отдельно.
+    """
+    if not desc:
+        if value is None:
+            return f"(({column} IS NULL AND id > ?) OR {column} IS NOT NULL)", [last_id]
+        return f"({column}, id) > (?, ?)", [value, last_id]
+    if value is None:
+        return f"({column} IS NULL AND id < ?)", [last_id]
+    return f"(({column}, id) < (?, ?) OR {column} IS NULL)", [value, last_id]
+
+
+def query_requests(
+    status: Optional[str] = None,
+    district: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    q: Optional[str] = None,
+    sort: Optional[str] = None,
+    page: int = 1,
+    per_page: int = DEFAULT_PER_PAGE,
+    cursor: Optional[str] = None,
+    db_path: Optional[str] = None,
+) -> dict:
+    """
+    Одна страница заявок + общие счётчики.
+
+    date_from / date_to — 'YYYY-MM-DD' (включительно).
+    sort — имя поля из SORT_FIELDS, '-' в начале = по убыванию.
+    cursor — keyset-пагинация (значение из next_cursor предыдущего ответа);
+    если задан, page игнорируется.
+    """
+    column, desc = _parse_sort(sort)
+    per_page = max(1, min(int(per_page or DEFAULT_PER_PAGE), MAX_PER_PAGE))
+    page = max(1, int(page or 1))
+
+    where, params = _build_where(district, date_from, date_to, q)
+    status_where, status_params = list(where), list(params)
+    if status and status != "all":
+        status_where.append("status = ?")
+        status_params.append(status)
+
+    page_where, page_params = list(status_where), list(status_params)
+    if cursor:
+        clause, clause_params = _keyset_where(column, desc, *_decode_cursor(cursor))
+        page_where.append(clause)
+        page_params.extend(clause_params)
+
+    def sql_where(clauses: list[str]) -> str:
+        return f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    direction = "DESC" if desc else "ASC"
+    path = db_path or DB_PATH
+    conn = sqlite3.connect(path)
+    cur = conn.cursor()
+    try:
+        sql = (
+            f"SELECT * FROM requests {sql_where(page_where)} "
+            f"ORDER BY {column} {direction}, id {direction} LIMIT ?"
+        )
+        args = [*page_params, per_page]
+        if not cursor:
+            sql += " OFFSET ?"
+            args.append((page - 1) * per_page)
+        cur.execute(sql, args)
+        columns = [d[0] for d in cur.description]
+        raw_rows = cur.fetchall()
+        rows = [row_to_request(columns, row) for row in raw_rows]
+
+        cur.execute(f"SELECT COUNT(*) FROM requests {sql_where(status_where)}", status_params)
+        total = cur.fetchone()[0]
+
+        # Счётчики по статусам — по тем же фильтрам, но без фильтра статуса
+        cur.execute(
+            f"SELECT status, COUNT(*) FROM requests {sql_where(where)} GROUP BY status",
+            params,
+        )
+        counts = {"pending": 0, "done": 0, "error": 0}
+        for st, cnt in cur.fetchall():
+            counts[st or "pending"] = counts.get(st or "pending", 0) + cnt
+    finally:
+        conn.close()
+
+    next_cursor = None
+    if len(rows) == per_page:
+        # значение из сырой строки: row_to_request подменяет NULL (status -> 'pending' и т.п.)
+        last = raw_rows[-1]
+        next_cursor = _encode_cursor(last[columns.index(column)], last[columns.index("id")])
+
+    return {
+        "requests": rows,
+        "total": total,
+        "counts": counts,
+        "page": None if cursor else page,
+        "per_page": per_page,
+        "pages": (total + per_page - 1) // per_page,
+        "sort": f"{'-' if desc else ''}{column}",
+        "next_cursor": next_cursor,
+    }
+
+
+# ---------- Аналитика по дневным агрегатам ----------
+MAX_PERIOD_DAYS = 36600  # ~100 лет
+
+def period_bounds(period: str, today) -> tuple[Optional[str], str]:
+    """
+    period: число дней ('7', '30'), 'month', 'quarter', 'year' или 'all'.
+    Возвращает (date_from | None, date_to) в формате 'YYYY-MM-DD'.
+    Период длиннее MAX_PERIOD_DAYS считается как 'all' (без нижней границы).
+    """
+    if period == "month":
+        start = today.replace(day=1)
+    elif period == "quarter":
+        start = today.replace(month=(today.month - 1) // 3 * 3 + 1, day=1)
+    elif period == "year":
+        start = today.replace(month=1, day=1)
+    elif period == "all":
+        start = None
+    else:
+        days = max(1, int(period))
+        # огромное число дней (?period=1000000) иначе даёт OverflowError в timedelta
+        start = today - timedelta(days=days - 1) if days <= MAX_PERIOD_DAYS else None
+    return (start.strftime("%Y-%m-%d") if start else None), today.strftime("%Y-%m-%d")
+
+
+def rollup_analytics(date_from: Optional[str], date_to: str, db_path: Optional[str] = None) -> dict:
+    """
+    Аналитика за произвольный период из requests_daily_rollup — без сканирования requests.
+
+    Размер работы зависит от числа дней × районов × статусов × часов в периоде,
+    а не от числа заявок.
+    """
+    where, params = ["day <= ?"], [date_to]
+    if date_from:
+        where.append("day >= ?")
+        params.append(date_from)
+    clause = " AND ".join(where)
+
+    path = db_path or DB_PATH
+    conn = sqlite3.connect(path)
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT status, SUM(count) FROM requests_daily_rollup WHERE {clause} GROUP BY status", params)
+        status_stats = {"pending": 0, "done": 0, "error": 0}
+        for status, count in cur.fetchall():
+            status_stats[status] = status_stats.get(status, 0) + count
+
+        cur.execute(f"""
+            SELECT district, SUM(count), SUM(completed_count), SUM(complete_seconds)
+            FROM requests_daily_rollup WHERE {clause} GROUP BY district
+        """, params)
+        district_stats, district_completion = {}, {}
+        total_completed, total_seconds = 0, 0
+        for district, count, completed_count, seconds in cur.fetchall():
+            name = district or "Невідомо"
+            if count:
+                district_stats[name] = count
+            if completed_count:
+                district_completion[name] = round(seconds / completed_count / 60, 1)
+            total_completed += completed_count
+            total_seconds += seconds
+
+        cur.execute(f"SELECT day, SUM(count) FROM requests_daily_rollup WHERE {clause} GROUP BY day ORDER BY day", params)
+        by_day = dict(cur.fetchall())
+
+        cur.execute(f"SELECT hour, SUM(count) FROM requests_daily_rollup WHERE {clause} GROUP BY hour", params)
+        by_hour = dict(cur.fetchall())
+    finally:
+        conn.close()
+
+    # Непрерывная ось дней (для 'all' — с первого дня, где есть данные)
+    start = date_from or (min(by_day) if by_day else date_to)
+    day = datetime.strptime(start, "%Y-%m-%d").date()
+    end = datetime.strptime(date_to, "%Y-%m-%d").date()
+    daily_stats = []
+    while day <= end:
+        key = day.strftime("%Y-%m-%d")
+        daily_stats.append({"date": day.strftime("%d.%m"), "count": by_day.get(key, 0)})
+        day += timedelta(days=1)
+
+    return {
+        "status_stats": status_stats,
+        "district_stats": district_stats,
+        "daily_stats": daily_stats,
+        "hourly_stats": [{"hour": f"{h:02d}:00", "count": by_hour.get(h, 0)} for h in range(24)],
+        "total_requests": sum(status_stats.values()),
+        "avg_completion_minutes": round(total_seconds / total_completed / 60, 1) if total_completed else None,
+        "district_avg_completion_minutes": district_completion,
+        "date_from": start,
+        "date_to": date_to,
+    }
@@ -0,0 +1,96 @@
+# app/requests/stats.py
+"""
+Инкрементальные счётчики заявок для /stats_data и /analytics/data.
+
+RequestStats подписан на изменения заявок (app.bot_requests.shared.add_request_listener)
+и обновляется за O(1) на каждое создание / смену статуса / удаление, поэтому
+эндпоинты не сканируют историю и не парсят даты на каждый запрос.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import Counter
+from typing import Iterable, Optional
+
+from app.bot_requests.shared import add_request_listener
+
+
+def _day_hour(timestamp: str) -> tuple[Optional[str], Optional[int]]:
+    """'YYYY-MM-DD HH:MM:SS' -> ('YYYY-MM-DD', HH) без strptime."""
+    ts = timestamp or ""
+    if len(ts) < 13 or ts[4] != "-" or ts[7] != "-":
+        return None, None
+    try:
+        return ts[:10], int(ts[11:13])
+    except ValueError:
+        return ts[:10], None
+
+
+class RequestStats:
+    """Счётчики по статусу, району, дню и часу создания заявки."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.by_status: Counter = Counter()
+        self.by_state: Counter = Counter()      # (completed, status) — для /stats_data
+        self.by_district: Counter = Counter()
+        self.by_day: Counter = Counter()
+        self.by_hour: Counter = Counter()
+
+    def _count(self, r: dict, delta: int):
+        status = r.get("status") or "pending"
+        self.total += delta
+        self.by_status[status] += delta
+        self.by_state[(bool(r.get("completed")), status)] += delta
+        self.by_district[r.get("district") or "Невідомо"] += delta
+        day, hour = _day_hour(r.get("timestamp", ""))
+        if day:
+            self.by_day[day] += delta
+        if hour is not None:
+            self.by_hour[hour] += delta
+
+    def _clear(self):
+        self.total = 0
+        for c in (self.by_status, self.by_state, self.by_district, self.by_day, self.by_hour):
+            c.clear()
+
+    # --- listener protocol ---
+    def reset(self, requests: Iterable[dict]):
+        with self._lock:
+            self._clear()
+            for r in requests:
+                self._count(r, +1)
+
+    def apply(self, old: Optional[dict], new: Optional[dict]):
+        with self._lock:
+            if old is not None:
+                self._count(old, -1)
+            if new is not None:
+                self._count(new, +1)
+
+    # --- readers ---
+    def status_summary(self) -> dict:
+        """pending = не завершені; done / error — завершені з відповідним статусом."""
+        with self._lock:
+            pending = sum(n for (completed, _), n in self.by_state.items() if not completed)
+            return {
+                "pending": pending,
+                "done": self.by_state[(True, "done")],
+                "error": self.by_state[(True, "error")],
+            }
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "total": self.total,
+                "by_status": dict(self.by_status),
+                "by_district": {k: v for k, v in self.by_district.items() if v},
+                "by_day": dict(self.by_day),
+                "by_hour": dict(self.by_hour),
+            }
+
+
+request_stats = RequestStats()
+add_request_listener(request_stats)
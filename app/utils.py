@@ -1,9 +1,21 @@
+import os
+
 from flask import session
 
+from app.core.config import DATA_DIR
+
+
+# selected_company -> база компании (задачи без сессии, напр. app/contracts/services.py, обходят все).
+# Абсолютные пути (каталог данных): веб и процесс ботов могут стартовать из разных каталогов
+COMPANY_DB_PATHS = {
+    "1": os.path.join(DATA_DIR, "elestek.db"),
+    "2": os.path.join(DATA_DIR, "elestek_lift.db"),
+}
+
 
 def get_company_db_path():
     company_id = session.get("selected_company")
-    return "elestek_lift.db" if company_id == "2" else "elestek.db"
+    return COMPANY_DB_PATHS.get(company_id, COMPANY_DB_PATHS["1"])
 
 def clean_currency_format(value):
     """Converts Ukrainian formatted currency (with commas) to float"""
@@ -0,0 +1,46 @@
+#!/bin/bash
+# Запуск контейнера: процес ботів (run_bot.py, рівно один) і веб (gunicorn).
+#
+#   docker-entrypoint.sh          # обидва процеси в одному контейнері
+#   docker-entrypoint.sh bot      # тільки боти  — окремий сервіс/контейнер
+#   docker-entrypoint.sh web      # тільки веб
+#
+# У режимі "обидва" скрипт стежить за процесами: якщо будь-який з них завершився,
+# зупиняє другий і виходить з його кодом — контейнер падає, і restart policy
+# (docker run --restart=always / compose restart: always) піднімає його знову.
+# Без цього бот, що впав у фоні, тихо зникав, а gunicorn продовжував працювати.
+set -u
+
+run_web() {
+    # gthread: SSE-підключення (/events) тримають потік, а не весь воркер
+    exec gunicorn --bind 0.0.0.0:5000 --workers "${WEB_WORKERS}" --worker-class gthread --threads 32 main:app
+}
+
+case "${1:-all}" in
+    bot) exec python run_bot.py ;;
+    web) run_web ;;
+    all) ;;
+    *) exec "$@" ;;
+esac
+
+python run_bot.py &
+bot_pid=$!
+run_web &
+web_pid=$!
+
+stop() {
+    kill -TERM "$bot_pid" "$web_pid" 2>/dev/null
+    wait
+}
+trap 'stop; exit 0' TERM INT
+
+# чекаємо на перший процес, що завершився
+wait -n "$bot_pid" "$web_pid"
+code=$?
+if kill -0 "$bot_pid" 2>/dev/null; then
+    echo "gunicorn exited with code $code, stopping container" >&2
+else
+    echo "run_bot.py exited with code $code, stopping container" >&2
+fi
+stop
+exit $(( code == 0 ? 1 : code ))
@@ -45,7 +45,26 @@ Type=exec
 User=$USER
 WorkingDirectory=$(pwd)
 Environment=PATH=$(pwd)/venv/bin
-ExecStart=$(pwd)/venv/bin/gunicorn --bind 0.0.0.0:5000 --workers 1 --timeout 120 main:app
+ExecStart=$(pwd)/venv/bin/gunicorn --bind 0.0.0.0:5000 --workers 2 --worker-class gthread --threads 32 --timeout 120 main:app
+Restart=always
+RestartSec=10
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+# Сервис ботов: polling + планировщик, ровно один процесс на все веб-воркеры
+sudo tee /etc/systemd/system/elevator-bots.service > /dev/null <<EOF
+[Unit]
+Description=Elevator Management Telegram Bots
+After=network.target
+
+[Service]
+Type=exec
+User=$USER
+WorkingDirectory=$(pwd)
+Environment=PATH=$(pwd)/venv/bin
+ExecStart=$(pwd)/venv/bin/python run_bot.py
 Restart=always
 RestartSec=10
 
@@ -67,8 +86,8 @@ chmod 644 requests.db 2>/dev/null || echo "База данных будет со
 
 # Активация сервиса
 sudo systemctl daemon-reload
-sudo systemctl enable elevator-management
-sudo systemctl start elevator-management
+sudo systemctl enable elevator-management elevator-bots
+sudo systemctl start elevator-management elevator-bots
 
 echo "Установка завершена!"
 echo "Сервис доступен по адресу: http://localhost:5000"
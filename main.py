@@ -1,8 +1,8 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-import os, json, threading, subprocess, time, schedule, logging
-from flask import Flask, render_template, jsonify, send_file, request, session, redirect, url_for
+import os, json, threading, subprocess, time, logging
+from flask import Flask, render_template, jsonify, send_file, request, session, redirect, url_for, Response, stream_with_context
 import telebot
 from telebot import types
 from geopy.geocoders import Nominatim
@@ -18,19 +18,39 @@ import app.bot_maintenance.handlers  # подключаем хендлеры б
 from app.bot_requests.shared import (
     bot as requests_bot,
     init_database as init_requests_db,
-    save_requests_to_db,
     load_requests_from_db,
-    requests_list,
+    sync_requests_from_db,
+    get_changes_since,
+    get_data_version,
+    update_request,
+    transition_request,
+    reporter_ids,
+    delete_request as delete_request_row,
+    get_request,
+    get_requests,
     match_address,
     clean_street_name,
     district_names,
     district_ids,
     district_phones,
     personnel_chats,
-    user_states,
-    chat_action_allowed
+    get_chat_action_allowed,
+    set_chat_action_allowed,
+    OUTBOX_BOT,
 )
 from app.bot_requests import handlers  # подключаем хендлеры бота заявок
+from app.bot_requests.incidents import open_by_section
+from app.requests.services import query_requests, rollup_analytics, period_bounds
+from app.requests.stats import request_stats
+from app.core.events import event_bus
+from app.core.watcher import start_watcher
+from app.core import config as bot_config
+from app.core.webhook import register_bot, set_webhooks, start_bot_server
+from app.core.dispatcher import update_dispatcher
+from app.core.outbox import outbox, paginate
+from app.core.scheduler import scheduler
+from app.contracts.services import refresh_all_contracts
+from app.core.address_registry import address_registry
 
 # ====== Логирование ======
 logging.basicConfig(level=logging.INFO,
@@ -45,7 +65,6 @@ app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-for-sessions-12345
 BOT_TOKEN_REQUESTS = os.getenv("BOT_TOKEN_REQUESTS")
 BOT_TOKEN_MAINTENANCE = os.getenv("BOT_TOKEN_MAINTENANCE")
 
-RIGHTS_FILE = "chat_rights.json"
 AUTHORIZED_USERS_FILE = "authorized_users.json"
 authorized_users = {}
 
@@ -54,8 +73,16 @@ init_maintenance_db()  # создаёт maintenance.db для бота ТО
 logger.info("maintenance.db created.")
 
 init_requests_db()      # создаёт requests.db для бота заявок
+outbox.init_db()        # исходящая очередь Telegram (таблица outbox в requests.db)
 load_requests_from_db() # загружаем заявки в память
 
+# Заявки меняют и процесс бота (run_bot.py), и другие веб-воркеры: каждый процесс
+# подтягивает чужие записи по версии данных и рассылает их своим SSE-клиентам
+CHANGE_POLL_SECONDS = float(os.getenv("CHANGE_POLL_SECONDS", "1"))
+start_watcher("requests-sync", sync_requests_from_db, CHANGE_POLL_SECONDS)
+# /enable и /disable пишут флаги в addresses.bin; здесь же подхватывается новый addresses.json
+start_watcher("addresses-sync", address_registry.sync, CHANGE_POLL_SECONDS)
+
 # ====== Blueprints ======
 
 from app.contacts.routes import contacts_html, contacts_api
@@ -76,7 +103,7 @@ app.register_blueprint(contract_api)
          # ========== Flask ==========
 @app.route("/get_action_rights")
 def get_action_rights():
-    return jsonify(chat_action_allowed)
+    return jsonify(get_chat_action_allowed())
 
 @app.route("/login", methods=["GET", "POST"])
 def login():
@@ -442,7 +469,7 @@ def customers():
     
     # Load customers from requests data
     customers_data = {}
-    for req in requests_list:
+    for req in get_requests():
         phone = req.get("phone")
         if phone and phone not in customers_data:
             customers_data[phone] = {
@@ -585,39 +612,31 @@ def registries_work_reports():
 def analytics_data():
     if "phone" not in session:
         return jsonify({"error": "Unauthorized"}), 401
-    
-    # Статистика по статусам
+
+    # Произвольный период (?period=30|month|quarter|year|all или ?from=&to=) — из дневных агрегатов
+    period = request.args.get("period")
+    date_from = request.args.get("from")
+    if period or date_from:
+        try:
+            if period:
+                date_from, date_to = period_bounds(period, datetime.now(kyiv_tz).date())
+            else:
+                date_to = request.args.get("to") or datetime.now(kyiv_tz).strftime("%Y-%m-%d")
+                datetime.strptime(date_from, "%Y-%m-%d")
+                datetime.strptime(date_to, "%Y-%m-%d")
+        except ValueError:
+            return jsonify({"error": "Invalid period"}), 400
+        return jsonify(rollup_analytics(date_from, date_to))
+
+    # Счётчики поддерживаются инкрементально (app/requests/stats.py) — без прохода по истории
+    stats = request_stats.snapshot()
     status_stats = {"pending": 0, "done": 0, "error": 0}
-    district_stats = {}
-    daily_stats = {}
-    hourly_stats = {}
-    
-    from datetime import datetime, timedelta
-    import pytz
-    kyiv_tz = pytz.timezone('Europe/Kiev')
-    
-    for req in requests_list:
-        # Статистика по статусам
-        status = req.get("status", "pending")
+    for status, count in stats["by_status"].items():
         if status in status_stats:
-            status_stats[status] += 1
-        
-        # Статистика по районам
-        district = req.get("district", "Невідомо")
-        district_stats[district] = district_stats.get(district, 0) + 1
-        
-        # Статистика по дням (последние 7 дней)
-        try:
-            req_date = datetime.strptime(req["timestamp"], "%Y-%m-%d %H:%M:%S")
-            date_key = req_date.strftime("%Y-%m-%d")
-            daily_stats[date_key] = daily_stats.get(date_key, 0) + 1
-            
-            # Статистика по часам
-            hour_key = req_date.hour
-            hourly_stats[hour_key] = hourly_stats.get(hour_key, 0) + 1
-        except:
-            pass
-    
+            status_stats[status] = count
+    daily_stats = stats["by_day"]
+    hourly_stats = stats["by_hour"]
+
     # Генерируем данные для последних 7 дней
     today = datetime.now(kyiv_tz).date()
     last_7_days = []
@@ -639,10 +658,10 @@ def analytics_data():
     
     return jsonify({
         "status_stats": status_stats,
-        "district_stats": district_stats,
+        "district_stats": stats["by_district"],
         "daily_stats": last_7_days,
         "hourly_stats": hourly_data,
-        "total_requests": len(requests_list)
+        "total_requests": stats["total"]
     })
 
 @app.route("/export")
@@ -680,166 +699,188 @@ def export_from_db():
         mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 
-@app.route("/complete_request/<int:idx>", methods=["POST"])
-def complete_request(idx):
-    if 0 <= idx < len(requests_list):
-        r = requests_list[idx]
-        r.update(
+# Сообщения в Telegram из веб-маршрутов идут через outbox: ответ оператору — сразу,
+# отправку с учётом лимитов Telegram делает процесс ботов
+def queue_group_keyboard(r, reply_markup=None):
+    """Обновить кнопки под сообщением заявки в чате дільниці."""
+    chat = personnel_chats.get(district_ids.get(r.get("district")))
+    if chat and r.get("chat_msg_id"):
+        outbox.edit_message_reply_markup(OUTBOX_BOT, chat, int(r["chat_msg_id"]), reply_markup=reply_markup)
+
+def queue_client_message(r, text):
+    # всем, чьи звонки присоединены к заявке
+    for user_id in reporter_ids(r):
+        outbox.send_message(OUTBOX_BOT, user_id, text)
+
+def done_only_keyboard(req_id):
+    kb = types.InlineKeyboardMarkup()
+    kb.add(types.InlineKeyboardButton("✅ Виконано", callback_data=f"req:done:{req_id}"))
+    return kb
+
+def not_working_text(r):
+    phones = "\n".join(f"📞 {n}" for n in district_phones.get(r.get("district"), []))
+    return f"⚠️ Заявку відпрацьовано, але ліфт не працює.\n{phones}"
+
+@app.route("/complete_request/<int:req_id>", methods=["POST"])
+def complete_request(req_id):
+    r = get_request(req_id)
+    if r:
+        update_request(
+            r,
             completed=True,
             completed_time=datetime.now(kyiv_tz).strftime("%Y-%m-%d %H:%M:%S"),
             processed_by="Оператор з веб"
         )
-        save_requests_to_db()
-
-        try:
-            requests_bot.edit_message_reply_markup(
-                chat_id=personnel_chats[district_ids[r["district"]]],
-                message_id=int(r["chat_msg_id"]),
-                reply_markup=None
-            )
-        except: pass
-
-        try:
-            requests_bot.send_message(r["user_id"], "✅ Ваша заявка виконана.")
-        except: pass
+        queue_group_keyboard(r, reply_markup=None)
+        queue_client_message(r, "✅ Ваша заявка виконана.")
         return jsonify({"success": True})
     return jsonify({"success": False})
 
-@app.route("/not_working_request/<int:idx>", methods=["POST"])
-def not_working_request(idx):
-    if 0 <= idx < len(requests_list):
-        r = requests_list[idx]
-        r.update(
+@app.route("/not_working_request/<int:req_id>", methods=["POST"])
+def not_working_request(req_id):
+    r = get_request(req_id)
+    if r:
+        update_request(
+            r,
             completed=True,
             completed_time=datetime.now(kyiv_tz).strftime("%Y-%m-%d %H:%M:%S"),
             processed_by="Оператор з веб"
         )
-        save_requests_to_db()
-
-        try:
-            from telebot import types  # убедитесь, что импорт есть наверху
-
-            new_kb = types.InlineKeyboardMarkup()
-            new_kb.add(types.InlineKeyboardButton("✅ Виконано", callback_data=f"status:done:{idx}"))
-            requests_bot.edit_message_reply_markup(
-                chat_id=personnel_chats[district_ids[r["district"]]],
-                message_id=int(r["chat_msg_id"]),
-                reply_markup=new_kb
-            )
-
-        except: pass
-
-        try:
-            phones = "\n".join(f"📞 {n}" for n in district_phones[r["district"]])
-            requests_bot.send_message(r["user_id"],
-                             "⚠️ Заявку відпрацьовано, але ліфт не працює.\n" + phones)
-        except: pass
+        queue_group_keyboard(r, reply_markup=done_only_keyboard(req_id))
+        queue_client_message(r, not_working_text(r))
         return jsonify({"success": True})
     return jsonify({"success": False})
 
-@app.route("/delete_request/<int:idx>", methods=["POST"])
-def delete_request(idx):
-    if 0 <= idx < len(requests_list):
+@app.route("/delete_request/<int:req_id>", methods=["POST"])
+def delete_request(req_id):
+    r = get_request(req_id)
+    if r:
         try:
-            del requests_list[idx]
-            save_requests_to_db()
+            if not delete_request_row(r):
+                return jsonify({"success": False})
             return jsonify({"success": True})
         except:
             return jsonify({"success": False})
     return jsonify({"success": False})
 
+PAGE_QUERY_ARGS = ("status", "district", "date_from", "date_to", "q", "sort", "page", "per_page", "cursor")
+
+def format_request(req):
+    """Заявка в формате JSON для дашборда."""
+    return {
+        "id": req.get("id"),
+        "timestamp": req.get("timestamp", ""),
+        "name": req.get("name", ""),
+        "phone": req.get("phone", ""),
+        "address": req.get("address", ""),
+        "entrance": req.get("entrance", ""),
+        "district": req.get("district", ""),
+        "issue": req.get("issue", ""),
+        "status": req.get("status", "pending"),
+        "completed": req.get("completed", False),
+        "processed_by": req.get("processed_by", ""),
+        "completed_time": req.get("completed_time", ""),
+        "user_id": req.get("user_id", "")
+    }
+
 @app.route("/requests_data")
 def requests_data():
-    """API endpoint for fetching requests data for the dashboard"""
+    """API endpoint for fetching requests data for the dashboard.
+
+    ?since=<version> — только заявки, изменённые после этой версии, и id удалённых.
+    ?status=&district=&date_from=&date_to=&q=&sort=&page=&per_page=&cursor= —
+    одна страница с фильтрами (app.requests.services.query_requests).
+    Без параметров — полный список (для совместимости).
+    """
     try:
-        # Ensure we have the latest data from database
-        load_requests_from_db()
-        
-        # Format requests for frontend from the same list the bot uses
-        formatted_requests = []
-        for i, req in enumerate(requests_list):
-            formatted_req = {
-                "id": i + 1,
-                "timestamp": req.get("timestamp", ""),
-                "name": req.get("name", ""),
-                "phone": req.get("phone", ""),
-                "address": req.get("address", ""),
-                "entrance": req.get("entrance", ""),
-                "district": req.get("district", ""),
-                "issue": req.get("issue", ""),
-                "status": req.get("status", "pending"),
-                "completed": req.get("completed", False),
-                "processed_by": req.get("processed_by", ""),
-                "completed_time": req.get("completed_time", ""),
-                "user_id": req.get("user_id", "")
-            }
-            formatted_requests.append(formatted_req)
-        
-        return jsonify({"requests": formatted_requests})
+        since = request.args.get("since", type=int)
+        if since is not None:
+            version, changed, deleted = get_changes_since(since)
+            return jsonify({
+                "version": version,
+                "full": False,
+                "requests": [format_request(r) for r in changed],
+                "deleted": deleted
+            })
+
+        if any(k in request.args for k in PAGE_QUERY_ARGS):
+            result = query_requests(
+                status=request.args.get("status"),
+                district=request.args.get("district"),
+                date_from=request.args.get("date_from"),
+                date_to=request.args.get("date_to"),
+                q=request.args.get("q"),
+                sort=request.args.get("sort"),
+                page=request.args.get("page", 1, type=int),
+                per_page=request.args.get("per_page", 50, type=int),
+                cursor=request.args.get("cursor"),
+            )
+            result["requests"] = [format_request(r) for r in result["requests"]]
+            result["version"] = get_data_version()
+            return jsonify(result)
+
+        # Перечитываем из БД только то, что изменилось с прошлого раза
+        version = sync_requests_from_db()
+        return jsonify({
+            "version": version,
+            "full": True,
+            "requests": [format_request(r) for r in get_requests()]
+        })
     except Exception as e:
         print(f"Error in requests_data: {e}")
         return jsonify({"error": "Failed to load requests", "requests": []})
 
+@app.route("/events")
+def events():
+    """Server-Sent Events: request_created / status_changed / request_updated / request_deleted."""
+    q = event_bus.subscribe()
+    return Response(
+        stream_with_context(event_bus.stream(q)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Состояние включения кнопок (по умолчанию — True)
-#chat_action_allowed = {"участок№1": True, "участок№2": True}
 @app.route("/get_chat_rights")
 def get_chat_rights():
-    return jsonify(chat_action_allowed)
+    return jsonify(get_chat_action_allowed())
 
 @app.route("/toggle_actions", methods=["POST"])
 def toggle_chat_actions():
     data = json.loads(request.data)
     section = data.get("section")
     enabled = data.get("enabled")
-    if section in chat_action_allowed:
-        chat_action_allowed[section] = enabled
-        save_action_rights()
-        return jsonify({"success": True})
+    if section in get_chat_action_allowed():
+        return jsonify({"success": set_chat_action_allowed(section, enabled)})
     return jsonify({"success": False})
 
-@app.route("/update_status/<int:idx>/<action>", methods=["POST"])
-def update_status(idx, action):
-    if 0 <= idx < len(requests_list):
-        r = requests_list[idx]
-        r.update(
+@app.route("/update_status/<int:req_id>/<action>", methods=["POST"])
+def update_status(req_id, action):
+    r = get_request(req_id)
+    if r:
+        fields = dict(
             completed=True,
             completed_time=datetime.now(kyiv_tz).strftime("%Y-%m-%d %H:%M:%S"),
             processed_by="Оператор з веб"
         )
         if action == "done":
-            r["status"] = "done"
+            r = transition_request(r, "done", from_statuses=("pending", "error"), **fields)
         elif action == "not_working":
-            r["status"] = "error"
-        save_requests_to_db()
-        try:
-            if action == "not_working":
-                # залишити тільки кнопку "✅ Виконано"
-                new_kb = types.InlineKeyboardMarkup()
-                new_kb.add(
-                    types.InlineKeyboardButton("✅ Виконано", callback_data=f"status:done:{idx}")
-                )
-                requests_bot.edit_message_reply_markup(
-                    chat_id=personnel_chats[district_ids[r["district"]]],
-                    message_id=int(r["chat_msg_id"]),
-                    reply_markup=new_kb
-                )
-            else:
-                # якщо "✅ Виконано" — видаляємо всі кнопки
-                requests_bot.edit_message_reply_markup(
-                    chat_id=personnel_chats[district_ids[r["district"]]],
-                    message_id=int(r["chat_msg_id"]),
-                    reply_markup=None
-                )
-        except Exception as e:
-            print(f"⚠️ Не вдалося оновити кнопки: {e}")
-
-        try:
+            r = transition_request(r, "error", from_statuses=("pending",), **fields)
+        else:
+            r = update_request(r, **fields)
+        if not r:
+            # статус уже сменили (бот / другой оператор) — дашборд обновится по событию
+            return jsonify({"success": False, "error": "conflict"}), 409
+        if action == "not_working":
+            # залишити тільки кнопку "✅ Виконано"
+            queue_group_keyboard(r, reply_markup=done_only_keyboard(req_id))
+            queue_client_message(r, not_working_text(r))
+        else:
+            # якщо "✅ Виконано" — видаляємо всі кнопки
+            queue_group_keyboard(r, reply_markup=None)
             if action == "done":
-                requests_bot.send_message(r["user_id"], "✅ Ваша заявка виконана.")
-            elif action == "not_working":
-                phones = "\n".join(f"📞 {n}" for n in district_phones[r["district"]])
-                requests_bot.send_message(r["user_id"], f"⚠️ Заявку відпрацьовано, але ліфт не працює.\n{phones}")
-        except: pass
+                queue_client_message(r, "✅ Ваша заявка виконана.")
 
         return jsonify({"success": True})
 
@@ -860,58 +901,68 @@ def subscribe_push():
 
 @app.route("/stats_data")
 def stats_data():
-    pending = sum(1 for r in requests_list if not r["completed"])
-    done = sum(1 for r in requests_list if r["completed"] and r.get("status") == "done")
-    error = sum(1 for r in requests_list if r["completed"] and r.get("status") == "error")
-    return jsonify({"pending": pending, "done": done, "error": error})
-
-def load_action_rights():
-    global chat_action_allowed
-    if os.path.exists(RIGHTS_FILE):
-        with open(RIGHTS_FILE, encoding="utf-8") as f:
-            chat_action_allowed = json.load(f)
-
-def save_action_rights():
-    with open(RIGHTS_FILE, "w", encoding="utf-8") as f:
-        json.dump(chat_action_allowed, f, ensure_ascii=False)
+    return jsonify(request_stats.status_summary())
 
 kyiv_tz = pytz.timezone("Europe/Kyiv")
 
 # ====== Планировщик ======
 def send_daily():
-    summary = {}
-    for i, r in enumerate(requests_list):
-        if r["completed"]:
+    """Утренняя сводка невыполненных заявок в чаты дільниць: по индексу open_by_section
+    (одна сводка на чат), страницами до 4096 символов, через outbox (лимиты Telegram,
+    свой поток на чат)."""
+    for section, requests_open in open_by_section.by_section().items():
+        chat = personnel_chats.get(section)
+        if not chat:
+            districts = sorted({r.get("district") or "" for r in requests_open})
+            logger.warning("send_daily: no chat for section %r, districts %s (%d open requests)",
+                           section, districts, len(requests_open))
             continue
-        chat = personnel_chats[district_ids[r["district"]]]
-        summary.setdefault(chat, [])
-        url = f"https://t.me/c/{str(chat)[4:]}/{r['chat_msg_id']}"
-        summary[chat].append(f"#{i + 1} <a href='{url}'>{r['address']} п.{r['entrance']}</a>")
-    for chat, lines in summary.items():
-        requests_bot.send_message(chat, "📋 <b>Невиконані заявки:</b>\n" + " \n".join(lines))
-
-
-def sched_loop():
-    test_delay_minutes = 0  # 🔹 меняй только эту цифру
+        lines = []
+        for r in requests_open:
+            label = f"{r.get('address', '')} п.{r.get('entrance', '')}"
+            if r.get("chat_msg_id"):
+                label = f"<a href='https://t.me/c/{str(chat)[4:]}/{r['chat_msg_id']}'>{label}</a>"
+            lines.append(f"#{r['id']} {label}")
+        pages = paginate(lines, "📋 <b>Невиконані заявки:</b>")
+        if len(pages) > 1:
+            pages = paginate(lines, "📋 <b>Невиконані заявки ({page}/{pages}):</b>")
+        for page in pages:
+            if outbox.send_message(OUTBOX_BOT, chat, page) is None:
+                logger.error("send_daily: failed to queue summary for chat %s", chat)
 
-    if test_delay_minutes > 0:
-        run_time = (datetime.now() + timedelta(minutes=test_delay_minutes)).strftime("%H:%M")
-        print(f"⏰ Тестовый запуск через {test_delay_minutes} мин, в {run_time}")
-        schedule.every().day.at(run_time).do(send_daily)
-    else:
-        print("⏰ Боевой режим: каждый день в 08:30")
-        schedule.every().day.at("08:30").do(send_daily)
-
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
 
 # ====== Запуск ======
-if __name__ == "__main__":
-    threading.Thread(target=sched_loop, daemon=True).start()
+def start_bots():
+    """Оба бота + планировщик. Ровно один процесс: run_bot.py (или python main.py).
+
+    BOT_MODE=webhook — обновления приходят на /telegram/<token> (app/core/webhook.py),
+    иначе — long polling. В обоих режимах handler'ы выполняет диспетчер с шардами
+    по chat.id (app/core/dispatcher.py), метрики — GET /bot_metrics на WEBHOOK_PORT.
+    """
+    scheduler.daily("send_daily", bot_config.DAILY_SUMMARY_AT, send_daily)
+    # статусы договоров актуальны сразу после старта лидера, не только с ближайшего срока
+    scheduler.once("contracts_lifecycle_startup", refresh_all_contracts)
+    scheduler.daily("contracts_lifecycle", bot_config.CONTRACTS_REFRESH_AT, refresh_all_contracts)
+    scheduler.every("outbox_purge_failed", 6 * 3600, outbox.purge_failed)
+    scheduler.start()
+    outbox.register_bot(OUTBOX_BOT, requests_bot)
+    outbox.start()
+    start_watcher("dispatcher-metrics", update_dispatcher.log_metrics, bot_config.UPDATE_METRICS_LOG_SECONDS)
+
+    if bot_config.BOT_MODE == "webhook":
+        register_bot(requests_bot)
+        register_bot(maintenance_bot)
+        set_webhooks()
+        start_bot_server()
+        return
+
+    update_dispatcher.attach(requests_bot)
+    update_dispatcher.attach(maintenance_bot)
+    start_bot_server()
 
     def start_requests_bot():
         logger.info("Запускается бот заявок...")
+        requests_bot.remove_webhook()  # getUpdates не работает, пока выставлен webhook
         while True:
             try:
                 requests_bot.infinity_polling(timeout=60, long_polling_timeout=60, allowed_updates=True)
@@ -921,6 +972,7 @@ if __name__ == "__main__":
 
     def start_maintenance_bot():
         logger.info("Запускается бот ТО...")
+        maintenance_bot.remove_webhook()
         while True:
             try:
                 maintenance_bot.infinity_polling(timeout=60, long_polling_timeout=60, allowed_updates=True)
@@ -931,5 +983,8 @@ if __name__ == "__main__":
     threading.Thread(target=start_requests_bot, daemon=True).start()
     threading.Thread(target=start_maintenance_bot, daemon=True).start()
 
-    load_action_rights()
+# Продакшен: run_bot.py (боты + планировщик) + gunicorn main:app (N веб-воркеров без ботов).
+# python main.py — всё в одном процессе, для разработки.
+if __name__ == "__main__":
+    start_bots()
     app.run(host="0.0.0.0", port=5000)
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+Процесс ботов: polling бота заявок и бота ТО + планировщик (ровно один экземпляр).
+
+Веб запускается отдельно и может масштабироваться воркерами:
+    gunicorn --workers 4 --worker-class gthread --threads 32 main:app
+Общие данные — в SQLite (WAL); записи бота веб-воркеры подхватывают по версии данных.
+"""
+
+import time
+
+from main import start_bots, logger
+
+if __name__ == "__main__":
+    start_bots()
+    logger.info("Боти запущені")
+    while True:
+        time.sleep(3600)
@@ -1,11 +1,25 @@
 document.addEventListener("DOMContentLoaded", function() {
   var requestsTable = document.querySelector("#requestsTable");
+  var searchInput = document.querySelector("#searchInput");
+  var statusSelect = document.querySelector("#statusFilter");
   var requests = [];
-  var filterStatus = "all";
+  var filterStatus = statusSelect ? statusSelect.value : "pending";
   var searchTerm = "";
+  var page = 1;
+  var pages = 1;
+  var perPage = 50;
+  var version = null;
 
+  // Одна страница заявок: фильтрация, сортировка и пагинация на сервере
   function fetchRequests() {
-    fetch("/requests_data")
+    var params = new URLSearchParams({
+      status: filterStatus,
+      q: searchTerm,
+      sort: "-timestamp",
+      page: page,
+      per_page: perPage
+    });
+    fetch("/requests_data?" + params.toString())
       .then(function(res) {
         if (!res.ok) {
           throw new Error("HTTP error! status: " + res.status);
@@ -13,13 +27,14 @@ document.addEventListener("DOMContentLoaded", function() {
         return res.json();
       })
       .then(function(data) {
-        console.log("Data received:", data);
-        
         if (!data || !data.requests || !Array.isArray(data.requests)) {
           throw new Error("Invalid data format received");
         }
-        
+
         requests = data.requests;
+        pages = Math.max(1, data.pages || 1);
+        version = data.version;
+        updateCounts(data.counts || {});
         renderRequests();
       })
       .catch(function(error) {
@@ -30,6 +45,41 @@ document.addEventListener("DOMContentLoaded", function() {
       });
   }
 
+  // Дешёвая проверка: перезагружаем страницу, только если в БД что-то изменилось
+  function checkForChanges() {
+    if (version === null) return fetchRequests();
+    fetch("/requests_data?since=" + version)
+      .then(function(res) { return res.json(); })
+      .then(function(data) {
+        if (data.version !== version) {
+          fetchRequests();
+        }
+      })
+      .catch(function(error) {
+        console.error("Error checking for changes:", error);
+      });
+  }
+
+  function updateCounts(counts) {
+    var map = {
+      pendingCount: counts.pending || 0,
+      completedCount: counts.done || 0,
+      errorCount: counts.error || 0,
+      totalCount: (counts.pending || 0) + (counts.done || 0) + (counts.error || 0)
+    };
+    Object.keys(map).forEach(function(id) {
+      var el = document.getElementById(id);
+      if (el) el.textContent = map[id];
+    });
+  }
+
+  function findRequest(id) {
+    for (var i = 0; i < requests.length; i++) {
+      if (requests[i].id === id) return requests[i];
+    }
+    return null;
+  }
+
   function formatDate(dateStr) {
     if (!dateStr) return "";
     var d = new Date(dateStr);
@@ -80,7 +130,7 @@ document.addEventListener("DOMContentLoaded", function() {
         row.className = "table-warning";
       }
 
-      row.setAttribute("data-index", i);
+      row.setAttribute("data-id", r.id);
       
       // Create status badge
       var statusBadge = '';
@@ -97,11 +147,11 @@ document.addEventListener("DOMContentLoaded", function() {
       var notWorkingBtn = '';
       
       if (r.status !== "done") {
-        completeBtn = '<button class="btn btn-sm btn-success complete-btn" data-action="done" data-index="' + i + '">✅</button>';
+        completeBtn = '<button class="btn btn-sm btn-success complete-btn" data-action="done">✅</button>';
       }
       
       if (!r.status || (r.status !== "error" && r.status !== "done")) {
-        notWorkingBtn = '<button class="btn btn-sm btn-warning complete-btn" data-action="not_working" data-index="' + i + '">🚫</button>';
+        notWorkingBtn = '<button class="btn btn-sm btn-warning complete-btn" data-action="not_working">🚫</button>';
       }
 
       // Build the row HTML
@@ -117,40 +167,49 @@ document.addEventListener("DOMContentLoaded", function() {
       rowHTML += '<div class="btn-group">';
       rowHTML += completeBtn;
       rowHTML += notWorkingBtn;
-      rowHTML += '<button class="btn btn-sm btn-danger delete-btn" data-index="' + i + '">🗑️</button>';
+      rowHTML += '<button class="btn btn-sm btn-danger delete-btn">🗑️</button>';
       rowHTML += '</div>';
       rowHTML += '</td>';
       
       row.innerHTML = rowHTML;
       requestsTable.appendChild(row);
     }
+
+    if (pages > 1) {
+      var pager = document.createElement("tr");
+      pager.innerHTML = '<td colspan="8" class="text-center">' +
+        '<button class="btn btn-sm btn-outline-secondary page-btn" data-page="' + (page - 1) + '"' + (page <= 1 ? ' disabled' : '') + '>‹</button>' +
+        ' <span class="mx-2">' + page + ' / ' + pages + '</span> ' +
+        '<button class="btn btn-sm btn-outline-secondary page-btn" data-page="' + (page + 1) + '"' + (page >= pages ? ' disabled' : '') + '>›</button>' +
+        '</td>';
+      requestsTable.appendChild(pager);
+    }
   }
 
   // Event handler for table buttons
   if (requestsTable) {
     requestsTable.addEventListener("click", function(e) {
       var btn = e.target.closest("button");
+      if (btn && btn.classList.contains("page-btn")) {
+        page = parseInt(btn.getAttribute("data-page"));
+        fetchRequests();
+        return;
+      }
       var row = e.target.closest("tr");
-      if (!row || !row.getAttribute("data-index")) return;
+      if (!row || !row.getAttribute("data-id")) return;
 
-      var index = parseInt(row.getAttribute("data-index"));
-      var req = requests[index];
+      var id = parseInt(row.getAttribute("data-id"));
+      var req = findRequest(id);
+      if (!req) return;
 
       // Complete/Not working buttons
       if (btn && btn.classList.contains("complete-btn")) {
         var action = btn.getAttribute("data-action");
-        fetch("/update_status/" + index + "/" + action, { method: "POST" })
+        fetch("/update_status/" + id + "/" + action, { method: "POST" })
           .then(function(res) { return res.json(); })
           .then(function(data) {
             if (data.success) {
-              if (action === "done") {
-                requests[index].status = "done";
-                requests[index].completed = true;
-                requests[index].completed_time = new Date().toISOString();
-              } else if (action === "not_working") {
-                requests[index].status = "error";
-              }
-              renderRequests();
+              fetchRequests();
             }
           })
           .catch(function(error) {
@@ -161,12 +220,11 @@ document.addEventListener("DOMContentLoaded", function() {
       // Delete button
       if (btn && btn.classList.contains("delete-btn")) {
         if (confirm("Видалити цю заявку?")) {
-          fetch("/delete_request/" + index, { method: "POST" })
+          fetch("/delete_request/" + id, { method: "POST" })
             .then(function(res) { return res.json(); })
             .then(function(data) {
               if (data.success) {
-                requests.splice(index, 1);
-                renderRequests();
+                fetchRequests();
               }
             })
             .catch(function(error) {
@@ -177,9 +235,44 @@ document.addEventListener("DOMContentLoaded", function() {
     });
   }
 
+  var searchTimer = null;
+  if (searchInput) {
+    searchInput.addEventListener("input", function() {
+      clearTimeout(searchTimer);
+      searchTimer = setTimeout(function() {
+        searchTerm = searchInput.value.trim();
+        page = 1;
+        fetchRequests();
+      }, 300);
+    });
+  }
+
+  if (statusSelect) {
+    statusSelect.addEventListener("change", function() {
+      filterStatus = statusSelect.value;
+      page = 1;
+      fetchRequests();
+    });
+  }
+
   // Initial load
   fetchRequests();
-  
-  // Refresh every 30 seconds
-  setInterval(fetchRequests, 30000);
+
+  // Живые обновления через SSE; пачку событий склеиваем в один запрос страницы
+  var refreshTimer = null;
+  function scheduleRefresh() {
+    clearTimeout(refreshTimer);
+    refreshTimer = setTimeout(fetchRequests, 300);
+  }
+
+  if (window.EventSource) {
+    var source = new EventSource("/events");
+    ["request_created", "status_changed", "request_updated", "request_deleted"].forEach(function(type) {
+      source.addEventListener(type, scheduleRefresh);
+    });
+    // после переподключения могли пропустить события — сверяем версию
+    source.addEventListener("open", checkForChanges);
+  } else {
+    setInterval(checkForChanges, 30000);
+  }
 });
\ No newline at end of file
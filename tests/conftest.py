@@ -0,0 +1,54 @@
+# tests/conftest.py
+"""
+Общие настройки тестов.
+
+Каталог данных (LIFTBOT_DATA_DIR) — временный: импорт app.bot_requests.shared
+создаёт requests.db и читает addresses.json, и тесты не должны трогать файлы
+проекта. Токены — фиктивные (в Telegram тесты не ходят).
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ["LIFTBOT_DATA_DIR"] = tempfile.mkdtemp(prefix="liftbot-tests-")
+os.environ.setdefault("BOT_TOKEN_REQUESTS", "123456:TEST")
+os.environ.setdefault("BOT_TOKEN_MAINTENANCE", "123457:TEST")
+
+# Маленький addresses.json: два района, у Лазурної 32 два подъезда
+ADDRESSES = {
+    "Корабельний р-н": {
+        "вулиця Лазурна": {
+            "32": {
+                "1": {"lat": 46.9, "lon": 31.9, "radius": 20, "active": True},
+                "2": {"lat": 46.9001, "lon": 31.9001, "radius": 20, "active": True},
+            },
+            "34": {"1": {"lat": 46.9010, "lon": 31.9010, "radius": 15, "active": False}},
+        },
+        "вулиця Адмірала Макарова": {
+            "5": {"1": {"lat": 46.95, "lon": 31.95, "radius": 10, "active": True}},
+        },
+    },
+    "Центральний р-н": {
+        "проспект Миру": {"10А": {"1": {"lat": 46.97, "lon": 31.99, "radius": 15, "active": True}}},
+    },
+}
+
+
+@pytest.fixture
+def addresses_json(tmp_path):
+    path = tmp_path / "addresses.json"
+    path.write_text(json.dumps(ADDRESSES, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "requests.db")
@@ -0,0 +1,153 @@
+import json
+import os
+import sqlite3
+import time
+
+from app.bot_requests.address_index import AddressIndex
+from app.core.address_registry import AddressRegistry, AddressUpdate
+from app.core.address_store import AddressStore
+from app.core.geo_index import GeoIndex
+
+D, STREET = "Корабельний р-н", "вулиця Лазурна"
+
+
+def load(path) -> AddressStore:
+    store = AddressStore(path)
+    store.load()
+    return store
+
+
+class Recorder:
+    def __init__(self):
+        self.resets, self.changes = 0, []
+
+    def reset(self, store):
+        self.resets += 1
+
+    def apply(self, changes):
+        self.changes.extend(changes)
+
+
+def test_store_reads_json_and_reuses_bin(addresses_json):
+    store = load(addresses_json)
+    assert sorted(store.districts()) == ["Корабельний р-н", "Центральний р-н"]
+    entrances = store.entrances(D, STREET, "32")
+    assert list(entrances) == ["1", "2"] and entrances["1"].active and entrances["1"].radius == 20
+    assert store.entrances(D, STREET, "34")["1"].active is False
+    assert store.entrances(D, STREET, "99") == {}
+    assert os.path.exists(store.bin_path)
+    assert store.load() is False  # .bin актуален — повторная загрузка не нужна
+
+
+def test_active_flags_are_shared_through_bin(addresses_json):
+    writer, reader = load(addresses_json), load(addresses_json)
+    assert writer.set_active(D, STREET, "32", "2", False) == ["2"]
+    assert writer.set_active(D, STREET, "99", None, False) is None
+    assert writer.set_active(D, STREET, "32", "7", False) == []
+    rows = reader.pull_active()
+    assert [reader.point(r).entrance for r in rows] == ["2"]
+    assert reader.entrances(D, STREET, "32")["2"].active is False
+    assert reader.pull_active() == []
+
+
+def test_json_change_triggers_rebuild(addresses_json):
+    store = load(addresses_json)
+    data = json.load(open(addresses_json, encoding="utf-8"))
+    data[D][STREET]["36"] = {"1": {"lat": 46.91, "lon": 31.91, "radius": 10, "active": True}}
+    with open(addresses_json, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.utime(addresses_json, ns=(1, 1))
+    assert store.load() is True
+    assert store.has_building(D, STREET, "36")
+
+
+def test_registry_batch_is_audited_and_synced(addresses_json, db_path):
+    local = AddressRegistry(load(addresses_json), db_path)
+    remote = AddressRegistry(load(addresses_json), db_path)
+    local_rec, remote_rec = Recorder(), Recorder()
+    local.add_listener(local_rec)
+    remote.add_listener(remote_rec)
+    results = local.set_active_many([
+        AddressUpdate(D, STREET, "32", None, False),
+        AddressUpdate(D, STREET, "99", None, False),
+    ], chat_id=-100, user_id=7)
+    assert results == [["1", "2"], None]
+    assert [(c.entrance, c.active) for c in local_rec.changes] == [("1", False), ("2", False)]
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*), COUNT(DISTINCT batch), MIN(chat_id), MIN(user_id) FROM address_audit").fetchone() == (2, 1, -100, 7)
+    remote.sync()
+    assert [(c.entrance, c.active) for c in remote_rec.changes] == [("1", False), ("2", False)]
+    # повтор без изменений — ни аудита, ни событий
+    local.set_active(D, STREET, "32", None, False)
+    assert conn.execute("SELECT COUNT(*) FROM address_audit").fetchone()[0] == 2
+
+
+def test_address_index_resolves_spelling_variants(addresses_json):
+    index = AddressIndex()
+    index.reset(load(addresses_json))
+    assert index.resolve("Лазурна", "32", D) == (STREET, "32")
+    assert index.resolve("вул. Лазурна", "32", D) == (STREET, "32")
+    assert index.resolve("Макарова", "5", D) == ("вулиця Адмірала Макарова", "5")
+    assert index.resolve("Миру", "10a", "Центральний р-н") == ("проспект Миру", "10А")
+    assert index.resolve("Лазурна", "32", "Центральний р-н") is None
+    assert index.suggest("Лазурн", D, "32")[0][:2] == (STREET, "32")
+
+
+def test_geo_index_nearest(addresses_json):
+    store = load(addresses_json)
+    geo = GeoIndex()
+    geo.reset(store)
+    match = geo.nearest_entrance(46.90001, 31.90001)
+    assert tuple(match.point) == (D, STREET, "32", "1") and match.distance < 5
+    assert geo.nearest_entrance(46.9010, 31.9010) is None  # 34 п.1 выключен
+    assert geo.nearest_entrance(46.9010, 31.9010, active_only=False).point.building == "34"
+    assert geo.nearest(46.9004, 31.9001, 60).point.building == "32"
+    assert geo.nearest(47.5, 31.0, 60) is None
+    store.set_active(D, STREET, "32", None, False)
+    assert geo.nearest_entrance(46.90001, 31.90001) is None  # active читается живьём
+
+
+def write_json(path, data, mtime):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.utime(path, (mtime, mtime))
+
+
+def test_bot_flags_newer_than_json_are_restored(addresses_json, db_path):
+    os.utime(addresses_json, (1_000_000, 1_000_000))
+    registry = AddressRegistry(load(addresses_json), db_path)
+    registry.load()
+    registry.set_active(D, STREET, "32", "2", False)
+    os.remove(registry.store.bin_path)
+
+    fresh = AddressRegistry(AddressStore(addresses_json), db_path)
+    assert fresh.load() is True
+    assert fresh.store.entrances(D, STREET, "32")["2"].active is False
+
+
+def test_operator_edit_of_json_overrides_older_bot_flags(addresses_json, db_path):
+    registry = AddressRegistry(load(addresses_json), db_path)
+    registry.load()
+    registry.set_active(D, STREET, "32", "2", False)
+    registry.set_active(D, STREET, "34", "1", True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE address_flags SET updated_at = updated_at - 3600")  # флаги выставлены час назад
+    conn.commit()
+    conn.close()
+
+    # оператор позже правит файл: 34 п.1 снова выключен, 32 п.2 включён
+    data = json.load(open(addresses_json, encoding="utf-8"))
+    data[D][STREET]["34"]["1"]["active"] = False
+    data[D][STREET]["32"]["2"]["active"] = True
+    write_json(addresses_json, data, time.time() - 60)
+    assert registry.load() is True
+    assert registry.store.entrances(D, STREET, "32")["2"].active is True
+    assert registry.store.entrances(D, STREET, "34")["1"].active is False
+
+    # /disable после правки файла снова сильнее него — и после перезапуска
+    registry.set_active(D, STREET, "32", "2", False)
+    os.remove(registry.store.bin_path)
+    restarted = AddressRegistry(AddressStore(addresses_json), db_path)
+    restarted.load()
+    assert restarted.store.entrances(D, STREET, "32")["2"].active is False
+    assert restarted.store.entrances(D, STREET, "34")["1"].active is False
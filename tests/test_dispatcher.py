@@ -0,0 +1,76 @@
+import threading
+import time
+
+import telebot
+from telebot import types
+
+from app.core.dispatcher import ShardedDispatcher, chat_key
+
+
+def message_update(update_id: int, chat_id: int) -> types.Update:
+    return types.Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": f"m{update_id}",
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+        },
+    })
+
+
+def make_bot(pending: list[types.Update], handled: list, delay: float = 0.0):
+    bot = telebot.TeleBot("123456:TEST", threaded=False)
+    lock = threading.Lock()
+
+    def get_updates(offset=None, **kwargs):
+        # как Bot API: всё, что не подтверждено offset'ом
+        return [u for u in pending if u.update_id >= (offset or 0)]
+
+    @bot.message_handler(func=lambda m: True)
+    def on_message(message):
+        time.sleep(delay)
+        with lock:
+            handled.append((message.chat.id, message.message_id))
+
+    bot.get_updates = get_updates
+    return bot
+
+
+def test_polling_handles_each_update_once():
+    pending = [message_update(i, chat_id=i % 3 + 1) for i in range(1, 10)]
+    handled = []
+    bot = make_bot(pending, handled, delay=0.02)
+    dispatcher = ShardedDispatcher(workers=2, queue_size=100)
+    dispatcher.attach(bot)
+
+    # несколько циклов polling, пока handler'ы ещё работают
+    for _ in range(5):
+        bot._TeleBot__retrieve_updates(timeout=0, long_polling_timeout=0)
+    dispatcher.join()
+
+    assert sorted(update_id for _, update_id in handled) == list(range(1, 10))
+    assert bot.last_update_id == 9
+    assert dispatcher.metrics()["processed"] == 9
+
+
+def test_updates_of_one_chat_keep_order():
+    pending = [message_update(i, chat_id=(1 if i % 2 else 2)) for i in range(1, 21)]
+    handled = []
+    bot = make_bot(pending, handled, delay=0.001)
+    dispatcher = ShardedDispatcher(workers=4, queue_size=100)
+    dispatcher.attach(bot)
+    bot._TeleBot__retrieve_updates(timeout=0, long_polling_timeout=0)
+    dispatcher.join()
+
+    for chat_id in (1, 2):
+        ids = [update_id for chat, update_id in handled if chat == chat_id]
+        assert ids == sorted(ids) and len(ids) == 10
+
+
+def test_submit_rejects_when_shard_queue_is_full():
+    bot = telebot.TeleBot("123456:TEST", threaded=False)
+    dispatcher = ShardedDispatcher(workers=1, queue_size=1)  # потоки не запущены — очередь не разбирается
+    assert dispatcher.submit(bot, message_update(1, 5))
+    assert not dispatcher.submit(bot, message_update(2, 5))
+    assert dispatcher.metrics()["rejected"] == 1
+    assert chat_key(message_update(3, -100)) == -100
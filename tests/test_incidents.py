@@ -0,0 +1,65 @@
+from datetime import datetime
+
+import pytest
+
+from app.bot_requests.incidents import (
+    IncidentIndex, OpenBySectionIndex, PendingReportIndex, _RequestIndex, incident_deadline, kyiv_tz,
+)
+
+
+def req(req_id, **fields):
+    r = {"id": req_id, "district": "Корабельний р-н", "address": "вулиця Лазурна, 32", "entrance": "1",
+         "timestamp": "2026-10-14 09:00:00", "status": "pending", "completed": False}
+    r.update(fields)
+    return r
+
+
+def test_incident_deadline():
+    wednesday = kyiv_tz.localize(datetime(2026, 10, 14, 9, 0))
+    assert incident_deadline(wednesday) == kyiv_tz.localize(datetime(2026, 10, 15, 9, 0))
+    saturday = kyiv_tz.localize(datetime(2026, 10, 17, 22, 0))
+    assert incident_deadline(saturday).strftime("%a %H:%M") == "Mon 13:25"
+
+
+def test_incident_index_follows_status_changes():
+    index = IncidentIndex()
+    index.reset([req(1), req(2, status="error"), req(3, status="error", entrance="2")])
+    assert index.get("вулиця Лазурна, 32", "1").req_id == 2
+    assert len(index) == 2
+    index.apply(req(2, status="error"), req(2, status="done", completed=True))
+    assert index.get("вулиця Лазурна, 32", "1") is None
+    index.apply(None, req(5, status="error", timestamp="bad"))  # дата не разобрана — не инцидент
+    assert len(index) == 1
+
+
+def test_pending_reports_find_recent_call():
+    index = PendingReportIndex()
+    index.reset([req(1, timestamp="2026-10-14 09:00:00"), req(2, status="done", completed=True)])
+    assert index.find("вулиця Лазурна, 32", "1", "2026-10-14 08:50:00") == 1
+    assert index.find("вулиця Лазурна, 32", "1", "2026-10-14 09:10:00") is None
+    # повторный звонок сдвигает время последнего звонка
+    index.apply(req(1), req(1, reporters=[{"user_id": 1, "timestamp": "2026-10-14 09:20:00"}]))
+    assert index.find("вулиця Лазурна, 32", "1", "2026-10-14 09:10:00") == 1
+
+
+def test_open_by_section_groups_districts_of_one_section():
+    index = OpenBySectionIndex()
+    index.reset([
+        req(3, district="Центральний р-н"),
+        req(1, district="Заводський р-н"),
+        req(2, district="Корабельний р-н"),
+        req(4, district="Інгульський р-н", completed=True),
+        req(5, district="Невідомий"),
+    ])
+    by_section = index.by_section()
+    assert [r["id"] for r in by_section["участок№2"]] == [1, 3]
+    assert [r["id"] for r in by_section["участок№1"]] == [2]
+    assert [r["id"] for r in by_section[None]] == [5]
+
+
+def test_request_index_requires_entry():
+    class Broken(_RequestIndex):
+        pass
+
+    with pytest.raises(TypeError):
+        Broken()
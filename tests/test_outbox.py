@@ -0,0 +1,139 @@
+import json
+import sqlite3
+import time
+
+import pytest
+from telebot.apihelper import ApiTelegramException
+
+from app.core import config
+from app.core.outbox import Outbox, TokenBucket, paginate
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+        self.errors = {}  # text -> ApiTelegramException (один раз)
+
+    def send_message(self, chat_id, text, **kwargs):
+        error = self.errors.pop(text, None)
+        if error:
+            raise error
+        self.sent.append((chat_id, text))
+
+
+def api_error(code, retry_after=None):
+    result = {"ok": False, "error_code": code, "description": f"error {code}"}
+    if retry_after is not None:
+        result["parameters"] = {"retry_after": retry_after}
+    return ApiTelegramException("sendMessage", None, result)
+
+
+@pytest.fixture
+def box(db_path):
+    box = Outbox(db_path, workers=1)
+    box.init_db()
+    # без ограничений скорости: тесты проверяют порядок и обработку ошибок
+    box._global = TokenBucket(1000, 1000)
+    box._chat_bucket = lambda chat_id: box._chats.setdefault(chat_id, TokenBucket(1000, 1000))
+    box.bot = FakeBot()
+    box.register_bot("requests", box.bot)
+    return box
+
+
+def rows(box):
+    conn = sqlite3.connect(box.db_path)
+    try:
+        return conn.execute("SELECT chat_id, payload, status, attempts FROM outbox ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def run_pass(box):
+    conn = sqlite3.connect(box.db_path)
+    try:
+        return box._pass(conn, 0)
+    finally:
+        conn.close()
+
+
+def drain(box, passes=20):
+    for _ in range(passes):
+        run_pass(box)
+
+
+def test_paginate_keeps_lines_and_numbers_pages():
+    lines = [f"line {i:03d}" for i in range(100)]
+    pages = paginate(lines, header="Звіт {page}/{pages}", limit=200)
+    assert len(pages) > 1
+    assert all(len(p) <= 200 for p in pages)
+    assert pages[0].startswith(f"Звіт 1/{len(pages)}\n")
+    body = [line for p in pages for line in p.split("\n")[1:]]
+    assert body == lines
+    assert paginate([]) == [""]
+
+
+def test_pass_delivers_in_order_per_chat(box):
+    for i in range(3):
+        box.send_message("requests", 1, f"a{i}")
+        box.send_message("requests", -100, f"g{i}")
+    drain(box)
+    assert [t for c, t in box.bot.sent if c == 1] == ["a0", "a1", "a2"]
+    assert [t for c, t in box.bot.sent if c == -100] == ["g0", "g1", "g2"]
+    assert rows(box) == []
+    assert box.stats() == {"pending": 0, "failed": 0}
+
+
+def test_429_blocks_chat_and_is_retried_without_counting_attempt(box):
+    box.bot.errors["a0"] = api_error(429, retry_after=30)
+    box.send_message("requests", 1, "a0")
+    box.send_message("requests", 1, "a1")
+    box.send_message("requests", 2, "b0")
+    delay = run_pass(box)
+    # a1 не обгоняет a0, соседний чат не ждёт
+    assert box.bot.sent == [(2, "b0")]
+    assert [(c, json.loads(p)["text"], s, a) for c, p, s, a in rows(box)] == [
+        (1, "a0", "pending", 0), (1, "a1", "pending", 0),
+    ]
+    assert delay <= 30
+
+
+def test_400_marks_message_failed_and_moves_on(box):
+    box.bot.errors["a0"] = api_error(400)
+    box.send_message("requests", 1, "a0")
+    box.send_message("requests", 1, "a1")
+    drain(box)
+    assert box.bot.sent == [(1, "a1")]
+    assert box.stats() == {"pending": 0, "failed": 1}
+
+
+def test_unknown_bot_fails_row(box):
+    box.send_message("maintenance", 1, "x")
+    run_pass(box)
+    assert box.stats() == {"pending": 0, "failed": 1}
+
+
+def test_backlogged_chat_does_not_starve_others(box, monkeypatch):
+    monkeypatch.setattr("app.core.outbox.BATCH_SIZE", 5)
+    for i in range(50):
+        box.send_message("requests", -100, f"g{i}")
+    box.send_message("requests", 7, "late")
+    # первый же проход доходит до чата 7, хотя перед ним 50 сообщений группы
+    run_pass(box)
+    assert box.bot.sent == [(-100, "g0"), (7, "late")]
+    drain(box, passes=60)
+    assert [t for c, t in box.bot.sent if c == -100] == [f"g{i}" for i in range(50)]
+
+
+def test_purge_failed_keeps_recent_rows(box):
+    box.send_message("maintenance", 1, "old")
+    box.send_message("maintenance", 1, "new")
+    box.send_message("requests", 2, "pending")
+    conn = sqlite3.connect(box.db_path)
+    conn.execute("UPDATE outbox SET status = 'failed'")
+    conn.execute("UPDATE outbox SET status = 'pending' WHERE chat_id = 2")
+    week_ago = time.time() - (config.OUTBOX_FAILED_RETENTION_DAYS + 1) * 86400
+    conn.execute("UPDATE outbox SET created_at = ? WHERE payload LIKE '%old%'", (week_ago,))
+    conn.commit()
+    conn.close()
+    assert box.purge_failed() == 1
+    assert box.stats() == {"pending": 1, "failed": 1}
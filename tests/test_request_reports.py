@@ -0,0 +1,45 @@
+import pytest
+
+from app.bot_requests import shared
+from app.bot_requests.handlers import GROUP_REPORTER_ISSUE_CHARS, _group_text
+
+
+@pytest.fixture
+def db(db_path):
+    shared.init_database(db_path)
+    shared.load_requests_from_db(db_path)
+    return db_path
+
+
+def reporter(user_id, issue, time="09:00"):
+    return {"user_id": user_id, "name": f"Абонент {user_id}", "phone": f"+38050000000{user_id}",
+            "issue": issue, "timestamp": f"2026-10-14 {time}:00"}
+
+
+def test_coalesced_report_keeps_its_issue(db):
+    first = reporter(1, "не працює")
+    req_id = shared.insert_request({
+        "name": first["name"], "district": "Корабельний р-н", "address": "вулиця Лазурна, 32", "entrance": "1",
+        "issue": first["issue"], "phone": first["phone"], "timestamp": first["timestamp"],
+        "status": "pending", "user_id": 1, "report_count": 1, "reporters": [first],
+    }, db)
+    shared.attach_report(req_id, reporter(2, "застряг між 5 і 6 поверхом, всередині люди", "09:05"), db)
+    shared.attach_report(req_id, reporter(3, "не працює", "09:07"), db)
+
+    shared.load_requests_from_db(db)  # описи переживають перезапуск
+    r = shared.get_request(req_id)
+    assert [p["issue"] for p in r["reporters"]] == [
+        "не працює", "застряг між 5 і 6 поверхом, всередині люди", "не працює",
+    ]
+    text = _group_text(r)
+    assert "Звернень: 3" in text
+    assert "🔧 застряг між 5 і 6 поверхом, всередині люди" in text
+    assert "🔧 не працює" not in text  # той самий опис, що в заявці, не дублюється
+
+
+def test_long_reporter_issue_is_shortened():
+    r = {"name": "А", "address": "вулиця Лазурна, 32", "entrance": "1", "district": "Корабельний р-н",
+         "issue": "не працює", "phone": "+380500000001", "report_count": 2,
+         "reporters": [reporter(1, "не працює"), reporter(2, "х" * 1000)]}
+    line = _group_text(r).splitlines()[-1]
+    assert line.endswith("…") and len(line.strip()) == len("🔧 ") + GROUP_REPORTER_ISSUE_CHARS
@@ -0,0 +1,93 @@
+import random
+
+from app.bot_requests import store as store_module
+from app.bot_requests.store import RequestStore
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+        self.resets = 0
+
+    def reset(self, requests):
+        self.resets += 1
+        self.events.clear()
+
+    def apply(self, old, new):
+        self.events.append((old and old["id"], new and new["id"]))
+
+
+def ids(snapshot):
+    return [r["id"] for r in snapshot]
+
+
+def test_put_get_and_order():
+    store = RequestStore()
+    for req_id in (5, 1, 3):
+        store.put({"id": req_id}, 0)
+    snap = store.snapshot()
+    assert ids(snap) == [1, 3, 5]
+    assert snap.get(3) == {"id": 3} and snap.get("3") == {"id": 3}
+    assert snap.get(2) is None and snap.get("x") is None
+    assert snap[0]["id"] == 1 and snap[-1]["id"] == 5 and len(snap) == 3
+
+
+def test_snapshot_is_not_affected_by_later_writes():
+    store = RequestStore()
+    store.put({"id": 1, "status": "pending"}, 0)
+    before = store.snapshot()
+    store.put({"id": 1, "status": "done"}, 0)
+    store.remove(1, 0)
+    assert before.get(1)["status"] == "pending"
+    assert store.get(1) is None
+
+
+def test_listeners_get_old_and_new():
+    store = RequestStore()
+    rec = Recorder()
+    store.add_listener(rec)
+    store.put({"id": 1}, 0)
+    store.put({"id": 1, "x": 1}, 0)
+    store.remove(1, 0)
+    store.remove(1, 0)  # уже нет — без события
+    assert rec.events == [(None, 1), (1, 1), (1, None)]
+
+
+def test_apply_changes_skips_own_writes_with_same_rev():
+    store = RequestStore()
+    store.replace_all([{"id": 1, "rev": 1}, {"id": 2, "rev": 1}], 1)
+    events = store.apply_changes([{"id": 1, "rev": 1}, {"id": 2, "rev": 2}, {"id": 3, "rev": 2}], [1], 2)
+    assert [(old and old["id"], new and new["id"]) for old, new in events] == [(2, 2), (None, 3), (1, None)]
+    assert ids(store.snapshot()) == [2, 3] and store.version == 2
+
+
+def test_version_follows_own_writes_only_when_contiguous():
+    store = RequestStore()
+    store.replace_all([], 5)
+    store.put({"id": 1}, 6)
+    assert store.version == 6
+    store.put({"id": 2}, 9)  # между 6 и 9 были чужие записи — их догонит sync
+    assert store.version == 6
+
+
+def test_chunked_store_matches_reference(monkeypatch):
+    monkeypatch.setattr(store_module, "CHUNK_SIZE", 8)
+    rnd = random.Random(7)
+    store, ref = RequestStore(), {}
+    initial = [{"id": i} for i in range(1, 200, 2)]
+    store.replace_all(initial, 0)
+    ref.update((r["id"], r) for r in initial)
+    for step in range(3000):
+        req_id = rnd.randrange(1, 400)
+        if rnd.random() < 0.6:
+            r = {"id": req_id, "step": step}
+            store.put(r, 0)
+            ref[req_id] = r
+        else:
+            assert store.remove(req_id, 0) is ref.pop(req_id, None)
+        if step % 101 == 0:
+            snap = store.snapshot()
+            assert ids(snap) == sorted(ref)
+            assert all(snap.get(k) is v for k, v in ref.items())
+            assert all(snap[i]["id"] == k for i, k in enumerate(sorted(ref)))
+    assert max(len(c) for c in store.snapshot()._chunks) <= 2 * 8
@@ -0,0 +1,72 @@
+import sqlite3
+
+import pytest
+
+from app.bot_requests import shared
+from app.requests.services import rollup_analytics
+
+
+@pytest.fixture
+def db(db_path):
+    shared.init_database(db_path)
+    shared.load_requests_from_db(db_path)
+    return db_path
+
+
+def new_request(db) -> int:
+    return shared.insert_request({
+        "name": "Іван", "district": "Корабельний р-н", "address": "вулиця Лазурна, 32", "entrance": "1",
+        "issue": "не працює", "phone": "0501234567", "timestamp": "2026-10-14 09:00:00",
+        "completed": False, "status": "pending", "user_id": 1,
+    }, db)
+
+
+def complete_elsewhere(db, req_id):
+    """Другой процесс закрывает заявку; снимок этого процесса об этом не знает."""
+    conn = sqlite3.connect(db)
+    old = shared.get_request(req_id)
+    new = {**old, "status": "done", "completed": True, "completed_time": "2026-10-14 10:00:00"}
+    version = shared._next_version(conn)
+    conn.execute("UPDATE requests SET status = 'done', completed = 1, completed_time = ?, rev = ? WHERE id = ?",
+                 (new["completed_time"], version, req_id))
+    shared._rollup_apply(conn, old, -1)
+    shared._rollup_apply(conn, new, +1)
+    conn.commit()
+    conn.close()
+
+
+def status_stats(db):
+    return rollup_analytics(None, "2026-10-14", db)["status_stats"]
+
+
+def test_transition_checks_status_in_db_not_snapshot(db):
+    req_id = new_request(db)
+    complete_elsewhere(db, req_id)
+    assert shared.get_request(req_id)["status"] == "pending"  # снимок отстал
+
+    assert shared.transition_request(req_id, "error", from_statuses=("pending",), db_path=db) is None
+    assert status_stats(db) == {"pending": 0, "done": 1, "error": 0}
+    assert shared.get_request(req_id)["status"] == "done"  # снимок подтянут из БД
+    assert shared.attach_report(req_id, {"user_id": 2}, db) is None
+
+
+def test_update_computes_rollup_delta_from_db_row(db):
+    req_id = new_request(db)
+    complete_elsewhere(db, req_id)
+
+    updated = shared.update_request(req_id, db_path=db, status="error", completed=False)
+    assert updated["status"] == "error" and updated["completed_time"] == "2026-10-14 10:00:00"
+    assert status_stats(db) == {"pending": 0, "done": 0, "error": 1}
+
+
+def test_delete_uses_db_row_for_rollup(db):
+    req_id = new_request(db)
+    complete_elsewhere(db, req_id)
+    assert shared.delete_request(req_id, db)
+    assert status_stats(db) == {"pending": 0, "done": 0, "error": 0}
+    assert shared.get_request(req_id) is None
+    assert not shared.delete_request(req_id, db)
+
+
+def test_write_to_missing_request_returns_none(db):
+    assert shared.update_request(12345, db_path=db, issue="x") is None
@@ -0,0 +1,96 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+from app.bot_requests import shared
+from app.requests.services import SORT_FIELDS, period_bounds, query_requests, rollup_analytics
+
+
+def req(**fields):
+    r = {"name": "Іван", "district": "Корабельний р-н", "address": "вулиця Лазурна, 32", "entrance": "1",
+         "issue": "не працює", "phone": "0501234567", "timestamp": "2026-10-14 09:00:00",
+         "completed": False, "status": "pending", "user_id": 1}
+    r.update(fields)
+    return r
+
+
+@pytest.fixture
+def db(db_path):
+    shared.init_database(db_path)
+    shared.load_requests_from_db(db_path)
+    return db_path
+
+
+def test_query_requests_filters_counts_and_offset_paging(db):
+    for i in range(5):
+        shared.insert_request(req(timestamp=f"2026-10-1{i} 10:00:00"), db)
+    shared.insert_request(req(district="Центральний р-н", address="проспект Миру, 10А",
+                              status="done", completed=True, completed_time="2026-10-14 10:00:00"), db)
+
+    page = query_requests(district="Корабельний р-н", sort="-timestamp", per_page=2, page=2, db_path=db)
+    assert page["total"] == 5 and page["pages"] == 3
+    assert [r["timestamp"][:10] for r in page["requests"]] == ["2026-10-12", "2026-10-11"]
+
+    assert query_requests(status="done", db_path=db)["total"] == 1
+    assert query_requests(q="Миру", db_path=db)["total"] == 1
+    dated = query_requests(date_from="2026-10-13", date_to="2026-10-14", db_path=db)
+    assert dated["total"] == 3
+    assert dated["counts"] == {"pending": 2, "done": 1, "error": 0}
+
+
+def test_query_requests_unknown_sort_falls_back_to_default(db):
+    assert query_requests(sort="name; DROP TABLE requests", db_path=db)["sort"] == "-timestamp"
+
+
+def test_cursor_paging_sees_every_row_once_with_nulls(db):
+    values = [None, "", "2026-10-14 10:00:00", None, "2026-10-14 10:00:00", "", "2026-10-15 08:00:00", None]
+    conn = sqlite3.connect(db)
+    conn.executemany(
+        "INSERT INTO requests (district, address, status, timestamp, completed_time) VALUES (?, ?, ?, ?, ?)",
+        [(v, v, v, v, v) for v in values],
+    )
+    conn.commit()
+    conn.close()
+    every = sorted(r["id"] for r in query_requests(per_page=100, db_path=db)["requests"])
+    assert len(every) == len(values)
+
+    for field in SORT_FIELDS:
+        for sort in (field, f"-{field}"):
+            by_offset = [r["id"] for r in query_requests(sort=sort, per_page=100, db_path=db)["requests"]]
+            seen, cursor = [], None
+            for _ in range(len(values)):
+                page = query_requests(sort=sort, per_page=3, cursor=cursor, db_path=db)
+                seen += [r["id"] for r in page["requests"]]
+                cursor = page["next_cursor"]
+                if not cursor:
+                    break
+            assert seen == by_offset, sort
+            assert sorted(seen) == every, sort
+
+
+def test_rollup_analytics_follows_writes(db):
+    a = shared.insert_request(req(timestamp="2026-10-14 09:30:00"), db)
+    shared.insert_request(req(timestamp="2026-10-15 18:00:00", district="Центральний р-н"), db)
+    shared.transition_request(a, "done", from_statuses=("pending",), db_path=db,
+                              completed=True, completed_time="2026-10-14 10:00:00")
+
+    stats = rollup_analytics("2026-10-13", "2026-10-15", db)
+    assert stats["total_requests"] == 2
+    assert stats["status_stats"] == {"pending": 1, "done": 1, "error": 0}
+    assert stats["district_stats"] == {"Корабельний р-н": 1, "Центральний р-н": 1}
+    assert stats["avg_completion_minutes"] == 30.0
+    assert [d["count"] for d in stats["daily_stats"]] == [0, 1, 1]
+    assert stats["hourly_stats"][9]["count"] == 1 and stats["hourly_stats"][18]["count"] == 1
+
+    shared.delete_request(a, db)
+    assert rollup_analytics(None, "2026-10-15", db)["total_requests"] == 1
+
+
+def test_period_bounds():
+    today = date(2026, 10, 18)
+    assert period_bounds("7", today) == ("2026-10-12", "2026-10-18")
+    assert period_bounds("quarter", today) == ("2026-10-01", "2026-10-18")
+    assert period_bounds("year", today) == ("2026-01-01", "2026-10-18")
+    assert period_bounds("all", today) == (None, "2026-10-18")
+    assert period_bounds("1000000", today) == (None, "2026-10-18")
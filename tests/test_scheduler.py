@@ -0,0 +1,115 @@
+import sqlite3
+import time
+from datetime import datetime
+
+import pytest
+
+from app.core.scheduler import DailyJob, IntervalJob, Job, Scheduler, kyiv_tz
+
+
+def kyiv(*args) -> float:
+    return kyiv_tz.localize(datetime(*args)).timestamp()
+
+
+def test_daily_slots():
+    job = DailyJob("daily", "08:30", lambda: None)
+    assert job.previous(kyiv(2026, 10, 18, 9, 0)) == kyiv(2026, 10, 18, 8, 30)
+    assert job.previous(kyiv(2026, 10, 18, 8, 0)) == kyiv(2026, 10, 17, 8, 30)
+    assert job.next_after(kyiv(2026, 10, 18, 8, 30)) == kyiv(2026, 10, 19, 8, 30)
+
+
+def test_daily_slot_across_dst_change():
+    job = DailyJob("daily", "08:30", lambda: None)
+    # 25.10.2026 — переход на зимнее время: между сроками 25 часов, время по Киеву то же
+    nxt = job.next_after(kyiv(2026, 10, 24, 9, 0))
+    assert datetime.fromtimestamp(nxt, kyiv_tz).strftime("%d %H:%M") == "25 08:30"
+    assert nxt - kyiv(2026, 10, 24, 8, 30) == 25 * 3600
+
+
+def test_interval_slots_with_fractional_step():
+    job = IntervalJob("tick", 0.2, lambda: None)
+    ts = 1000.0
+    for _ in range(50):
+        nxt = job.next_after(ts)
+        assert ts < nxt <= ts + 0.2 + 1e-9
+        ts = nxt
+
+
+def test_job_base_is_abstract():
+    class Broken(Job):
+        def previous(self, now):
+            return now
+
+    with pytest.raises(TypeError):
+        Broken("broken", lambda: None)
+
+
+def test_new_job_waits_for_next_slot_and_runs_once(db_path):
+    ran = []
+    sched = Scheduler(db_path)
+    sched.daily("daily", "08:30", lambda: ran.append(1))
+    # регистрация не запускает задачу задним числом — первый запуск в ближайший срок
+    now = sched._jobs["daily"].next_after(time.time())
+    assert sched.run_pending(now - 1) == []
+    assert sched.run_pending(now) == ["daily"]
+    assert sched.run_pending(now + 1) == []
+    assert ran == [1]
+
+
+def test_slot_is_claimed_by_one_scheduler_only(db_path):
+    ran = []
+    first, second = Scheduler(db_path), Scheduler(db_path)
+    first.daily("daily", "08:30", lambda: ran.append("first"))
+    second.daily("daily", "08:30", lambda: ran.append("second"))
+    due = first._jobs["daily"].next_after(time.time())
+    first.run_pending(due)
+    second.run_pending(due)
+    assert ran == ["first"]
+    # после рестарта тот же срок не повторяется
+    restarted = Scheduler(db_path)
+    restarted.daily("daily", "08:30", lambda: ran.append("restarted"))
+    assert restarted.run_pending(due + 60) == []
+
+
+def test_missed_slots_collapse_into_one_run(db_path):
+    ran = []
+    sched = Scheduler(db_path)
+    sched.daily("daily", "08:30", lambda: ran.append(1))
+    due = sched._jobs["daily"].next_after(time.time())
+    assert sched.run_pending(due + 3 * 86400) == ["daily"]
+    assert sched.run_pending(due + 3 * 86400 + 1) == []
+    assert ran == [1]
+
+
+def test_failed_job_is_recorded_and_rescheduled(db_path):
+    sched = Scheduler(db_path)
+    sched.daily("daily", "08:30", lambda: 1 / 0)
+    due = sched._jobs["daily"].next_after(time.time())
+    assert sched.run_pending(due) == []
+    conn = sqlite3.connect(db_path)
+    assert "ZeroDivisionError" in conn.execute("SELECT last_error FROM scheduled_jobs").fetchone()[0]
+    assert sched.run_pending(due + 86400) == []  # снова падает, но срок забран
+
+
+def test_lease_has_one_leader_and_expires(db_path):
+    first = Scheduler(db_path, lease_seconds=10)
+    second = Scheduler(db_path, lease_seconds=10)
+    assert first._renew_lease(1000.0) is True
+    assert second._renew_lease(1001.0) is False
+    assert first._renew_lease(1005.0) is True
+    assert second._renew_lease(1016.0) is True  # first не продлевал аренду 11 сек
+    assert first._renew_lease(1017.0) is False
+
+
+def test_once_jobs_run_only_on_leader(db_path):
+    ran = []
+    leader, follower = Scheduler(db_path), Scheduler(db_path)
+    leader.once("warmup", lambda: ran.append("leader"))
+    follower.once("warmup", lambda: ran.append("follower"))
+    leader._renew_lease(time.time())
+    follower._renew_lease(time.time())
+    for sched in (leader, follower):
+        if sched.is_leader:
+            sched._run_once_jobs()
+    leader._run_once_jobs()
+    assert ran == ["leader"]
@@ -0,0 +1,61 @@
+import time
+
+from app.core.state_store import StateStore
+
+
+def test_state_survives_restart(db_path):
+    states = StateStore(db_path, "requests")
+    states[1] = {"step": "name"}
+    states[1]["district"] = "Корабельний р-н"
+    restarted = StateStore(db_path, "requests")
+    assert dict(restarted[1]) == {"step": "name", "district": "Корабельний р-н"}
+    assert 2 not in restarted and restarted.get(2, {}) == {}
+
+
+def test_namespaces_are_separate(db_path):
+    StateStore(db_path, "requests")[1] = {"step": "a"}
+    assert StateStore(db_path, "maintenance").get(1) is None
+
+
+def test_expired_state_is_forgotten(db_path):
+    states = StateStore(db_path, "requests", ttl=0.05)
+    states[1] = {"step": "name"}
+    time.sleep(0.1)
+    assert states.get(1) is None
+    assert StateStore(db_path, "requests").get(1) is None
+
+
+def test_pop_and_delete(db_path):
+    states = StateStore(db_path, "requests")
+    states[1] = {"step": "name"}
+    assert states.pop(1) == {"step": "name"}
+    assert states.pop(1, None) is None
+    assert StateStore(db_path, "requests").get(1) is None
+
+
+def test_missing_state_is_cached_until_written(db_path):
+    states = StateStore(db_path, "requests")
+    selects = []
+    states._conn.set_trace_callback(lambda sql: sql.startswith("SELECT") and selects.append(sql))
+    for _ in range(10):
+        assert states.get(42, {}) == {}
+    assert len(selects) == 1
+    states[42] = {"step": "name"}
+    assert states.get(42) == {"step": "name"}
+    del states[42]
+    assert states.get(42) is None
+
+
+def test_batch_writes_once(db_path):
+    states = StateStore(db_path, "requests")
+    states[1] = {"step": "a", "tmp": 1}
+    writes = []
+    states._conn.set_trace_callback(lambda sql: sql.startswith("INSERT") and writes.append(sql))
+    st = states[1]
+    with st.batch():
+        st["step"] = "b"
+        st["name"] = "Іван"
+        st.pop("tmp")
+    st.update(phone="+380", issue="x")
+    assert len(writes) == 2
+    assert dict(StateStore(db_path, "requests")[1]) == {"step": "b", "name": "Іван", "phone": "+380", "issue": "x"}
@@ -0,0 +1,75 @@
+# tools/fake_telegram.py
+"""
+Фейковий Telegram Bot API для локальної перевірки webhook-режиму.
+
+1. python tools/fake_telegram.py           # Bot API на 127.0.0.1:8081, всі виклики — у консоль
+2. TELEGRAM_API_URL="http://127.0.0.1:8081/bot{0}/{1}" BOT_MODE=webhook python run_bot.py
+3. python tools/fake_telegram.py send <token> "текст" [chat_id]
+   — надіслати update з повідомленням на http://127.0.0.1:5001/telegram/<token>
+"""
+
+import json
+import sys
+import time
+import urllib.request
+from urllib.parse import unquote_plus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WEBHOOK_BASE = "http://127.0.0.1:5001/telegram"
+_message_id = 1000
+
+
+class FakeBotApi(BaseHTTPRequestHandler):
+    def do_POST(self):
+        global _message_id
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8", "replace")
+        path, _, query = self.path.partition("?")
+        method = path.rsplit("/", 1)[-1]
+        print(f"→ {method}: {unquote_plus(query or body)[:300]}")
+        _message_id += 1
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+        elif method in ("sendMessage", "editMessageText"):
+            result = {"message_id": _message_id, "date": int(time.time()),
+                      "chat": {"id": 0, "type": "private"}, "text": ""}
+        else:
+            result = True
+        data = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST
+
+    def log_message(self, *args):
+        pass
+
+
+def send_update(token: str, text: str, chat_id: int = 100500):
+    update = {
+        "update_id": int(time.time() * 1000) % 2**31,
+        "message": {
+            "message_id": 1,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+    req = urllib.request.Request(
+        f"{WEBHOOK_BASE}/{token}", data=json.dumps(update).encode(),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    with urllib.request.urlopen(req) as resp:
+        print(resp.status)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "send":
+        send_update(sys.argv[2], sys.argv[3], int(sys.argv[4]) if len(sys.argv) > 4 else 100500)
+    else:
+        print("Fake Bot API on http://127.0.0.1:8081")
+        ThreadingHTTPServer(("127.0.0.1", 8081), FakeBotApi).serve_forever()